@@ -0,0 +1,246 @@
+"""
+CertGuard AI - Benchmark da análise comportamental da LucIA
+
+Mede as etapas colunares de LucIADatabaseAnalyzer.analyze_user_behavior
+(padrões temporais, ações, IPs, anomalias e risco) sobre agregados
+sintéticos equivalentes a N usuários / M linhas de access_logs.
+
+Uso:
+    python scripts/benchmark_behavior_analysis.py
+    python scripts/benchmark_behavior_analysis.py --users 100000 --rows 50000000
+    python scripts/benchmark_behavior_analysis.py --users 1000 --rows 500000 --sqlite /tmp/bench.db
+    python scripts/benchmark_behavior_analysis.py --users 1000 --rows 500000 --sqlite /tmp/bench.db --scan-mode single_pass
+    python scripts/benchmark_behavior_analysis.py --users 1000 --rows 500000 --sqlite /tmp/bench.db --days 365 --memory
+"""
+
+import os
+import sys
+import time
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.lucia_database_analyzer import LucIADatabaseAnalyzer
+
+ACTIONS = ["login", "view_certificate", "download_document", "sign_document", "logout", "failed_login"]
+ACTION_WEIGHTS = [0.1, 0.3, 0.2, 0.28, 0.1, 0.02]
+
+
+def build_frames(users: int, rows: int, seed: int = 42):
+    """Gera os agregados que as consultas de analyze_user_behavior produziriam"""
+    rng = np.random.default_rng(seed)
+
+    # Distribuição de cauda longa de atividade por usuário, somando `rows`
+    weights = rng.lognormal(mean=0.0, sigma=1.0, size=users)
+    totals = rng.multinomial(rows, weights / weights.sum())
+    usernames = np.array([f"user{i:06d}" for i in range(users)], dtype=object)
+    failed = rng.binomial(totals, 0.02)
+    unique_ips = 1 + rng.poisson(1.5, size=users)
+
+    # Alguns usuários suspeitos com muitas falhas
+    suspicious = rng.random(users) < 0.01
+    failed[suspicious] = (totals[suspicious] * 0.6).astype(int)
+    unique_ips[suspicious] += 6
+
+    df_activity = pd.DataFrame({
+        "username": usernames,
+        "full_name": usernames,
+        "role": "user",
+        "organization": "Benchmark",
+        "total_activities": totals,
+        "active_days": np.minimum(totals, 30),
+        "avg_response_time": rng.uniform(0.1, 2.0, size=users),
+        "failed_attempts": failed,
+        "unique_ips": unique_ips,
+        "unique_sessions": np.maximum(totals // 10, 1),
+        "first_activity": "2024-01-01T08:00:00",
+        "last_activity": "2024-01-30T18:00:00"
+    }).sort_values("total_activities", ascending=False, ignore_index=True)
+
+    # Ações: uma linha por (usuário, ação)
+    action_counts = np.stack([rng.binomial(totals, w) for w in ACTION_WEIGHTS], axis=1)
+    action_failures = rng.binomial(action_counts, 0.03)
+    df_actions = pd.DataFrame({
+        "user_id": np.repeat(np.arange(users), len(ACTIONS)),
+        "username": np.repeat(usernames, len(ACTIONS)),
+        "action": np.tile(np.array(ACTIONS, dtype=object), users),
+        "count": action_counts.ravel(),
+        "avg_time": rng.uniform(0.1, 2.0, size=users * len(ACTIONS)),
+        "failures": action_failures.ravel()
+    })
+    df_actions = df_actions[df_actions["count"] > 0].sort_values("count", ascending=False, ignore_index=True)
+
+    # IPs: `unique_ips` linhas por usuário
+    ip_owner = np.repeat(np.arange(users), unique_ips)
+    ip_usage = np.maximum(rng.binomial(np.repeat(totals, unique_ips), 1 / np.repeat(unique_ips, unique_ips)), 1)
+    ip_failures = rng.binomial(ip_usage, np.where(np.repeat(suspicious, unique_ips), 0.7, 0.02))
+    df_ips = pd.DataFrame({
+        "user_id": ip_owner,
+        "username": usernames[ip_owner],
+        "ip_address": [f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" for i in range(len(ip_owner))],
+        "usage_count": ip_usage,
+        "first_seen": "2024-01-01T08:00:00",
+        "last_seen": "2024-01-30T18:00:00",
+        "failed_attempts": ip_failures
+    }).sort_values("usage_count", ascending=False, ignore_index=True)
+
+    # Temporal: até 20 combinações (hora, dia) por usuário
+    buckets = 20
+    df_temporal = pd.DataFrame({
+        "user_id": np.repeat(np.arange(users), buckets),
+        "username": np.repeat(usernames, buckets),
+        "hour": rng.integers(0, 24, size=users * buckets).astype(str),
+        "day_of_week": rng.integers(0, 7, size=users * buckets).astype(str),
+        "activity_count": np.maximum(np.repeat(totals // buckets, buckets), 1)
+    })
+
+    return df_activity, df_temporal, df_actions, df_ips
+
+
+def timed(label: str, func, *args):
+    """Executa uma etapa e imprime o tempo"""
+    started = time.perf_counter()
+    result = func(*args)
+    if asyncio.iscoroutine(result):
+        result = asyncio.run(result)
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<32} {elapsed:8.3f}s")
+    return result, elapsed
+
+
+def run_stages(analyzer: LucIADatabaseAnalyzer, users: int, rows: int):
+    """Benchmark das etapas sobre agregados sintéticos"""
+    print(f"Gerando agregados: {users:,} usuários / {rows:,} linhas de access_logs")
+    started = time.perf_counter()
+    df_activity, df_temporal, df_actions, df_ips = build_frames(users, rows)
+    print(f"  {'geração':<32} {time.perf_counter() - started:8.3f}s")
+    print(f"  activity={len(df_activity):,} temporal={len(df_temporal):,} "
+          f"actions={len(df_actions):,} ips={len(df_ips):,}")
+
+    print("Etapas:")
+    total = 0.0
+    _, elapsed = timed("temporal_patterns", analyzer._analyze_temporal_patterns, df_temporal)
+    total += elapsed
+    _, elapsed = timed("action_patterns", analyzer._analyze_action_patterns, df_actions)
+    total += elapsed
+    ip_analysis, elapsed = timed("ip_patterns", analyzer._analyze_ip_patterns, df_ips)
+    total += elapsed
+    anomalies, elapsed = timed("behavioral_anomalies", analyzer._detect_behavioral_anomalies,
+                               df_activity, df_temporal, df_actions)
+    total += elapsed
+    risks, elapsed = timed("user_risks", analyzer._assess_user_risks, df_activity, df_ips, df_actions)
+    total += elapsed
+    print(f"  {'total':<32} {total:8.3f}s")
+
+    high_risk = sum(1 for r in risks.values() if r["risk_level"] == "high")
+    print(f"Resultado: {len(anomalies):,} anomalias, {len(ip_analysis['suspicious_ips']):,} IPs suspeitos, "
+          f"{high_risk:,} usuários de alto risco")
+
+
+def populate_access_logs(db_path: str, users: int, rows: int, chunk: int = 500_000):
+    """Popula access_logs com `rows` linhas sintéticas (modo ponta a ponta)"""
+    rng = np.random.default_rng(7)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute("DELETE FROM access_logs")
+    cursor.execute("DELETE FROM users WHERE id > 6")
+    cursor.executemany(
+        "INSERT INTO users (id, username, full_name, role, organization_id, status) VALUES (?, ?, ?, 'user', 1, 'active')",
+        ((i, f"user{i:06d}", f"Usuário {i}") for i in range(7, users + 7))
+    )
+
+    base_time = datetime.now() - timedelta(days=29)
+    next_id = 1
+    while next_id <= rows:
+        size = min(chunk, rows - next_id + 1)
+        user_ids = rng.integers(7, users + 7, size=size)
+        actions = rng.choice(len(ACTIONS), size=size, p=ACTION_WEIGHTS)
+        offsets = rng.integers(0, 29 * 86400, size=size)
+        success = rng.random(size) > 0.02
+        ips = rng.integers(1, 255, size=size)
+        response = rng.uniform(0.1, 2.0, size=size)
+
+        cursor.executemany(
+            "INSERT INTO access_logs (id, user_id, action, ip_address, timestamp, success, session_id, response_time) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (next_id + i, int(user_ids[i]), ACTIONS[actions[i]], f"192.168.{user_ids[i] % 255}.{ips[i]}",
+                 (base_time + timedelta(seconds=int(offsets[i]))).isoformat(), bool(success[i]),
+                 f"session_{user_ids[i]}_{offsets[i] // 3600}", float(response[i]))
+                for i in range(size)
+            )
+        )
+        conn.commit()
+        next_id += size
+        print(f"  {next_id - 1:,}/{rows:,} linhas", end="\r")
+
+    print()
+    conn.close()
+
+
+def run_end_to_end(db_path: str, users: int, rows: int, scan_modes, days: int = 30,
+                   chunk_size: int = None, memory: bool = False):
+    """Benchmark completo: consultas SQLite + etapas colunares"""
+    analyzer = LucIADatabaseAnalyzer(db_path=db_path)
+
+    conn = sqlite3.connect(db_path)
+    existing = conn.execute("SELECT COUNT(*) FROM access_logs").fetchone()[0]
+    conn.close()
+
+    if existing != rows:
+        print(f"Populando {db_path} com {rows:,} linhas...")
+        populate_access_logs(db_path, users, rows)
+
+    if chunk_size:
+        analyzer.analysis_config["scan_chunk_size"] = chunk_size
+
+    print(f"analyze_user_behavior ({days} dias):")
+    for scan_mode in scan_modes:
+        analyzer.analysis_config["behavior_scan_mode"] = scan_mode
+        analyzer.clear_analysis_cache()
+        if memory:
+            tracemalloc.start()
+        result, _ = timed(f"ponta a ponta ({scan_mode})", analyzer.analyze_user_behavior, None, days)
+        if memory:
+            # tracemalloc deixa a execução mais lenta; compare tempos sem --memory
+            print(f"  {'pico de memória':<32} {tracemalloc.get_traced_memory()[1] / 1e6:8.1f}MB")
+            tracemalloc.stop()
+        if "error" in result:
+            print(f"  Erro: {result['error']}")
+        else:
+            print(f"  {len(result['user_summary']):,} usuários analisados")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da análise comportamental da LucIA")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--sqlite", help="Banco SQLite para benchmark ponta a ponta (popula access_logs)")
+    parser.add_argument("--scan-mode", choices=["single_pass", "multi_query", "both"], default="both",
+                        help="Plano de leitura de access_logs no modo ponta a ponta")
+    parser.add_argument("--days", type=int, default=30, help="Janela analisada no modo ponta a ponta")
+    parser.add_argument("--chunk-size", type=int, help="Linhas por bloco na passada única (scan_chunk_size)")
+    parser.add_argument("--memory", action="store_true", help="Mede o pico de memória (tracemalloc)")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        scan_modes = ["single_pass", "multi_query"] if args.scan_mode == "both" else [args.scan_mode]
+        run_end_to_end(args.sqlite, args.users, args.rows, scan_modes, args.days, args.chunk_size, args.memory)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        analyzer = LucIADatabaseAnalyzer(db_path=os.path.join(tmp, "benchmark.db"))
+        run_stages(analyzer, args.users, args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+CertGuard AI - Verificação de planos de consulta da LucIA
+
+Executa as consultas de LucIADatabaseAnalyzer, captura o SQL emitido e roda
+EXPLAIN QUERY PLAN em cada SELECT. Falha (código 1) se alguma consulta
+regredir para varredura completa de tabela.
+
+Uso:
+    python scripts/check_query_plans.py
+    python scripts/check_query_plans.py --db /tmp/bench.db --verbose
+"""
+
+import os
+import re
+import sys
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.lucia_database_analyzer import LucIADatabaseAnalyzer
+
+# Tabelas de fatos: só podem ser lidas por busca em índice; varredura
+# em ordem de índice é aceita apenas em consultas com LIMIT (top-N)
+FACT_TABLES = {"access_logs", "audit_events"}
+
+# Tabelas pequenas que algumas consultas listam por completo (ex.: todos os usuários)
+ALLOWED_FULL_SCANS = {"users"}
+
+QUESTION_TYPES = [
+    "general", "user_activity", "security_incident", "audit_query",
+    "certificate_usage", "performance_analysis", "statistical_query"
+]
+
+
+class TracingAnalyzer(LucIADatabaseAnalyzer):
+    """Analisador que registra todo SQL executado"""
+
+    def __init__(self, db_path: str):
+        self.captured: List[str] = []
+        super().__init__(db_path=db_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = super()._connect()
+        conn.set_trace_callback(self.captured.append)
+        return conn
+
+
+async def run_workload(analyzer: TracingAnalyzer):
+    """Exercita todos os caminhos de consulta do analisador"""
+    start = (datetime.now() - timedelta(days=30)).isoformat()
+    end = datetime.now().isoformat()
+
+    await analyzer.analyze_user_behavior(None, 30)
+    await analyzer.analyze_user_behavior("2", 30)
+
+    await analyzer.query_audit_logs("")
+    await analyzer.query_audit_logs("login")
+    await analyzer.query_audit_logs("", severity="high")
+    await analyzer.query_audit_logs("", start_date=start, end_date=end)
+    await analyzer.query_audit_logs("certificado", user_id="6", start_date=start, end_date=end, severity="critical")
+    await analyzer.query_audit_logs("", start_date=start, analysis_scope="window")
+    await analyzer.query_audit_logs("login", start_date=start, end_date=end, analysis_scope="window")
+
+    for question_type in QUESTION_TYPES:
+        await analyzer._gather_relevant_data({"type": question_type, "time_period": 7})
+
+
+def is_internal(sql: str) -> bool:
+    """Consultas ao catálogo do SQLite ou às tabelas-sombra do FTS5"""
+    return "sqlite_master" in sql or re.search(r"'\w+'\.'\w+'", sql) is not None
+
+
+def table_aliases(sql: str) -> Dict[str, str]:
+    """Mapeia alias -> tabela a partir das cláusulas FROM/JOIN"""
+    aliases = {}
+    for table, alias in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", sql, re.IGNORECASE):
+        aliases[table] = table
+        if alias and alias.upper() not in {"ON", "WHERE", "JOIN", "LEFT", "INNER", "GROUP", "ORDER", "LIMIT"}:
+            aliases[alias] = table
+    return aliases
+
+
+def check_plan(conn: sqlite3.Connection, sql: str) -> List[str]:
+    """Retorna violações encontradas no plano da consulta"""
+    aliases = table_aliases(sql)
+    has_limit = re.search(r"\bLIMIT\b", sql, re.IGNORECASE) is not None
+    violations = []
+
+    for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+        detail = row[3]
+        match = re.match(r"SCAN (\w+)(.*)", detail)
+        if not match or "VIRTUAL TABLE" in detail:
+            continue
+
+        alias, rest = match.groups()
+        table = aliases.get(alias, alias)
+        uses_index = "USING" in rest
+
+        if table in FACT_TABLES and not (uses_index and has_limit):
+            violations.append(f"{detail} (tabela de fatos {table})")
+        elif not uses_index and table not in FACT_TABLES and table not in ALLOWED_FULL_SCANS:
+            violations.append(f"{detail} (varredura completa de {table})")
+
+    return violations
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Verifica planos de consulta da LucIA")
+    parser.add_argument("--db", help="Banco existente (padrão: banco temporário com dados de exemplo)")
+    parser.add_argument("--verbose", action="store_true", help="Imprime o plano de todas as consultas")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "query_plans.db")
+        analyzer = TracingAnalyzer(db_path)
+        asyncio.run(run_workload(analyzer))
+
+        queries = list(dict.fromkeys(
+            sql for sql in analyzer.captured
+            if sql.lstrip().upper().startswith(("SELECT", "WITH")) and not is_internal(sql)
+        ))
+
+        conn = sqlite3.connect(db_path)
+        failures = 0
+        for sql in queries:
+            violations = check_plan(conn, sql)
+            summary = " ".join(sql.split())[:100]
+
+            if violations:
+                failures += 1
+                print(f"FALHA  {summary}")
+                for violation in violations:
+                    print(f"       - {violation}")
+            elif args.verbose:
+                print(f"OK     {summary}")
+                for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+                    print(f"       {row[3]}")
+        conn.close()
+
+    print(f"{len(queries)} consultas verificadas, {failures} com varredura completa")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+CertGuard AI - Exportação de snapshots colunares de auditoria
+
+Exporta access_logs, audit_events e security_events (e as dimensões users e
+organizations) em arquivos Arrow IPC particionados por dia. Rode via cron ou
+com --interval para exportação contínua. Requer pyarrow.
+
+Uso:
+    python scripts/export_audit_snapshots.py --snapshot-dir /var/lib/certguard/snapshots
+    python scripts/export_audit_snapshots.py --snapshot-dir /tmp/snapshots --days 30 --force
+    python scripts/export_audit_snapshots.py --snapshot-dir /tmp/snapshots --interval 3600
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.audit_snapshot import AuditSnapshotStore
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Exporta snapshots colunares de auditoria")
+    parser.add_argument("--snapshot-dir", default=os.getenv("CERTGUARD_SNAPSHOT_DIR"),
+                        help="Diretório dos snapshots (padrão: CERTGUARD_SNAPSHOT_DIR)")
+    parser.add_argument("--lucia-db", default="/tmp/certguard.db", help="Banco da LucIA (access_logs, audit_events)")
+    parser.add_argument("--audit-db", default="certguard_audit.db", help="Banco de auditoria (security_events)")
+    parser.add_argument("--days", type=int, default=2, help="Dias exportados, contando hoje")
+    parser.add_argument("--force", action="store_true", help="Reexporta dias já fechados")
+    parser.add_argument("--interval", type=int, help="Segundos entre exportações (execução contínua)")
+    args = parser.parse_args()
+
+    if not args.snapshot_dir:
+        parser.error("--snapshot-dir ou CERTGUARD_SNAPSHOT_DIR é obrigatório")
+
+    if not AuditSnapshotStore.is_available():
+        print("pyarrow não encontrado. Instale com: pip install pyarrow")
+        return 1
+
+    store = AuditSnapshotStore(args.snapshot_dir, lucia_db_path=args.lucia_db, audit_db_path=args.audit_db)
+
+    while True:
+        started = time.perf_counter()
+        summary = store.export(days=args.days, force=args.force)
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+        print(f"Exportação concluída em {time.perf_counter() - started:.2f}s")
+
+        if not args.interval:
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
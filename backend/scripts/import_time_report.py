@@ -0,0 +1,158 @@
+"""
+CertGuard AI - Relatório de tempo de importação (cold start dos workers da API)
+
+Importa cada módulo alvo em um processo novo com `python -X importtime`,
+resume o tempo total e os módulos mais caros, e verifica que bibliotecas
+pesadas (pandas, numpy, aiohttp, ...) não são carregadas na inicialização.
+Gere um JSON por release e compare com o da release anterior.
+
+Uso:
+    python scripts/import_time_report.py
+    python scripts/import_time_report.py --output import_time_1.1.0.json
+    python scripts/import_time_report.py --baseline import_time_1.0.0.json --tolerance 0.2
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Any
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_TARGETS = [
+    "src.main",
+    "src.routes.lucia_advanced",
+    "src.routes.nvidia_ai",
+    "src.routes.blockchain_audit",
+    "src.routes.audit_api"
+]
+
+# Carregadas apenas no primeiro uso (ver src/services/registry.py)
+HEAVY_MODULES = ["pandas", "numpy", "aiohttp", "aiofiles", "requests", "pyarrow", "geoip2"]
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(target: str, runs: int) -> Dict[str, Any]:
+    """Menor tempo de `runs` importações a frio do módulo alvo"""
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import importlib; importlib.import_module({target!r})"],
+            cwd=BACKEND_DIR, capture_output=True, text=True
+        )
+
+        modules, output = {}, []
+        for line in proc.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match:
+                self_us, cumulative_us, indent, name = match.groups()
+                modules[name] = {
+                    "self_ms": int(self_us) / 1000,
+                    "cumulative_ms": int(cumulative_us) / 1000,
+                    "top_level": len(indent) == 1
+                }
+            elif re.match(r"^[\w.]+(Error|Exception)\b", line):
+                output.append(line.strip())
+
+        total_ms = sum(m["cumulative_ms"] for m in modules.values() if m["top_level"])
+        result = {
+            "target": target,
+            "total_ms": round(total_ms, 1),
+            "modules": modules,
+            "error": (output[-1] if output else f"código {proc.returncode}") if proc.returncode else None
+        }
+        if best is None or total_ms < best["total_ms"]:
+            best = result
+    return best
+
+
+def summarize(result: Dict[str, Any], top: int) -> Dict[str, Any]:
+    """Resumo serializável de uma medição"""
+    modules = result["modules"]
+    packages = {}
+    for name, timing in modules.items():
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + timing["self_ms"]
+
+    return {
+        "total_ms": result["total_ms"],
+        "error": result["error"],
+        "heavy_modules_loaded": [name for name in HEAVY_MODULES if name in modules],
+        "top_packages": dict(sorted(
+            ((name, round(ms, 1)) for name, ms in packages.items()), key=lambda item: item[1], reverse=True
+        )[:top]),
+        "top_modules": [
+            {"module": name, "cumulative_ms": round(timing["cumulative_ms"], 1), "self_ms": round(timing["self_ms"], 1)}
+            for name, timing in sorted(modules.items(), key=lambda item: item[1]["self_ms"], reverse=True)[:top]
+        ]
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressões de tempo total acima da tolerância em relação à release anterior"""
+    regressions = []
+    for target, summary in report["targets"].items():
+        previous = baseline.get("targets", {}).get(target)
+        if not previous or not previous["total_ms"]:
+            continue
+        limit = previous["total_ms"] * (1 + tolerance)
+        if summary["total_ms"] > limit:
+            regressions.append(
+                f"{target}: {summary['total_ms']:.0f}ms > {limit:.0f}ms "
+                f"(release anterior {previous['total_ms']:.0f}ms + {tolerance:.0%})"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Relatório de tempo de importação da API")
+    parser.add_argument("targets", nargs="*", default=DEFAULT_TARGETS, help="Módulos a medir")
+    parser.add_argument("--runs", type=int, default=3, help="Execuções por módulo (usa a menor)")
+    parser.add_argument("--top", type=int, default=10, help="Quantidade de módulos/pacotes listados")
+    parser.add_argument("--release", default=None, help="Versão registrada no relatório")
+    parser.add_argument("--output", help="Arquivo JSON de saída")
+    parser.add_argument("--baseline", help="Relatório JSON da release anterior")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Regressão tolerada (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    report = {
+        "release": args.release,
+        "python": sys.version.split()[0],
+        "generated_at": datetime.now().isoformat(),
+        "targets": {}
+    }
+    failures = []
+
+    for target in args.targets:
+        summary = summarize(measure(target, args.runs), args.top)
+        report["targets"][target] = summary
+
+        print(f"{target}: {summary['total_ms']:.0f}ms")
+        for package, ms in list(summary["top_packages"].items())[:5]:
+            print(f"    {package:<24} {ms:8.1f}ms")
+        if summary["error"]:
+            print(f"    aviso: importação falhou ({summary['error']})")
+        if summary["heavy_modules_loaded"]:
+            failures.append(f"{target}: bibliotecas pesadas na inicialização: {', '.join(summary['heavy_modules_loaded'])}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            failures.extend(compare(report, json.load(f), args.tolerance))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Relatório salvo em {args.output}")
+
+    for failure in failures:
+        print(f"FALHA  {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""
+CertGuard AI - Teste de carga dos caminhos de IA
+
+Dispara chamadas em malha aberta (QPS alvo, independente das respostas) contra
+NVIDIAAIService, NvidiaLuciaAI ou LucIASecurityAI.get_security_insights e
+reporta vazão, percentis de latência, tempo até o primeiro token (streaming),
+efetividade do cache de respostas e a espera na admissão.
+
+A latência é medida a partir do instante programado de envio, para que filas
+no cliente apareçam nos percentis (sem coordinated omission).
+
+Por padrão sobe o servidor mock (scripts/mock_nvidia_server.py) em uma thread;
+use --base-url para um mock externo ou outro endpoint OpenAI-compatível.
+
+Uso:
+    python scripts/load_test_ai.py
+    python scripts/load_test_ai.py --target analyze_stream --qps 20 --duration 30
+    python scripts/load_test_ai.py --target lucia_query --qps 10 --latency pareto --latency-ms 300
+    python scripts/load_test_ai.py --unique-prompts 20 --error-rate 0.05 --output carga.json
+    python scripts/load_test_ai.py --base-url http://127.0.0.1:8900/v1 --keep-admission-limits
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import concurrent.futures
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_nvidia_server import start_in_thread, add_mock_arguments, mock_config_from_args
+
+TARGETS = ["analyze_document", "analyze_stream", "lucia_query", "security_insights"]
+
+DOCUMENT_TYPES = ["contrato", "procuracao", "peticao", "sentenca"]
+TOPICS = ["assinatura digital", "certificado A3", "acesso fora do horário", "tentativas de login",
+          "LGPD", "revogação de certificado", "novo IP", "download em massa"]
+
+
+def build_corpus(size: int, seed: int) -> List[Dict[str, str]]:
+    """Documentos e perguntas sintéticos; prompts repetidos exercitam o cache"""
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(size):
+        document_type = rng.choice(DOCUMENT_TYPES)
+        topic = rng.choice(TOPICS)
+        clauses = "\n".join(
+            f"CLÁUSULA {n}ª - As partes acordam sobre {rng.choice(TOPICS)} (item {index}.{n})."
+            for n in range(1, rng.randint(3, 8))
+        )
+        corpus.append({
+            "document_type": document_type,
+            "document": f"{document_type.upper()} Nº {index}\n\n{clauses}",
+            "query": f"Quais riscos de segurança envolvendo {topic} no caso {index}?",
+            "user_id": f"user{index % 50:03d}"
+        })
+    return corpus
+
+
+def make_target(name: str):
+    """Chamada assíncrona do alvo: retorna {"ok": bool, "error": ..., "ttft": s|None}"""
+    from src.services.nvidia_ai import nvidia_ai_service
+
+    if name == "analyze_document":
+        async def call(item):
+            result = await nvidia_ai_service.analyze_legal_document(item["document"], item["document_type"])
+            return {"ok": result["success"], "error": result.get("error")}
+        return call
+
+    if name == "analyze_stream":
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=64, thread_name_prefix="load-stream")
+
+        def consume(item, scheduled):
+            ttft = None
+            for event in nvidia_ai_service.stream_legal_analysis(item["document"], item["document_type"]):
+                if ttft is None and event["type"] == "token":
+                    ttft = time.perf_counter() - scheduled
+            return {"ok": True, "ttft": ttft}
+
+        async def call(item, scheduled):
+            return await asyncio.get_running_loop().run_in_executor(pool, consume, item, scheduled)
+        call.needs_schedule = True
+        return call
+
+    if name == "lucia_query":
+        from src.services.nvidia_lucia_ai import lucia_ai
+
+        async def call(item):
+            result = await lucia_ai.call_nvidia_api(item["query"])
+            return {"ok": result["success"], "error": result.get("error")}
+        return call
+
+    if name == "security_insights":
+        from src.services.lucia_security_ai import lucia_security_ai
+
+        async def call(item):
+            result = await lucia_security_ai.get_security_insights(item["query"], item["user_id"])
+            return {"ok": "error" not in result, "error": result.get("error")}
+        return call
+
+    raise ValueError(f"Alvo desconhecido: {name}")
+
+
+async def run_load(target: str, corpus: List[Dict[str, str]], qps: float, duration: float,
+                   arrival: str, max_in_flight: int, seed: int) -> Dict[str, Any]:
+    """Malha aberta: envia no ritmo programado e mede a partir do instante de envio"""
+    from src.services.ai_http_client import latency_percentiles
+
+    call = make_target(target)
+    needs_schedule = getattr(call, "needs_schedule", False)
+    rng = random.Random(seed)
+    latencies, ttfts, errors = [], [], Counter()
+    counters = {"sent": 0, "ok": 0, "failed": 0, "shed": 0}
+    in_flight = 0
+
+    async def one(item, scheduled):
+        nonlocal in_flight
+        in_flight += 1
+        try:
+            outcome = await (call(item, scheduled) if needs_schedule else call(item))
+        except Exception as e:
+            outcome = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        finally:
+            in_flight -= 1
+        elapsed = time.perf_counter() - scheduled
+        if outcome["ok"]:
+            counters["ok"] += 1
+            latencies.append(elapsed)
+            if outcome.get("ttft") is not None:
+                ttfts.append(outcome["ttft"])
+        else:
+            counters["failed"] += 1
+            errors[str(outcome.get("error"))[:120]] += 1
+
+    tasks = []
+    started = time.perf_counter()
+    next_at = started
+    while next_at - started < duration:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if in_flight >= max_in_flight:
+            counters["shed"] += 1
+        else:
+            counters["sent"] += 1
+            tasks.append(asyncio.ensure_future(one(rng.choice(corpus), next_at)))
+        next_at += rng.expovariate(qps) if arrival == "poisson" else 1 / qps
+
+    send_elapsed = time.perf_counter() - started
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "target": target,
+        "offered_qps": qps,
+        "duration_s": round(send_elapsed, 2),
+        "elapsed_s": round(elapsed, 2),
+        **counters,
+        "throughput_qps": round(counters["ok"] / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": latency_percentiles(latencies),
+        "time_to_first_token_ms": latency_percentiles(ttfts) if ttfts else None,
+        "errors": dict(errors.most_common(10))
+    }
+
+
+async def fetch_mock_stats(base_url: str) -> Optional[Dict[str, Any]]:
+    """Estatísticas do mock (None se o endpoint não for o mock)"""
+    url = base_url.rsplit("/v1", 1)[0] + "/stats"
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                if response.status == 200:
+                    stats = await response.json()
+                    stats.pop("config", None)
+                    return stats
+    except aiohttp.ClientError:
+        pass
+    return None
+
+
+def print_report(report: Dict[str, Any]):
+    load, cache = report["load"], report["response_cache"]
+    print(f"\nAlvo: {load['target']}  (QPS ofertado {load['offered_qps']}, {load['duration_s']}s)")
+    print(f"  enviadas {load['sent']}  ok {load['ok']}  falhas {load['failed']}  descartadas {load['shed']}")
+    print(f"  vazão {load['throughput_qps']} req/s")
+    latency = load["latency_ms"]
+    print(f"  latência (ms)  p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  máx {latency['max']}")
+    if load["time_to_first_token_ms"]:
+        ttft = load["time_to_first_token_ms"]
+        print(f"  primeiro token (ms)  p50 {ttft['p50']}  p95 {ttft['p95']}  p99 {ttft['p99']}")
+    print(f"  cache: acertos {cache['hits']}  faltas {cache['misses']}  taxa {cache['hit_rate']}  "
+          f"coalescidas {cache['coalesced_requests']}  chamadas upstream {cache['upstream_calls']}")
+    admission = report.get("admission")
+    if admission:
+        wait = admission.get("queue_wait_ms", {})
+        print(f"  admissão: espera p50 {wait.get('p50')}ms  p99 {wait.get('p99')}ms  "
+              f"rejeitadas {admission['rejected_queue_full'] + admission['rejected_timeout']}")
+    upstream = report.get("upstream")
+    if upstream:
+        print(f"  upstream: {upstream['requests']} requisições  429 {upstream['responses_429']}  "
+              f"500 {upstream['responses_500']}  streams interrompidos {upstream['stream_aborts']}  "
+              f"pico simultâneo {upstream['peak_in_flight']}")
+    for error, count in load["errors"].items():
+        print(f"  erro ({count}x): {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga dos caminhos de IA contra o mock da API NVIDIA")
+    parser.add_argument("--target", choices=TARGETS, default="analyze_document")
+    parser.add_argument("--qps", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=20.0, help="Segundos enviando requisições")
+    parser.add_argument("--arrival", choices=["uniform", "poisson"], default="poisson")
+    parser.add_argument("--max-in-flight", type=int, default=200, help="Acima disso, descarta (shed) o envio")
+    parser.add_argument("--unique-prompts", type=int, default=200,
+                        help="Tamanho do corpus; menor que o total de requisições gera acertos no cache")
+    parser.add_argument("--cache-db", help="Banco do cache de respostas (padrão: arquivo temporário, cache frio)")
+    parser.add_argument("--keep-admission-limits", action="store_true",
+                        help="Mantém ADMISSION_CONFIG (por padrão os limites são elevados para o QPS do teste)")
+    parser.add_argument("--base-url", help="Endpoint OpenAI-compatível já em execução (não sobe o mock)")
+    parser.add_argument("--output", help="Salva o relatório em JSON")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    stop_mock = None
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        _, base_url, stop_mock = start_in_thread(mock_config_from_args(args))
+        print(f"Mock NVIDIA em {base_url}")
+
+    # Antes de importar os serviços: base_url e cache são lidos na inicialização
+    os.environ["NVIDIA_API_BASE_URL"] = base_url
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.setdefault("CERTGUARD_AI_CACHE_DB", args.cache_db or os.path.join(tmp.name, "ai_cache.db"))
+    os.environ.setdefault("LUCIA_AUDIT_DB", os.path.join(tmp.name, "lucia_audit.db"))
+
+    from src.services.ai_admission import ai_admission
+    from src.services.ai_http_client import ai_http_client
+    from src.services.ai_response_cache import ai_response_cache
+
+    if not args.keep_admission_limits:
+        # Chamadas sem organização caem no balde "default"; ambos com folga de 10x o QPS
+        requests_per_minute = args.qps * 60 * 10
+        ai_admission.set_global_limits(requests_per_minute, requests_per_minute * 4000)
+        ai_admission.set_organization_limits("default", requests_per_minute, requests_per_minute * 4000)
+
+    async def run():
+        load = await run_load(args.target, build_corpus(args.unique_prompts, args.seed or 42), args.qps,
+                              args.duration, args.arrival, args.max_in_flight, args.seed or 42)
+        return load, await fetch_mock_stats(base_url)
+
+    try:
+        load, upstream = asyncio.run(run())
+        report = {
+            "load": load,
+            "response_cache": ai_response_cache.get_stats(),
+            "admission": ai_admission.get_stats(),
+            "http_pool": ai_http_client.get_stats(),
+            "upstream": upstream,
+            "base_url": base_url
+        }
+        print_report(report)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2, default=str)
+            print(f"\nRelatório salvo em {args.output}")
+    finally:
+        ai_http_client.close()
+        ai_response_cache.close()
+        ai_admission.close()
+        if stop_mock:
+            stop_mock()
+        tmp.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
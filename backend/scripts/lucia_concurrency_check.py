@@ -0,0 +1,122 @@
+"""
+CertGuard AI - Verificação de concorrência de NvidiaLuciaAI.call_nvidia_api
+
+Sobe o mock da API NVIDIA com latência fixa e compara o tempo de uma chamada
+com o de N chamadas simultâneas (asyncio.gather). Com o cliente HTTP
+compartilhado as chamadas se sobrepõem: N paralelas levam aproximadamente o
+tempo de uma (ondas extras apenas acima de limit_per_host do pool). Também
+mede o maior atraso do event loop de quem chama e confere o prazo (deadline).
+
+Sai com código 1 se alguma chamada falhar, se as paralelas passarem de
+--max-ratio vezes o tempo de uma, ou se o prazo não for respeitado.
+
+Uso:
+    python scripts/lucia_concurrency_check.py
+    python scripts/lucia_concurrency_check.py --parallel 50 --latency-ms 500
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_nvidia_server import start_in_thread
+
+
+async def heartbeat(interval: float, stalls: list, stop: asyncio.Event):
+    """Maior atraso do loop: um await bloqueante aparece aqui como travamento"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - expected)
+
+
+async def run_check(lucia, parallel: int, latency: float) -> dict:
+    # Aquecimento: abre a sessão e a primeira conexão fora da medição
+    await lucia.call_nvidia_api("aquecimento")
+
+    started = time.perf_counter()
+    single = await lucia.call_nvidia_api("Quem acessou o sistema ontem?")
+    single_elapsed = time.perf_counter() - started
+
+    stalls, stop = [], asyncio.Event()
+    monitor = asyncio.ensure_future(heartbeat(0.01, stalls, stop))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        lucia.call_nvidia_api(f"Quais riscos de segurança no caso {index}?") for index in range(parallel)
+    ))
+    parallel_elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+
+    # Prazo menor que a latência do upstream: a chamada deve desistir no prazo
+    started = time.perf_counter()
+    expired = await lucia.call_nvidia_api("prazo curto", deadline=time.monotonic() + latency / 4)
+    deadline_elapsed = time.perf_counter() - started
+
+    return {
+        "single_s": single_elapsed,
+        "parallel_s": parallel_elapsed,
+        "failures": [r.get("error") for r in [single, *results] if not r["success"]],
+        "max_loop_stall_s": max(stalls) if stalls else 0.0,
+        "deadline_s": deadline_elapsed,
+        "deadline_result": expired
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="N chamadas paralelas da LucIA levam o tempo de uma?")
+    parser.add_argument("--parallel", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="Latência fixa do mock")
+    parser.add_argument("--max-ratio", type=float, default=1.5,
+                        help="Tempo máximo das paralelas, em múltiplos do tempo de uma chamada")
+    args = parser.parse_args()
+
+    _, base_url, stop_mock = start_in_thread({
+        "latency": "fixed",
+        "latency_ms": args.latency_ms,
+        "tokens_per_second": 10000.0
+    })
+
+    # Antes de importar o serviço: base_url e banco de auditoria são lidos na importação
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["NVIDIA_API_BASE_URL"] = base_url
+    os.environ["LUCIA_AUDIT_DB"] = os.path.join(tmp.name, "lucia_audit.db")
+
+    from src.services.ai_http_client import ai_http_client
+    from src.services.nvidia_lucia_ai import NvidiaLuciaAI
+
+    try:
+        result = asyncio.run(run_check(NvidiaLuciaAI(), args.parallel, args.latency_ms / 1000))
+    finally:
+        ai_http_client.close()
+        stop_mock()
+        tmp.cleanup()
+
+    ratio = result["parallel_s"] / result["single_s"]
+    print(f"1 chamada: {result['single_s'] * 1000:.0f}ms")
+    print(f"{args.parallel} chamadas paralelas: {result['parallel_s'] * 1000:.0f}ms ({ratio:.2f}x)")
+    print(f"maior atraso do event loop: {result['max_loop_stall_s'] * 1000:.1f}ms")
+    print(f"prazo de {args.latency_ms / 4:.0f}ms: {result['deadline_s'] * 1000:.0f}ms "
+          f"({result['deadline_result'].get('error')})")
+
+    failed = False
+    if result["failures"]:
+        print(f"FALHA: {len(result['failures'])} chamadas falharam: {result['failures'][0]}")
+        failed = True
+    if ratio > args.max_ratio:
+        print(f"FALHA: chamadas paralelas {ratio:.2f}x mais lentas que uma (máximo {args.max_ratio}x)")
+        failed = True
+    if result["deadline_result"]["success"] or result["deadline_s"] > args.latency_ms / 1000:
+        print("FALHA: prazo (deadline) não respeitado")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+CertGuard AI - Servidor mock da API NVIDIA (OpenAI-compatível)
+
+Substituto local de integrate.api.nvidia.com para benchmarks dos caminhos de IA
+(NVIDIAAIService, NvidiaLuciaAI, LucIASecurityAI). Simula distribuição de
+latência até o primeiro token, geração em tokens/s, streaming SSE, erros 5xx
+(inclusive no meio do stream) e 429 por limite de requisições ou concorrência.
+
+Aponte os serviços para ele com NVIDIA_API_BASE_URL.
+
+Uso:
+    python scripts/mock_nvidia_server.py
+    python scripts/mock_nvidia_server.py --port 8900 --latency lognormal --latency-ms 600 --latency-sigma 0.6
+    python scripts/mock_nvidia_server.py --error-rate 0.05 --stream-error-rate 0.02 --rate-limit-rpm 600
+    NVIDIA_API_BASE_URL=http://127.0.0.1:8900/v1 python main.py
+
+Endpoints: POST /v1/chat/completions, GET /v1/models, GET /stats, POST /stats/reset
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import threading
+from typing import Dict, Any, Tuple, Callable
+
+from aiohttp import web
+
+# Comportamento padrão (valores próximos aos observados nos modelos 70B)
+MOCK_CONFIG = {
+    "latency": "lognormal",         # fixed | uniform | lognormal | pareto (tempo até o primeiro token)
+    "latency_ms": 400.0,            # mediana (lognormal), valor (fixed), mínimo (pareto) ou centro (uniform)
+    "latency_sigma": 0.5,           # dispersão da lognormal / largura relativa da uniform
+    "pareto_alpha": 2.5,            # cauda da pareto (menor = cauda mais pesada)
+    "tokens_per_second": 60.0,      # velocidade de geração
+    "response_tokens": 120,         # tokens por resposta (limitado por max_tokens)
+    "chars_per_token": 4,
+    "error_rate": 0.0,              # fração de respostas 500 antes do primeiro token
+    "stream_error_rate": 0.0,       # fração de streams interrompidos no meio
+    "rate_429_rate": 0.0,           # fração de 429 aleatórios
+    "rate_limit_rpm": 0,            # requisições/min por chave de API (0 = sem limite)
+    "max_concurrency": 0,           # requisições simultâneas (0 = sem limite)
+    "seed": None
+}
+
+WORDS = ("análise documento cláusula contrato assinatura certificado ICP-Brasil LGPD risco "
+         "conformidade auditoria acesso usuário tribunal processo prazo parte obrigação").split()
+
+
+class MockNVIDIAServer:
+    """Estado e handlers do servidor mock"""
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = {**MOCK_CONFIG, **(config or {})}
+        self.random = random.Random(self.config["seed"])
+        self.in_flight = 0
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {
+            "requests": 0,
+            "streams": 0,
+            "responses_200": 0,
+            "responses_429": 0,
+            "responses_500": 0,
+            "stream_aborts": 0,
+            "peak_in_flight": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "started_at": time.time()
+        }
+
+    def sample_latency(self) -> float:
+        """Tempo até o primeiro token, em segundos"""
+        base = self.config["latency_ms"] / 1000
+        kind = self.config["latency"]
+        if kind == "fixed":
+            return base
+        if kind == "uniform":
+            spread = base * self.config["latency_sigma"]
+            return max(0.0, self.random.uniform(base - spread, base + spread))
+        if kind == "pareto":
+            return base * self.random.paretovariate(self.config["pareto_alpha"])
+        return self.random.lognormvariate(0.0, self.config["latency_sigma"]) * base
+
+    def _rate_limited(self, api_key: str) -> bool:
+        """Token bucket por chave de API (rate_limit_rpm)"""
+        rpm = self.config["rate_limit_rpm"]
+        if not rpm:
+            return False
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(api_key, (float(rpm), now))
+        tokens = min(float(rpm), tokens + (now - updated) * rpm / 60)
+        if tokens < 1:
+            self.buckets[api_key] = (tokens, now)
+            return True
+        self.buckets[api_key] = (tokens - 1, now)
+        return False
+
+    def _completion_text(self, payload: Dict[str, Any], tokens: int) -> str:
+        """Texto determinístico por prompt (respostas iguais para prompts iguais)"""
+        prompt = json.dumps(payload.get("messages", []), ensure_ascii=False, sort_keys=True)
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        words = " ".join(rng.choice(WORDS) for _ in range(max(1, tokens - 12)))
+        if "json" in prompt.lower():
+            return f'```json\n{{"resumo": "{words}", "riscos": [], "confidence": 0.9}}\n```'
+        return words
+
+    def _error(self, status: int, message: str, headers: Dict[str, str] = None) -> web.Response:
+        self.stats[f"responses_{status}"] += 1
+        return web.json_response(
+            {"error": {"message": message, "type": "mock_error", "code": status}},
+            status=status, headers=headers
+        )
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        self.stats["requests"] += 1
+        payload = await request.json()
+        api_key = request.headers.get("Authorization", "")
+
+        if self._rate_limited(api_key) or self.random.random() < self.config["rate_429_rate"]:
+            return self._error(429, "Rate limit exceeded", {"Retry-After": "1"})
+        if self.config["max_concurrency"] and self.in_flight >= self.config["max_concurrency"]:
+            return self._error(429, "Too many concurrent requests", {"Retry-After": "1"})
+
+        self.in_flight += 1
+        self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+        try:
+            await asyncio.sleep(self.sample_latency())
+            if self.random.random() < self.config["error_rate"]:
+                return self._error(500, "Internal server error (mock)")
+
+            tokens = min(self.config["response_tokens"], int(payload.get("max_tokens") or 1024))
+            text = self._completion_text(payload, tokens)
+            prompt_chars = sum(len(m.get("content") or "") for m in payload.get("messages", []))
+            usage = {
+                "prompt_tokens": prompt_chars // self.config["chars_per_token"],
+                "completion_tokens": tokens,
+                "total_tokens": prompt_chars // self.config["chars_per_token"] + tokens
+            }
+            self.stats["prompt_tokens"] += usage["prompt_tokens"]
+            self.stats["completion_tokens"] += usage["completion_tokens"]
+            completion_id = f"chatcmpl-mock-{self.stats['requests']}"
+            model = payload.get("model", "mock")
+
+            if payload.get("stream"):
+                return await self._stream(request, completion_id, model, text, tokens, usage)
+
+            await asyncio.sleep(tokens / self.config["tokens_per_second"])
+            self.stats["responses_200"] += 1
+            return web.json_response({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage
+            })
+        finally:
+            self.in_flight -= 1
+
+    async def _stream(self, request: web.Request, completion_id: str, model: str, text: str,
+                      tokens: int, usage: Dict[str, int]) -> web.StreamResponse:
+        """Resposta SSE no formato chat.completion.chunk, encerrada com [DONE]"""
+        self.stats["streams"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        self.stats["responses_200"] += 1
+
+        pieces = text.split(" ")
+        step = max(1, len(pieces) // tokens) if tokens else 1
+        delay = 1 / self.config["tokens_per_second"]
+        abort_at = len(pieces) // 2 if self.random.random() < self.config["stream_error_rate"] else None
+
+        def chunk(delta: Dict[str, Any], finish_reason: str = None, **extra) -> bytes:
+            event = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra
+            }
+            return f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        await response.write(chunk({"role": "assistant"}))
+        for index in range(0, len(pieces), step):
+            if abort_at is not None and index >= abort_at:
+                # Conexão encerrada sem [DONE]: o cliente deve tratar como falha
+                self.stats["stream_aborts"] += 1
+                request.transport.close()
+                return response
+            content = " ".join(pieces[index:index + step])
+            await response.write(chunk({"content": content if index == 0 else " " + content}))
+            await asyncio.sleep(delay * step)
+
+        await response.write(chunk({}, "stop", usage=usage))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def models(self, request: web.Request) -> web.Response:
+        return web.json_response({"object": "list", "data": [
+            {"id": "meta/llama3-70b-instruct", "object": "model"},
+            {"id": "meta/llama-3.3-70b-instruct", "object": "model"}
+        ]})
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({**self.stats, "in_flight": self.in_flight, "config": self.config})
+
+    async def post_reset(self, request: web.Request) -> web.Response:
+        self.reset_stats()
+        self.buckets.clear()
+        return web.json_response({"reset": True})
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        app.router.add_get("/v1/models", self.models)
+        app.router.add_get("/stats", self.get_stats)
+        app.router.add_post("/stats/reset", self.post_reset)
+        return app
+
+
+def start_in_thread(config: Dict[str, Any] = None, host: str = "127.0.0.1",
+                    port: int = 0) -> Tuple[MockNVIDIAServer, str, Callable[[], None]]:
+    """Sobe o mock em uma thread própria; retorna (servidor, base_url, stop)"""
+    server = MockNVIDIAServer(config)
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    state = {}
+
+    async def start():
+        runner = web.AppRunner(server.build_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        state["runner"] = runner
+        state["port"] = runner.addresses[0][1]
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(start())
+        ready.set()
+        loop.run_forever()
+        loop.run_until_complete(state["runner"].cleanup())
+        loop.close()
+
+    thread = threading.Thread(target=run, name="mock-nvidia", daemon=True)
+    thread.start()
+    ready.wait()
+
+    def stop():
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+
+    return server, f"http://{host}:{state['port']}/v1", stop
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    """Opções de comportamento do mock (compartilhadas com load_test_ai.py)"""
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal", "pareto"], default=MOCK_CONFIG["latency"])
+    parser.add_argument("--latency-ms", type=float, default=MOCK_CONFIG["latency_ms"])
+    parser.add_argument("--latency-sigma", type=float, default=MOCK_CONFIG["latency_sigma"])
+    parser.add_argument("--pareto-alpha", type=float, default=MOCK_CONFIG["pareto_alpha"])
+    parser.add_argument("--tokens-per-second", type=float, default=MOCK_CONFIG["tokens_per_second"])
+    parser.add_argument("--response-tokens", type=int, default=MOCK_CONFIG["response_tokens"])
+    parser.add_argument("--error-rate", type=float, default=MOCK_CONFIG["error_rate"])
+    parser.add_argument("--stream-error-rate", type=float, default=MOCK_CONFIG["stream_error_rate"])
+    parser.add_argument("--rate-429-rate", type=float, default=MOCK_CONFIG["rate_429_rate"])
+    parser.add_argument("--rate-limit-rpm", type=int, default=MOCK_CONFIG["rate_limit_rpm"])
+    parser.add_argument("--max-concurrency", type=int, default=MOCK_CONFIG["max_concurrency"])
+    parser.add_argument("--seed", type=int, default=MOCK_CONFIG["seed"])
+
+
+def mock_config_from_args(args: argparse.Namespace) -> Dict[str, Any]:
+    return {key: getattr(args, key) for key in MOCK_CONFIG if hasattr(args, key)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor mock OpenAI-compatível da API NVIDIA")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockNVIDIAServer(mock_config_from_args(args))
+    print(f"Mock NVIDIA em http://{args.host}:{args.port}/v1 "
+          f"(latência {args.latency} {args.latency_ms}ms, {args.tokens_per_second} tokens/s)")
+    print(f"Use: NVIDIA_API_BASE_URL=http://{args.host}:{args.port}/v1")
+    web.run_app(server.build_app(), host=args.host, port=args.port, access_log=None, print=None)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+CertGuard AI - Verificação do cache por similaridade (ai_similarity_cache)
+
+Indexa uma pergunta e consulta variações dela no mesmo escopo. Reformulações
+sem conteúdo novo devem reaproveitar a resposta; mudar um identificador, um
+valor ou uma negação nunca pode. Confere também que análise de documentos e
+contratos não é elegível.
+
+Sai com código 1 se algum caso divergir do esperado.
+
+Uso:
+    python scripts/similarity_cache_check.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.ai_similarity_cache import AISimilarityCache
+
+SCOPE = "escopo-verificacao"
+
+# (contexto, pergunta indexada, pergunta consultada, acerto esperado)
+CASES = [
+    ("security_analysis", "Quem acessou ontem?", "Quem acessou o sistema ontem?", True),
+    ("security_analysis", "Quais acessos do usuário 12345 ontem?", "Quais acessos do usuário 12345 ontem?", True),
+    ("security_analysis", "Quais acessos do usuário 12345 ontem?", "Quais acessos do usuário 12346 ontem?", False),
+    ("security_analysis", "Houve transferência de R$ 10.000,00 ontem?",
+     "Houve transferência de R$ 900.000,00 ontem?", False),
+    ("jurisprudence_analysis", "O locatário obriga-se a cumprir a multa contratual",
+     "O locatário não se obriga a cumprir a multa contratual", False),
+    ("jurisprudence_analysis", "Houve acesso ao certificado com autorização do titular",
+     "Houve acesso ao certificado sem autorização do titular", False),
+]
+
+
+def main():
+    failed = False
+    for context, indexed, query, expected in CASES:
+        cache = AISimilarityCache({"enabled": True})
+        cache.add(SCOPE, indexed, "resposta")
+        match = cache.lookup(context, SCOPE, query)
+        status = "ok" if (match is not None) == expected else "FALHA"
+        failed |= status == "FALHA"
+        outcome = f"acerto ({match[1]})" if match else "falta"
+        print(f"{status}: {outcome}, esperado {'acerto' if expected else 'falta'}: {indexed!r} -> {query!r}")
+
+    cache = AISimilarityCache({"enabled": True})
+    for context in ("legal_analysis", "contract_analysis"):
+        if cache.enabled_for(context):
+            print(f"FALHA: {context} não deveria ser elegível")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
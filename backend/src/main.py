@@ -1,5 +1,6 @@
 import os
 import sys
+import atexit
 from datetime import datetime
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
@@ -33,6 +34,8 @@ from src.routes.blockchain import blockchain_bp
 from src.routes.nvidia_ai import register_nvidia_ai_routes
 from src.routes.blockchain_audit import register_blockchain_routes
 from src.routes.lucia_advanced import register_lucia_advanced_routes
+from src.routes.audit_api import audit_bp
+from src.services.registry import registry, get_registry_stats
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 
@@ -51,12 +54,16 @@ app.register_blueprint(certificate_bp, url_prefix='/api/certificates')
 app.register_blueprint(organization_bp, url_prefix='/api/organizations')
 app.register_blueprint(lucia_bp, url_prefix='/api/lucia')
 app.register_blueprint(blockchain_bp, url_prefix='/api/blockchain')
+app.register_blueprint(audit_bp)  # url_prefix /api/audit definido no blueprint
 
 # Registrar rotas avançadas
 register_nvidia_ai_routes(app)
 register_blockchain_routes(app)
 register_lucia_advanced_routes(app)
 
+# Encerrar serviços (sessão HTTP de IA, pools) ao desligar o processo
+atexit.register(registry.shutdown)
+
 # Inicializar banco de dados
 db.init_app(app)
 with app.app_context():
@@ -85,6 +92,7 @@ def health_check():
         'status': 'healthy',
         'service': 'CertGuard System',
         'version': '1.0.0',
+        'services': get_registry_stats(),
         'timestamp': datetime.utcnow().isoformat()
     }
 
@@ -2,19 +2,20 @@
 
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
-import json
+import asyncio
 import logging
 from typing import Dict, Any
 
-from ..services.audit_analyzer import AuditAnalyzer, SecurityEvent
-from ..services.nvidia_lucia_ai import LuciaAI
+from ..services.audit_analyzer import SecurityEvent
+from ..services.registry import registry
+from ..services.nvidia_lucia_ai import lucia_ai
+from ..services.ai_context_compaction import ai_context_compactor
 
 audit_bp = Blueprint('audit', __name__, url_prefix='/api/audit')
 logger = logging.getLogger(__name__)
 
-# Inicializar analisador de auditoria
-analyzer = AuditAnalyzer()
-lucia_ai = LuciaAI()
+# Analisador de auditoria (banco, workers de detecção) inicializado no primeiro uso
+analyzer = registry.service("audit_analyzer")
 
 @audit_bp.route('/events', methods=['POST'])
 def log_security_event():
@@ -66,52 +67,14 @@ def get_security_events():
         days = int(request.args.get('days', 7))
         limit = int(request.args.get('limit', 100))
         
-        start_date = datetime.now() - timedelta(days=days)
-        
-        # Construir query
-        query = '''
-            SELECT id, user_id, event_type, ip_address, timestamp, 
-                   details, risk_score, anomaly_detected
-            FROM security_events 
-            WHERE timestamp > ?
-        '''
-        params = [start_date]
-        
-        if user_id:
-            query += ' AND user_id = ?'
-            params.append(user_id)
-        
-        if event_type:
-            query += ' AND event_type = ?'
-            params.append(event_type)
-        
-        if ip_address:
-            query += ' AND ip_address = ?'
-            params.append(ip_address)
-        
-        query += ' ORDER BY timestamp DESC LIMIT ?'
-        params.append(limit)
-        
-        # Executar query
-        import sqlite3
-        conn = sqlite3.connect(analyzer.db_path)
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        
-        events = []
-        for row in cursor.fetchall():
-            events.append({
-                'id': row[0],
-                'user_id': row[1],
-                'event_type': row[2],
-                'ip_address': row[3],
-                'timestamp': row[4],
-                'details': json.loads(row[5]),
-                'risk_score': row[6],
-                'anomaly_detected': bool(row[7])
-            })
-        
-        conn.close()
+        # Consulta roteada para as partições do período
+        events = analyzer.get_security_events(
+            days=days,
+            user_id=user_id,
+            event_type=event_type,
+            ip_address=ip_address,
+            limit=limit
+        )
         
         return jsonify({
             'success': True,
@@ -123,12 +86,98 @@ def get_security_events():
         logger.error(f"Erro ao obter eventos: {str(e)}")
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+@audit_bp.route('/detection/metrics', methods=['GET'])
+def get_detection_metrics():
+    """Métricas da fila de detecção assíncrona"""
+    try:
+        return jsonify({
+            'success': True,
+            'metrics': analyzer.get_detection_metrics()
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro ao obter métricas de detecção: {str(e)}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@audit_bp.route('/storage/partitions', methods=['GET'])
+def get_event_partitions():
+    """Listar partições mensais de eventos"""
+    try:
+        partitions = analyzer.get_partition_info()
+        
+        return jsonify({
+            'success': True,
+            'partitions': partitions,
+            'retention_months': analyzer.storage_config['retention_months']
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro ao listar partições: {str(e)}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@audit_bp.route('/storage/archive', methods=['POST'])
+def archive_event_partitions():
+    """Arquivar partições fora do período de retenção"""
+    try:
+        data = request.get_json(silent=True) or {}
+        retention_months = data.get('retention_months')
+        
+        archived = analyzer.archive_old_partitions(
+            int(retention_months) if retention_months is not None else None
+        )
+        
+        return jsonify({
+            'success': True,
+            'archived': archived,
+            'total': len(archived)
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro ao arquivar partições: {str(e)}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@audit_bp.route('/archive/events', methods=['GET'])
+def get_archived_events():
+    """Consultar eventos arquivados (investigações)"""
+    try:
+        start_date = request.args.get('start_date')
+        if not start_date:
+            return jsonify({'error': 'start_date é obrigatório'}), 400
+        
+        end_date = request.args.get('end_date')
+        
+        events = analyzer.query_archived_events(
+            start_date=datetime.fromisoformat(start_date),
+            end_date=datetime.fromisoformat(end_date) if end_date else None,
+            user_id=request.args.get('user_id'),
+            ip_address=request.args.get('ip_address'),
+            event_type=request.args.get('event_type'),
+            limit=int(request.args.get('limit', 1000))
+        )
+        
+        return jsonify({
+            'success': True,
+            'events': events,
+            'total': len(events)
+        })
+        
+    except ValueError:
+        return jsonify({'error': 'Data inválida'}), 400
+    except Exception as e:
+        logger.error(f"Erro ao consultar arquivo: {str(e)}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
 @audit_bp.route('/report', methods=['GET'])
 def generate_security_report():
     """Gerar relatório de segurança"""
     try:
         days = int(request.args.get('days', 7))
-        report = analyzer.generate_security_report(days)
+        use_snapshot = request.args.get('source') == 'snapshot'
+        
+        if use_snapshot and analyzer.snapshot_store is None:
+            return jsonify({'error': 'Snapshots não configurados (CERTGUARD_SNAPSHOT_DIR)'}), 400
+        
+        report = analyzer.generate_security_report(days, use_snapshot=use_snapshot)
         
         return jsonify({
             'success': True,
@@ -139,6 +188,22 @@ def generate_security_report():
         logger.error(f"Erro ao gerar relatório: {str(e)}")
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+@audit_bp.route('/snapshots', methods=['GET'])
+def get_snapshot_info():
+    """Listar snapshots colunares exportados"""
+    try:
+        if analyzer.snapshot_store is None:
+            return jsonify({'error': 'Snapshots não configurados (CERTGUARD_SNAPSHOT_DIR)'}), 404
+        
+        return jsonify({
+            'success': True,
+            'snapshots': analyzer.snapshot_store.get_snapshot_info()
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro ao listar snapshots: {str(e)}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
 @audit_bp.route('/user/<user_id>/timeline', methods=['GET'])
 def get_user_timeline(user_id):
     """Obter timeline de atividades do usuário"""
@@ -250,7 +315,7 @@ def lucia_security_query():
         security_context = get_security_context()
         
         # Fazer consulta à LucIA
-        response = lucia_ai.analyze_security_query(query, security_context)
+        response = ask_lucia(query, security_context, data.get('user_id'))
         
         # Registrar consulta como evento
         event = SecurityEvent(
@@ -289,7 +354,10 @@ def lucia_security_insights():
         alerts = analyzer.get_active_alerts()
         
         # Solicitar insights à LucIA
-        insights = lucia_ai.generate_security_insights(report, alerts)
+        insights = ask_lucia(
+            f"Gere insights de segurança sobre os últimos {days} dias: tendências, riscos prioritários e recomendações.",
+            {'relatorio': report, 'alertas_ativos': alerts}
+        )
         
         return jsonify({
             'success': True,
@@ -320,23 +388,8 @@ def get_dashboard_stats():
         # Eventos das últimas 24 horas
         start_24h = datetime.now() - timedelta(hours=24)
         
-        import sqlite3
-        conn = sqlite3.connect(analyzer.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT COUNT(*) FROM security_events 
-            WHERE timestamp > ?
-        ''', (start_24h,))
-        events_24h = cursor.fetchone()[0]
-        
-        cursor.execute('''
-            SELECT COUNT(*) FROM security_events 
-            WHERE timestamp > ? AND anomaly_detected = 1
-        ''', (start_24h,))
-        anomalies_24h = cursor.fetchone()[0]
-        
-        conn.close()
+        events_24h = analyzer.count_events(start_24h)
+        anomalies_24h = analyzer.count_events(start_24h, anomalies_only=True)
         
         return jsonify({
             'success': True,
@@ -358,6 +411,21 @@ def get_dashboard_stats():
         logger.error(f"Erro ao obter estatísticas: {str(e)}")
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+def ask_lucia(question: str, context: Dict[str, Any], user_id: str = None) -> str:
+    """Consulta a LucIA com dados de auditoria compactados no prompt"""
+    compacted, _ = ai_context_compactor.compact(context, lucia_ai.nvidia_configs['primary']['model'])
+    prompt = f"{question}\n\nDADOS DE AUDITORIA:\n{ai_context_compactor.render(compacted)}"
+    
+    loop = asyncio.new_event_loop()
+    try:
+        result = loop.run_until_complete(lucia_ai.process_security_query(prompt, user_id))
+    finally:
+        loop.close()
+    
+    if not result['success']:
+        raise RuntimeError(result.get('error', 'Falha na consulta à LucIA'))
+    return result['response']
+
 def get_security_context() -> Dict[str, Any]:
     """Obter contexto de segurança para LucIA"""
     try:
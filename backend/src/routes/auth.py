@@ -44,6 +44,18 @@ def token_required(f):
     
     return decorated
 
+def authenticated_organization_id():
+    """Organização do token JWT da requisição, se houver token válido (sem consultar o banco)"""
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    try:
+        data = jwt.decode(auth_header[7:], current_app.config['SECRET_KEY'], algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return None
+    organization_id = data.get('organization_id')
+    return str(organization_id) if organization_id is not None else None
+
 def admin_required(f):
     """Decorator para verificar se usuário é admin"""
     @wraps(f)
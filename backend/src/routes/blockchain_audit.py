@@ -6,7 +6,6 @@ Endpoints para sistema de auditoria imutável
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
 import asyncio
-import json
 from datetime import datetime, timedelta
 import logging
 
@@ -22,7 +21,7 @@ from ..services.blockchain_audit import (
 logger = logging.getLogger(__name__)
 
 # Blueprint para rotas de blockchain
-blockchain_bp = Blueprint('blockchain', __name__, url_prefix='/api/blockchain')
+blockchain_bp = Blueprint('blockchain_audit', __name__, url_prefix='/api/blockchain')
 
 @blockchain_bp.route('/health', methods=['GET'])
 @cross_origin()
@@ -556,25 +555,15 @@ def search_records():
         # Remove critérios vazios
         search_criteria = {k: v for k, v in search_criteria.items() if v is not None}
         
+        # Busca textual pelo índice invertido (antes do limite)
+        search_text = data.get('search_text')
+        
         # Executa busca
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-        results = loop.run_until_complete(get_audit_trail(search_criteria))
+        results = loop.run_until_complete(get_audit_trail({**search_criteria, "search_text": search_text}))
         loop.close()
         
-        # Busca adicional por texto nos detalhes (se especificado)
-        search_text = data.get('search_text')
-        if search_text:
-            search_text_lower = search_text.lower()
-            filtered_results = []
-            
-            for record in results:
-                details_str = json.dumps(record.get('details', {})).lower()
-                if search_text_lower in details_str:
-                    filtered_results.append(record)
-            
-            results = filtered_results
-        
         return jsonify({
             "status": "success",
             "data": {
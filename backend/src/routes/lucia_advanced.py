@@ -9,9 +9,12 @@ import asyncio
 import logging
 
 from ..services.lucia_security_ai import lucia_security_ai, get_security_insights
-from ..services.lucia_database_analyzer import lucia_db_analyzer, answer_security_question
 from ..services.nvidia_ai import nvidia_ai_service
 from ..services.blockchain_audit import record_audit
+from ..services.registry import registry
+from .sse import sse_response
+from .auth import authenticated_organization_id
+from ..services.ai_admission import set_ai_request_context
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
@@ -19,6 +22,19 @@ logger = logging.getLogger(__name__)
 
 lucia_advanced_bp = Blueprint('lucia_advanced', __name__)
 
+@lucia_advanced_bp.before_request
+def _ai_request_context():
+    """Organização das chamadas de IA (controle de admissão por organização)
+    
+    Vem do token autenticado: um valor enviado pelo cliente daria cota nova a cada
+    requisição. Sem token, as chamadas dividem o balde "default".
+    """
+    set_ai_request_context(authenticated_organization_id())
+
+
+# Analisador (pandas/numpy, banco SQLite) carregado no primeiro uso
+lucia_db_analyzer = registry.service("lucia_db_analyzer")
+
 @lucia_advanced_bp.route('/security/analyze', methods=['POST'])
 async def analyze_security_event():
     """Analisa evento de segurança em tempo real"""
@@ -111,13 +127,17 @@ async def analyze_user_behavior_endpoint():
         
         user_id = data.get('user_id')
         days = data.get('days', 30)
+        scan_mode = data.get('scan_mode')  # "snapshot" = modo analítico
         
         # Validação
         if days < 1 or days > 365:
             return jsonify({"error": "Período deve estar entre 1 e 365 dias"}), 400
         
+        if scan_mode not in (None, "single_pass", "multi_query", "snapshot"):
+            return jsonify({"error": "scan_mode inválido"}), 400
+        
         # Análise comportamental
-        analysis = await lucia_db_analyzer.analyze_user_behavior(user_id, days)
+        analysis = await lucia_db_analyzer.analyze_user_behavior(user_id, days, scan_mode=scan_mode)
         
         return jsonify({
             "success": True,
@@ -140,6 +160,15 @@ async def query_audit_logs_endpoint():
         start_date = data.get('start_date')
         end_date = data.get('end_date')
         severity = data.get('severity')
+        limit = data.get('limit', 1000)
+        cursor = data.get('cursor')
+        analysis_scope = data.get('analysis_scope', 'page')  # "window" = análise de todo o período
+        
+        if analysis_scope not in ("page", "window"):
+            return jsonify({"error": "analysis_scope inválido"}), 400
+        
+        if analysis_scope == "window" and not start_date:
+            return jsonify({"error": "analysis_scope 'window' requer start_date"}), 400
         
         # Consulta logs
         result = await lucia_db_analyzer.query_audit_logs(
@@ -147,7 +176,10 @@ async def query_audit_logs_endpoint():
             user_id=user_id,
             start_date=start_date,
             end_date=end_date,
-            severity=severity
+            severity=severity,
+            limit=limit,
+            cursor=cursor,
+            analysis_scope=analysis_scope
         )
         
         return jsonify({
@@ -174,7 +206,7 @@ async def ask_lucia_question():
         user_id = data.get('user_id')
         
         # Responde pergunta usando IA
-        answer = await answer_security_question(question, context)
+        answer = await lucia_db_analyzer.answer_security_question(question, context)
         
         # Registra consulta
         if user_id:
@@ -296,7 +328,8 @@ async def get_dashboard_metrics():
             "system_health": {
                 "status": "healthy",
                 "last_update": datetime.now().isoformat(),
-                "uptime_percentage": 99.97
+                "uptime_percentage": 99.97,
+                "analysis_cache": lucia_db_analyzer.get_cache_stats()
             }
         }
         
@@ -332,26 +365,7 @@ async def lucia_chat():
         }
         
         # Constrói prompt para chat
-        chat_prompt = f"""
-        Você é LucIA, a assistente de segurança inteligente do CertGuard AI.
-        Você está em uma conversa interativa com um usuário.
-        
-        MENSAGEM DO USUÁRIO: {message}
-        
-        CONTEXTO DA CONVERSA:
-        - ID da conversa: {conversation_id}
-        - Usuário: {user_id}
-        - Horário: {datetime.now().strftime('%H:%M:%S')}
-        
-        INSTRUÇÕES:
-        1. Responda de forma conversacional e amigável
-        2. Mantenha o foco em segurança, auditoria e certificados digitais
-        3. Se a pergunta for sobre dados específicos, ofereça-se para fazer análises
-        4. Se detectar algo urgente, destaque claramente
-        5. Seja proativa em sugerir ações ou verificações
-        
-        Responda em português brasileiro de forma natural e profissional.
-        """
+        chat_prompt = _build_chat_prompt(message, user_id, conversation_id)
         
         # Usa NVIDIA AI para resposta
         response = await nvidia_ai_service._make_api_request(
@@ -385,6 +399,73 @@ async def lucia_chat():
         logger.error(f"Erro no chat com LucIA: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@lucia_advanced_bp.route('/ai/chat/stream', methods=['POST'])
+def lucia_chat_stream():
+    """Chat interativo com LucIA em streaming (Server-Sent Events)"""
+    data = request.get_json()
+    
+    if not data or 'message' not in data:
+        return jsonify({"error": "Campo 'message' é obrigatório"}), 400
+    
+    message = data['message']
+    user_id = data.get('user_id', 'anonymous')
+    conversation_id = data.get('conversation_id', f"conv_{datetime.now().timestamp()}")
+    
+    def events():
+        for event in nvidia_ai_service.stream_completion(
+            _build_chat_prompt(message, user_id, conversation_id),
+            context="lucia_chat"
+        ):
+            if event["type"] == "done":
+                response = event.pop("response")
+                event["response_length"] = len(response["choices"][0]["message"]["content"])
+                event["conversation_id"] = conversation_id
+            yield event
+    
+    def audit(done):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(
+            record_audit(
+                user_id=user_id,
+                action="lucia_chat",
+                resource_type="ai_conversation",
+                resource_id=conversation_id,
+                details={
+                    "message": message,
+                    "response_length": done["response_length"],
+                    "conversation_id": conversation_id,
+                    "streamed": True
+                }
+            )
+        )
+        loop.close()
+    
+    return sse_response(events(), on_done=audit)
+
+def _build_chat_prompt(message: str, user_id: str, conversation_id: str) -> str:
+    """Prompt do chat interativo com a LucIA"""
+    return f"""
+        Você é LucIA, a assistente de segurança inteligente do CertGuard AI.
+        Você está em uma conversa interativa com um usuário.
+        
+        MENSAGEM DO USUÁRIO: {message}
+        
+        CONTEXTO DA CONVERSA:
+        - ID da conversa: {conversation_id}
+        - Usuário: {user_id}
+        - Horário: {datetime.now().strftime('%H:%M:%S')}
+        
+        INSTRUÇÕES:
+        1. Responda de forma conversacional e amigável
+        2. Mantenha o foco em segurança, auditoria e certificados digitais
+        3. Se a pergunta for sobre dados específicos, ofereça-se para fazer análises
+        4. Se detectar algo urgente, destaque claramente
+        5. Seja proativa em sugerir ações ou verificações
+        
+        Responda em português brasileiro de forma natural e profissional.
+        """
+
 @lucia_advanced_bp.route('/monitoring/realtime', methods=['GET'])
 async def get_realtime_monitoring():
     """Obtém dados de monitoramento em tempo real"""
@@ -448,6 +529,23 @@ async def get_realtime_monitoring():
         logger.error(f"Erro no monitoramento em tempo real: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@lucia_advanced_bp.route('/database/query-stats', methods=['GET'])
+def get_database_query_stats():
+    """Estatísticas das consultas da LucIA ao banco (lentas e mais custosas)"""
+    try:
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+        slow_only = request.args.get('slow_only', 'false').lower() in ('1', 'true', 'yes')
+        
+        return jsonify({
+            "success": True,
+            "query_stats": lucia_db_analyzer.get_query_stats(limit=limit, slow_only=slow_only),
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro ao obter estatísticas de consultas: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 def register_lucia_advanced_routes(app):
     """Registra rotas avançadas da LucIA"""
     app.register_blueprint(lucia_advanced_bp, url_prefix='/api/lucia/advanced')
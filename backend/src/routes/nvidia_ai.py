@@ -19,6 +19,10 @@ from ..services.nvidia_ai import (
     analyze_contract
 )
 from ..services.blockchain_audit import record_audit
+from .sse import sse_response
+from .auth import authenticated_organization_id
+from ..services.ai_admission import set_ai_request_context, AI_PRIORITY
+from ..services.ai_batch_jobs import ai_batch_jobs
 
 # Configuração de logging
 logger = logging.getLogger(__name__)
@@ -26,6 +30,16 @@ logger = logging.getLogger(__name__)
 # Blueprint para rotas da NVIDIA AI
 nvidia_ai_bp = Blueprint('nvidia_ai', __name__, url_prefix='/api/nvidia-ai')
 
+@nvidia_ai_bp.before_request
+def _ai_request_context():
+    """Organização das chamadas de IA (controle de admissão por organização)
+    
+    Vem do token autenticado: um valor enviado pelo cliente daria cota nova a cada
+    requisição. Sem token, as chamadas dividem o balde "default".
+    """
+    set_ai_request_context(authenticated_organization_id())
+
+
 @nvidia_ai_bp.route('/health', methods=['GET'])
 @cross_origin()
 def health_check():
@@ -118,6 +132,52 @@ def analyze_document_endpoint():
             "timestamp": datetime.now().isoformat()
         }), 500
 
+@nvidia_ai_bp.route('/analyze-document/stream', methods=['POST'])
+@cross_origin()
+def analyze_document_stream_endpoint():
+    """Análise de documento jurídico em streaming (Server-Sent Events)"""
+    data = request.get_json()
+    
+    # Validação de entrada
+    if not data or 'document_text' not in data:
+        return jsonify({
+            "status": "error",
+            "message": "Campo 'document_text' é obrigatório"
+        }), 400
+    
+    document_text = data['document_text']
+    document_type = data.get('document_type', 'generic')
+    user_id = data.get('user_id', 'anonymous')
+    
+    # Validação de tamanho
+    if len(document_text) > 50000:
+        return jsonify({
+            "status": "error",
+            "message": "Documento muito grande. Máximo 50.000 caracteres."
+        }), 400
+    
+    def audit(done):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(
+            record_audit(
+                user_id=user_id,
+                action="document_analysis",
+                resource_type="document",
+                resource_id=f"doc_{datetime.now().timestamp()}",
+                details={
+                    "document_type": document_type,
+                    "document_length": len(document_text),
+                    "model_used": done.get("model_used"),
+                    "confidence": done["analysis"].get("confidence"),
+                    "streamed": True
+                }
+            )
+        )
+        loop.close()
+    
+    return sse_response(nvidia_ai_service.stream_legal_analysis(document_text, document_type), on_done=audit)
+
 @nvidia_ai_bp.route('/generate-petition', methods=['POST'])
 @cross_origin()
 def generate_petition_endpoint():
@@ -471,8 +531,21 @@ def clear_cache_endpoint():
     try:
         data = request.get_json() or {}
         user_id = data.get('user_id', 'anonymous')
+        context = data.get('context')
+        model = data.get('model')
+        older_than = data.get('older_than_seconds')
         
-        nvidia_ai_service.clear_cache()
+        if older_than is not None:
+            try:
+                older_than = float(older_than)
+            except (TypeError, ValueError):
+                return jsonify({
+                    "status": "error",
+                    "message": "older_than_seconds deve ser numérico",
+                    "timestamp": datetime.now().isoformat()
+                }), 400
+        
+        removed = nvidia_ai_service.clear_cache(context=context, model=model, older_than=older_than)
         
         # Registra auditoria
         loop = asyncio.new_event_loop()
@@ -483,14 +556,20 @@ def clear_cache_endpoint():
                 action="cache_clear",
                 resource_type="ai_cache",
                 resource_id="nvidia_cache",
-                details={"action": "cache_cleared"}
+                details={
+                    "action": "cache_cleared",
+                    "context": context,
+                    "model": model,
+                    "older_than_seconds": older_than,
+                    "removed_entries": removed
+                }
             )
         )
         loop.close()
         
         return jsonify({
             "status": "success",
-            "data": {"message": "Cache limpo com sucesso"},
+            "data": {"message": "Cache limpo com sucesso", "removed_entries": removed},
             "timestamp": datetime.now().isoformat()
         }), 200
         
@@ -502,6 +581,115 @@ def clear_cache_endpoint():
             "timestamp": datetime.now().isoformat()
         }), 500
 
+@nvidia_ai_bp.route('/batch-jobs', methods=['POST'])
+@cross_origin()
+def submit_batch_job_endpoint():
+    """Cria job de análise em lote (processamento assíncrono com concorrência limitada)"""
+    try:
+        data = request.get_json()
+        
+        # Validação de entrada
+        if not data or 'documents' not in data:
+            return jsonify({
+                "status": "error",
+                "message": "Campo 'documents' é obrigatório"
+            }), 400
+        
+        job = ai_batch_jobs.submit(
+            data['documents'],
+            user_id=data.get('user_id', 'anonymous'),
+            organization_id=authenticated_organization_id(),
+            concurrency=data.get('concurrency')
+        )
+        
+        return jsonify({
+            "status": "success",
+            "data": {
+                **job,
+                "status_url": f"/api/nvidia-ai/batch-jobs/{job['job_id']}",
+                "stream_url": f"/api/nvidia-ai/batch-jobs/{job['job_id']}/stream"
+            },
+            "timestamp": datetime.now().isoformat()
+        }), 202
+        
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Erro ao criar job em lote: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": str(e),
+            "timestamp": datetime.now().isoformat()
+        }), 500
+
+@nvidia_ai_bp.route('/batch-jobs/<job_id>', methods=['GET'])
+@cross_origin()
+def get_batch_job_endpoint(job_id):
+    """Progresso do job e resultados parciais (paginados)"""
+    try:
+        include_results = request.args.get('include_results', 'true').lower() == 'true'
+        offset = max(0, request.args.get('offset', 0, type=int))
+        limit = min(max(1, request.args.get('limit', 100, type=int)), 500)
+        
+        job = ai_batch_jobs.get_job(job_id, include_results=include_results, offset=offset, limit=limit)
+        if job is None:
+            return jsonify({
+                "status": "error",
+                "message": "Job não encontrado"
+            }), 404
+        
+        return jsonify({
+            "status": "success",
+            "data": job,
+            "timestamp": datetime.now().isoformat()
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao consultar job em lote: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": str(e),
+            "timestamp": datetime.now().isoformat()
+        }), 500
+
+@nvidia_ai_bp.route('/batch-jobs/<job_id>/stream', methods=['GET'])
+@cross_origin()
+def stream_batch_job_endpoint(job_id):
+    """Resultados do job em streaming (Server-Sent Events) à medida que os documentos terminam"""
+    if ai_batch_jobs.get_job(job_id) is None:
+        return jsonify({
+            "status": "error",
+            "message": "Job não encontrado"
+        }), 404
+    
+    return sse_response(ai_batch_jobs.iter_events(job_id))
+
+@nvidia_ai_bp.route('/batch-jobs/<job_id>', methods=['DELETE'])
+@cross_origin()
+def cancel_batch_job_endpoint(job_id):
+    """Cancela um job não finalizado (em qualquer worker)"""
+    job = ai_batch_jobs.get_job(job_id)
+    if job is None:
+        return jsonify({
+            "status": "error",
+            "message": "Job não encontrado"
+        }), 404
+    
+    if job["finished"] or not ai_batch_jobs.cancel(job_id):
+        return jsonify({
+            "status": "error",
+            "message": "Job já finalizado"
+        }), 409
+    
+    return jsonify({
+        "status": "success",
+        "data": {"job_id": job_id, "message": "Cancelamento solicitado"},
+        "timestamp": datetime.now().isoformat()
+    }), 202
+
 @nvidia_ai_bp.route('/batch-analyze', methods=['POST'])
 @cross_origin()
 def batch_analyze_endpoint():
@@ -531,7 +719,8 @@ def batch_analyze_endpoint():
                 "message": "Máximo 10 documentos por lote"
             }), 400
         
-        # Processa documentos em lote
+        # Processa documentos em lote (prioridade menor que as chamadas interativas)
+        AI_PRIORITY.set("batch")
         results = []
         
         for i, doc in enumerate(documents):
@@ -0,0 +1,46 @@
+"""
+CertGuard AI - Respostas Server-Sent Events
+Converte os eventos de streaming dos serviços de IA em text/event-stream
+"""
+
+import json
+import logging
+from typing import Dict, Any, Iterable, Callable, Optional
+
+from flask import Response, stream_with_context
+
+logger = logging.getLogger(__name__)
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Formata um evento SSE com payload JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def sse_response(events: Iterable[Dict[str, Any]],
+                 on_done: Optional[Callable[[Dict[str, Any]], None]] = None) -> Response:
+    """Resposta em streaming: cada item {"type": ..., ...} vira um evento SSE
+
+    Erros durante o streaming viram um evento "error" (o status 200 já foi enviado).
+    `on_done` recebe o evento final, ex.: para registrar auditoria.
+    """
+    def generate():
+        try:
+            for item in events:
+                item = dict(item)
+                event = item.pop("type")
+                if event == "done" and on_done is not None:
+                    on_done(item)
+                yield sse_event(event, item)
+        except Exception as e:
+            logger.error(f"Erro no streaming: {str(e)}")
+            yield sse_event("error", {"message": str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # proxies (nginx) não devem acumular o corpo
+        }
+    )
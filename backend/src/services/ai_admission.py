@@ -0,0 +1,369 @@
+"""
+CertGuard AI - Controle de admissão das chamadas às APIs de IA
+Token buckets (requisições/min e tokens/min) globais e por organização, com
+fila de prioridade: chat interativo passa à frente de análises em lote
+"""
+
+import math
+import time
+import asyncio
+import logging
+import threading
+import itertools
+import concurrent.futures
+from collections import deque, OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+
+from .registry import registry
+from .ai_http_client import latency_percentiles
+
+logger = logging.getLogger(__name__)
+
+# Limites de admissão (o global acompanha o limite da conta no upstream)
+ADMISSION_CONFIG = {
+    "global_requests_per_minute": 60,
+    "global_tokens_per_minute": 120000,
+    "org_requests_per_minute": 30,
+    "org_tokens_per_minute": 60000,
+    "org_idle_seconds": 120,        # baldes ociosos (já cheios após 60s) são descartados
+    "max_organizations": 1000,      # baldes de organização em memória (LRU)
+    "chars_per_token": 4,           # estimativa de tokens do prompt
+    "max_queue": 500,               # requisições aguardando (acima disso, rejeita)
+    "max_wait_seconds": 60,         # espera máxima na fila
+    "wait_window": 1000             # últimas esperas usadas nos percentis
+}
+
+# Menor valor = maior prioridade
+PRIORITIES = {"interactive": 0, "standard": 1, "batch": 2}
+
+# Prioridade padrão por contexto de requisição (demais: "standard")
+CONTEXT_PRIORITIES = {
+    "lucia_chat": "interactive",
+    "health_check": "interactive"
+}
+
+# Organização e prioridade da requisição atual (definidas pelas rotas)
+AI_ORGANIZATION: ContextVar[Optional[str]] = ContextVar("ai_organization", default=None)
+AI_PRIORITY: ContextVar[Optional[str]] = ContextVar("ai_priority", default=None)
+
+
+def set_ai_request_context(organization_id: str = None, priority: str = None):
+    """Organização e prioridade das chamadas de IA da requisição atual"""
+    AI_ORGANIZATION.set(organization_id)
+    AI_PRIORITY.set(priority)
+
+
+class AdmissionRejectedError(Exception):
+    """Fila cheia ou espera acima do limite"""
+
+
+class TokenBucket:
+    """Balde com reposição contínua de `per_minute` unidades por minuto"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Segundos até haver `amount` disponível (0 = agora)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)  # pedido maior que o balde: espera o balde cheio
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level = max(-self.capacity, min(self.capacity, self.level - min(amount, self.capacity)))
+
+
+class RateLimit:
+    """Par de baldes: requisições/min e tokens/min"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.last_used = time.monotonic()
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        return max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+    def take(self, tokens: int, now: float):
+        self.requests.take(1, now)
+        self.tokens.take(tokens, now)
+
+
+@dataclass
+class AdmissionTicket:
+    organization_id: str
+    priority: str
+    estimated_tokens: int
+    wait_seconds: float = 0.0
+
+
+@dataclass
+class _Waiter:
+    priority: int
+    seq: int
+    ticket: AdmissionTicket
+    enqueued_at: float
+    future: concurrent.futures.Future = field(default_factory=concurrent.futures.Future)
+
+
+class AIAdmissionController:
+    """Fila de prioridade com token buckets, compartilhada pelos event loops das requisições
+
+    Um despachante em thread libera as requisições em ordem de prioridade assim que
+    os baldes da organização e o global permitem. Um pedido bloqueado só pelo balde
+    da própria organização não segura os das demais.
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = {**ADMISSION_CONFIG, **(config or {})}
+        self._global = RateLimit(self.config["global_requests_per_minute"], self.config["global_tokens_per_minute"])
+        self._orgs: "OrderedDict[str, RateLimit]" = OrderedDict()
+        self._org_overrides: Dict[str, Tuple[float, float]] = {}
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        self._waits = {name: deque(maxlen=self.config["wait_window"]) for name in PRIORITIES}
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+            "estimated_tokens": 0,
+            "actual_tokens": 0,
+            "organizations_evicted": 0
+        }
+
+    def estimate_tokens(self, payload: Dict[str, Any]) -> int:
+        """Tokens estimados do prompt (todas as mensagens)"""
+        chars = sum(len(message.get("content") or "") for message in payload.get("messages", []))
+        return max(1, math.ceil(chars / self.config["chars_per_token"]))
+
+    def resolve_priority(self, context: str = None) -> str:
+        """Prioridade explícita da requisição, senão a padrão do contexto"""
+        priority = AI_PRIORITY.get() or CONTEXT_PRIORITIES.get(context, "standard")
+        return priority if priority in PRIORITIES else "standard"
+
+    def set_organization_limits(self, organization_id: str, requests_per_minute: float, tokens_per_minute: float):
+        """Limites específicos de uma organização (padrão: org_* da configuração)"""
+        with self._cond:
+            self._org_overrides[organization_id] = (requests_per_minute, tokens_per_minute)
+            self._orgs[organization_id] = RateLimit(requests_per_minute, tokens_per_minute)
+            self._cond.notify()
+
+    def set_global_limits(self, requests_per_minute: float, tokens_per_minute: float):
+        """Limites globais (ex.: conta com cota maior, ou benchmark contra o servidor mock)"""
+        with self._cond:
+            self.config["global_requests_per_minute"] = requests_per_minute
+            self.config["global_tokens_per_minute"] = tokens_per_minute
+            self._global = RateLimit(requests_per_minute, tokens_per_minute)
+            self._cond.notify()
+
+    def _org_limit(self, organization_id: str) -> RateLimit:
+        """Baldes da organização (chamar com self._cond adquirido)"""
+        now = time.monotonic()
+        limit = self._orgs.get(organization_id)
+        if limit is None:
+            limit = self._orgs[organization_id] = RateLimit(*self._org_overrides.get(
+                organization_id, (self.config["org_requests_per_minute"], self.config["org_tokens_per_minute"])
+            ))
+            self._evict_organizations(now, keep=organization_id)
+        else:
+            self._orgs.move_to_end(organization_id)
+        limit.last_used = now
+        return limit
+
+    def _evict_organizations(self, now: float, keep: str):
+        """Descarta baldes ociosos (ou os menos usados acima do limite), exceto os com pedidos na fila
+        
+        Um balde ocioso por mais de 60s já está cheio: recriá-lo depois não concede cota extra.
+        """
+        waiting = {waiter.ticket.organization_id for waiter in self._waiters if not waiter.future.done()}
+        for organization_id in list(self._orgs):
+            limit = self._orgs[organization_id]
+            if len(self._orgs) <= self.config["max_organizations"] and \
+                    now - limit.last_used <= self.config["org_idle_seconds"]:
+                break  # ordem LRU: os seguintes foram usados mais recentemente
+            if organization_id == keep or organization_id in waiting:
+                continue
+            del self._orgs[organization_id]
+            self.stats["organizations_evicted"] += 1
+
+    async def admit(self, estimated_tokens: int, context: str = None) -> AdmissionTicket:
+        """Aguarda (sem bloquear o event loop) a liberação da chamada upstream"""
+        future = self._enqueue(estimated_tokens, context)
+        if future.done():
+            return future.result()
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.config["max_wait_seconds"])
+        except asyncio.TimeoutError:
+            return self._expire(future)
+        except asyncio.CancelledError:
+            if not future.cancel():
+                self.settle(future.result(), 0)  # liberado no mesmo instante: devolve a reserva
+            raise
+
+    def admit_blocking(self, estimated_tokens: int, context: str = None) -> AdmissionTicket:
+        """Versão bloqueante de admit() para código síncrono (ex.: geradores de streaming)"""
+        future = self._enqueue(estimated_tokens, context)
+        try:
+            return future.result(timeout=self.config["max_wait_seconds"])
+        except concurrent.futures.TimeoutError:
+            return self._expire(future)
+
+    def _expire(self, future: concurrent.futures.Future) -> AdmissionTicket:
+        if not future.cancel():
+            return future.result()  # liberado no mesmo instante do timeout
+        self.stats["rejected_timeout"] += 1
+        raise AdmissionRejectedError(
+            f"Tempo de espera na fila de IA excedido ({self.config['max_wait_seconds']}s)"
+        )
+
+    def _enqueue(self, estimated_tokens: int, context: str) -> concurrent.futures.Future:
+        ticket = AdmissionTicket(
+            organization_id=AI_ORGANIZATION.get() or "default",
+            priority=self.resolve_priority(context),
+            estimated_tokens=estimated_tokens
+        )
+        now = time.monotonic()
+        waiter = _Waiter(PRIORITIES[ticket.priority], next(self._seq), ticket, now)
+
+        with self._cond:
+            # Caminho rápido: fila vazia e baldes com saldo
+            org_limit = self._org_limit(ticket.organization_id)
+            if not self._waiters and org_limit.wait_time(estimated_tokens, now) == 0 and \
+                    self._global.wait_time(estimated_tokens, now) == 0:
+                waiter.future.set_running_or_notify_cancel()
+                self._grant(waiter, org_limit, now)
+                return waiter.future
+
+            if len(self._waiters) >= self.config["max_queue"]:
+                self.stats["rejected_queue_full"] += 1
+                raise AdmissionRejectedError(f"Fila de IA cheia ({self.config['max_queue']} requisições aguardando)")
+
+            self._waiters.append(waiter)
+            self.stats["queued"] += 1
+            self._ensure_dispatcher()
+            self._cond.notify()
+        return waiter.future
+
+    def _grant(self, waiter: _Waiter, org_limit: RateLimit, now: float):
+        ticket = waiter.ticket
+        org_limit.take(ticket.estimated_tokens, now)
+        self._global.take(ticket.estimated_tokens, now)
+        ticket.wait_seconds = now - waiter.enqueued_at
+        self._waits[ticket.priority].append(ticket.wait_seconds)
+        self.stats["admitted"] += 1
+        self.stats["estimated_tokens"] += ticket.estimated_tokens
+        waiter.future.set_result(ticket)
+
+    def _ensure_dispatcher(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._closed = False
+            self._thread = threading.Thread(target=self._dispatch_loop, name="ai-admission", daemon=True)
+            self._thread.start()
+
+    def _dispatch_loop(self):
+        """Libera a fila em ordem de prioridade conforme os baldes repõem"""
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                next_wake, remaining, global_blocked = None, [], False
+
+                for waiter in sorted(self._waiters, key=lambda w: (w.priority, w.seq)):
+                    if waiter.future.done():
+                        continue  # expirou ou foi cancelado
+                    if global_blocked:
+                        remaining.append(waiter)
+                        continue
+
+                    tokens = waiter.ticket.estimated_tokens
+                    org_limit = self._org_limit(waiter.ticket.organization_id)
+                    org_wait = org_limit.wait_time(tokens, now)
+                    global_wait = self._global.wait_time(tokens, now)
+                    if org_wait == 0 and global_wait == 0:
+                        if waiter.future.set_running_or_notify_cancel():
+                            self._grant(waiter, org_limit, now)
+                        continue
+
+                    remaining.append(waiter)
+                    wait = max(org_wait, global_wait)
+                    next_wake = wait if next_wake is None else min(next_wake, wait)
+                    # Sem saldo global: prioridades menores não furam a fila
+                    global_blocked = global_wait > 0
+
+                self._waiters = remaining
+                self._cond.wait(timeout=next_wake)
+
+    def settle(self, ticket: AdmissionTicket, actual_tokens: int):
+        """Ajusta os baldes com os tokens reais (usage.total_tokens) da resposta"""
+        difference = actual_tokens - ticket.estimated_tokens
+        self.stats["actual_tokens"] += actual_tokens
+        if not difference:
+            return
+        now = time.monotonic()
+        with self._cond:
+            self._org_limit(ticket.organization_id).tokens.take(difference, now)
+            self._global.tokens.take(difference, now)
+            if difference < 0:
+                self._cond.notify()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Tempo de espera na fila por prioridade, fila atual e saldo dos baldes"""
+        now = time.monotonic()
+        with self._cond:
+            depth = {name: 0 for name in PRIORITIES}
+            for waiter in self._waiters:
+                if not waiter.future.done():
+                    depth[waiter.ticket.priority] += 1
+            self._global.wait_time(0, now)  # atualiza os saldos
+            for limit in self._orgs.values():
+                limit.wait_time(0, now)
+            organizations = {
+                name: {"requests_available": round(limit.requests.level, 1), "tokens_available": round(limit.tokens.level)}
+                for name, limit in self._orgs.items()
+            }
+
+        all_waits = [wait for waits in self._waits.values() for wait in waits]
+        return {
+            **self.stats,
+            "queue_depth": depth,
+            "queue_wait_ms": latency_percentiles(all_waits),
+            "queue_wait_ms_by_priority": {name: latency_percentiles(waits) for name, waits in self._waits.items()},
+            "global": {
+                "requests_available": round(self._global.requests.level, 1),
+                "tokens_available": round(self._global.tokens.level),
+                "requests_per_minute": self.config["global_requests_per_minute"],
+                "tokens_per_minute": self.config["global_tokens_per_minute"]
+            },
+            "organizations": organizations
+        }
+
+    def close(self):
+        """Encerra o despachante; requisições na fila são rejeitadas"""
+        with self._cond:
+            self._closed = True
+            waiters, self._waiters = self._waiters, []
+            self._cond.notify()
+        for waiter in waiters:
+            if waiter.future.set_running_or_notify_cancel():
+                waiter.future.set_exception(AdmissionRejectedError("Controle de admissão encerrado"))
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# Instância global do controle de admissão
+ai_admission = registry.service("ai_admission")
@@ -0,0 +1,470 @@
+"""
+CertGuard AI - Jobs de análise de documentos em lote
+Um job recebe N documentos e os analisa com concorrência limitada pelo serviço
+de IA (cache, coalescência, roteamento e admissão com prioridade "batch"),
+com progresso, resultados parciais e novas tentativas por documento.
+O estado fica em SQLite para que qualquer worker responda às consultas e
+peça cancelamento; o job roda no worker que o aceitou, que mantém um
+heartbeat (updated_at). Jobs sem heartbeat são retomados por outro worker.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterator
+
+from .registry import registry
+from .ai_admission import set_ai_request_context
+from .nvidia_ai import nvidia_ai_service
+from .blockchain_audit import record_audit
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros dos jobs em lote
+BATCH_JOB_CONFIG = {
+    "max_documents": 1000,          # documentos por job
+    "max_document_chars": 50000,    # mesmo limite de /analyze-document
+    "default_concurrency": 8,
+    "max_concurrency": 32,
+    "max_attempts": 3,              # tentativas por documento
+    "retry_backoff_seconds": 2.0,   # espera base entre tentativas (exponencial)
+    "retention_hours": 24,          # jobs finalizados são removidos depois disso
+    "heartbeat_seconds": 5,         # intervalo de atualização de updated_at durante a execução
+    "stale_after_seconds": 60,      # sem heartbeat por mais que isso: worker considerado morto
+    "max_recoveries": 1             # retomadas após queda do worker; depois, o job falha
+}
+
+PENDING, RUNNING, SUCCEEDED, FAILED, CANCELLED = "pending", "running", "succeeded", "failed", "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class AIBatchJobManager:
+    """Fila e execução dos jobs de análise em lote"""
+
+    def __init__(self, db_path: str = None, config: Dict[str, Any] = None):
+        self.db_path = db_path or os.getenv("CERTGUARD_AI_JOBS_DB", "certguard_ai_jobs.db")
+        self.config = {**BATCH_JOB_CONFIG, **(config or {})}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.init_database()
+        self.recover_stale_jobs()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Cria as tabelas de jobs e documentos"""
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS ai_batch_jobs (
+                job_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                organization_id TEXT,
+                status TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                completed INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                concurrency INTEGER NOT NULL,
+                created_at TEXT NOT NULL,
+                started_at TEXT,
+                finished_at TEXT,
+                updated_at REAL NOT NULL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                recoveries INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS ai_batch_documents (
+                job_id TEXT NOT NULL,
+                doc_index INTEGER NOT NULL,
+                document_id TEXT,
+                document_type TEXT NOT NULL,
+                document_text TEXT,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                processing_time REAL,
+                finished_seq INTEGER,
+                PRIMARY KEY (job_id, doc_index)
+            );
+            CREATE INDEX IF NOT EXISTS idx_ai_batch_docs_finished ON ai_batch_documents(job_id, finished_seq);
+        """)
+
+        # Bancos criados antes do heartbeat não têm as colunas novas
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(ai_batch_jobs)").fetchall()}
+        for column in ("cancel_requested", "recoveries"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE ai_batch_jobs ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+        conn.commit()
+        conn.close()
+
+    def submit(self, documents: List[Dict[str, Any]], user_id: str = "anonymous",
+               organization_id: str = None, concurrency: int = None) -> Dict[str, Any]:
+        """Registra o job e agenda a execução; retorna o job (status pending)"""
+        if not isinstance(documents, list) or not documents:
+            raise ValueError("Campo 'documents' deve ser uma lista não vazia")
+        if len(documents) > self.config["max_documents"]:
+            raise ValueError(f"Máximo {self.config['max_documents']} documentos por job")
+
+        concurrency = int(concurrency or self.config["default_concurrency"])
+        concurrency = max(1, min(concurrency, self.config["max_concurrency"]))
+
+        job_id = f"job_{uuid.uuid4().hex[:16]}"
+        rows = []
+        for index, document in enumerate(documents):
+            document = document if isinstance(document, dict) else {}
+            text = document.get("text")
+            error = None
+            if not isinstance(text, str) or not text:
+                error = "Campo 'text' obrigatório"
+            elif len(text) > self.config["max_document_chars"]:
+                error = f"Documento muito grande. Máximo {self.config['max_document_chars']} caracteres."
+            rows.append((
+                job_id, index, document.get("id"), document.get("type", "generic"),
+                None if error else text, FAILED if error else PENDING, error
+            ))
+
+        invalid = sum(1 for row in rows if row[5] == FAILED)
+        conn = self._connect()
+        conn.execute("""
+            INSERT INTO ai_batch_jobs (job_id, user_id, organization_id, status, total, failed, concurrency, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (job_id, user_id, organization_id, PENDING, len(rows), invalid, concurrency,
+              datetime.now().isoformat(), time.time()))
+        conn.executemany("""
+            INSERT INTO ai_batch_documents (job_id, doc_index, document_id, document_type, document_text, status, error)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+        conn.close()
+
+        self._purge_expired()
+        self._schedule(job_id, user_id, organization_id, concurrency)
+        logger.info(f"Job em lote {job_id} agendado: {len(rows)} documentos, concorrência {concurrency}")
+        return self.get_job(job_id)
+
+    def _schedule(self, job_id: str, user_id: str, organization_id: str, concurrency: int):
+        future = asyncio.run_coroutine_threadsafe(
+            self._run_job(job_id, user_id, organization_id, concurrency), self._ensure_loop()
+        )
+        future.add_done_callback(lambda f: self._log_failure(job_id, f))
+
+    @staticmethod
+    def _log_failure(job_id: str, future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Job {job_id} interrompido: {str(future.exception())}")
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop dos jobs em uma thread daemon (iniciado no primeiro job)"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="ai-batch-jobs", daemon=True)
+                self._thread.start()
+                self._loop = loop
+        return self._loop
+
+    async def _run_job(self, job_id: str, user_id: str, organization_id: str, concurrency: int):
+        # Chamadas de IA do job entram na fila de admissão como "batch" da organização
+        set_ai_request_context(organization_id, "batch")
+        job_task = asyncio.current_task()
+
+        conn = self._connect()
+        heartbeat = None
+        try:
+            conn.execute("UPDATE ai_batch_jobs SET status = ?, started_at = COALESCE(started_at, ?), updated_at = ? WHERE job_id = ?",
+                         (RUNNING, datetime.now().isoformat(), time.time(), job_id))
+            conn.commit()
+            if self._cancel_requested(conn, job_id):
+                raise asyncio.CancelledError()
+            pending = conn.execute(
+                "SELECT doc_index, document_type, document_text FROM ai_batch_documents WHERE job_id = ? AND status = ? ORDER BY doc_index",
+                (job_id, PENDING)
+            ).fetchall()
+
+            heartbeat = asyncio.ensure_future(self._heartbeat(conn, job_id, job_task))
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def process(row):
+                async with semaphore:
+                    # Cancelamento pedido em qualquer worker é visto entre documentos
+                    if self._cancel_requested(conn, job_id):
+                        job_task.cancel()
+                        return
+                    await self._process_document(conn, job_id, row["doc_index"], row["document_type"], row["document_text"])
+
+            await asyncio.gather(*(process(row) for row in pending))
+            status = self._finish_job(conn, job_id)
+        except asyncio.CancelledError:
+            if not self._cancel_requested(conn, job_id):
+                # Encerramento do worker (close): o job volta para a fila e é retomado na recuperação
+                conn.execute("UPDATE ai_batch_documents SET status = ? WHERE job_id = ? AND status = ?",
+                             (PENDING, job_id, RUNNING))
+                conn.execute("UPDATE ai_batch_jobs SET status = ?, updated_at = 0 WHERE job_id = ?", (PENDING, job_id))
+                conn.commit()
+                raise
+            conn.execute("UPDATE ai_batch_documents SET status = ?, document_text = NULL WHERE job_id = ? AND status IN (?, ?)",
+                         (CANCELLED, job_id, PENDING, RUNNING))
+            conn.execute("UPDATE ai_batch_jobs SET status = ?, finished_at = ?, updated_at = ? WHERE job_id = ?",
+                         (CANCELLED, datetime.now().isoformat(), time.time(), job_id))
+            conn.commit()
+            status = CANCELLED
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            conn.close()
+
+        await self._audit_job(job_id, user_id, status)
+
+    async def _heartbeat(self, conn: sqlite3.Connection, job_id: str, job_task: asyncio.Task):
+        """Mantém updated_at recente enquanto o job roda e aplica cancelamentos pedidos por outros workers"""
+        while True:
+            await asyncio.sleep(self.config["heartbeat_seconds"])
+            conn.execute("UPDATE ai_batch_jobs SET updated_at = ? WHERE job_id = ?", (time.time(), job_id))
+            conn.commit()
+            if self._cancel_requested(conn, job_id):
+                job_task.cancel()
+                return
+
+    @staticmethod
+    def _cancel_requested(conn: sqlite3.Connection, job_id: str) -> bool:
+        row = conn.execute("SELECT cancel_requested FROM ai_batch_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    async def _process_document(self, conn: sqlite3.Connection, job_id: str, index: int,
+                                document_type: str, document_text: str):
+        """Analisa um documento, com novas tentativas e backoff exponencial"""
+        started = time.perf_counter()
+        conn.execute("UPDATE ai_batch_documents SET status = ? WHERE job_id = ? AND doc_index = ?", (RUNNING, job_id, index))
+        conn.commit()
+
+        result, attempts = None, 0
+        while attempts < self.config["max_attempts"]:
+            attempts += 1
+            result = await nvidia_ai_service.analyze_legal_document(document_text, document_type)
+            if result.get("success"):
+                break
+            if attempts < self.config["max_attempts"]:
+                logger.warning(f"Job {job_id} documento {index}: tentativa {attempts} falhou ({result.get('error')})")
+                await asyncio.sleep(self.config["retry_backoff_seconds"] * 2 ** (attempts - 1))
+
+        succeeded = bool(result.get("success"))
+        conn.execute("""
+            UPDATE ai_batch_documents
+            SET status = ?, attempts = ?, result = ?, error = ?, processing_time = ?, document_text = NULL,
+                finished_seq = (SELECT COALESCE(MAX(finished_seq), 0) + 1 FROM ai_batch_documents WHERE job_id = ?)
+            WHERE job_id = ? AND doc_index = ?
+        """, (SUCCEEDED if succeeded else FAILED, attempts,
+              json.dumps(result, ensure_ascii=False, default=str) if succeeded else None,
+              None if succeeded else result.get("error"), time.perf_counter() - started, job_id, job_id, index))
+        column = "completed" if succeeded else "failed"
+        conn.execute(f"UPDATE ai_batch_jobs SET {column} = {column} + 1, updated_at = ? WHERE job_id = ?",
+                     (time.time(), job_id))
+        conn.commit()
+
+    def _finish_job(self, conn: sqlite3.Connection, job_id: str) -> str:
+        completed = conn.execute("SELECT completed FROM ai_batch_jobs WHERE job_id = ?", (job_id,)).fetchone()[0]
+        status = SUCCEEDED if completed else FAILED
+        conn.execute("UPDATE ai_batch_jobs SET status = ?, finished_at = ?, updated_at = ? WHERE job_id = ?",
+                     (status, datetime.now().isoformat(), time.time(), job_id))
+        conn.commit()
+        return status
+
+    async def _audit_job(self, job_id: str, user_id: str, status: str):
+        """Um registro de auditoria por job (não por documento)"""
+        job = self.get_job(job_id)
+        try:
+            await record_audit(
+                user_id=user_id,
+                action="batch_analysis",
+                resource_type="document_batch",
+                resource_id=job_id,
+                details={
+                    "status": status,
+                    "total_documents": job["total"],
+                    "successful_analyses": job["completed"],
+                    "failed_analyses": job["failed"]
+                }
+            )
+        except Exception as e:
+            logger.error(f"Erro ao auditar job {job_id}: {str(e)}")
+
+    def get_job(self, job_id: str, include_results: bool = False, offset: int = 0,
+                limit: int = 100) -> Optional[Dict[str, Any]]:
+        """Status, progresso e (opcionalmente) uma página dos resultados por documento"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM ai_batch_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            updated_at = job.pop("updated_at")
+            job.pop("recoveries")
+            job["cancel_requested"] = bool(job["cancel_requested"])
+            done = job["completed"] + job["failed"]
+            job["progress"] = round(done / job["total"], 4) if job["total"] else 1.0
+            job["finished"] = job["status"] in FINISHED_STATES
+            # Sem heartbeat recente: o worker que executava o job parou
+            job["stale"] = not job["finished"] and time.time() - updated_at > self.config["stale_after_seconds"]
+
+            if include_results:
+                documents = conn.execute("""
+                    SELECT doc_index, document_id, document_type, status, attempts, result, error, processing_time
+                    FROM ai_batch_documents WHERE job_id = ? ORDER BY doc_index LIMIT ? OFFSET ?
+                """, (job_id, limit, offset)).fetchall()
+                job["documents"] = [self._document_dict(document) for document in documents]
+            return job
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _document_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        document = {key: row[key] for key in row.keys() if key not in ("result", "finished_seq")}
+        document["result"] = json.loads(row["result"]) if row["result"] else None
+        return document
+
+    def iter_events(self, job_id: str, poll_interval: float = 0.5) -> Iterator[Dict[str, Any]]:
+        """Eventos do job para streaming: cada documento concluído, progresso e o fim"""
+        last_seq = 0
+        while True:
+            job = self.get_job(job_id)
+            if job is None:
+                raise KeyError(f"Job não encontrado: {job_id}")
+
+            conn = self._connect()
+            try:
+                documents = conn.execute("""
+                    SELECT doc_index, document_id, document_type, status, attempts, result, error, processing_time, finished_seq
+                    FROM ai_batch_documents WHERE job_id = ? AND finished_seq > ? ORDER BY finished_seq
+                """, (job_id, last_seq)).fetchall()
+            finally:
+                conn.close()
+
+            for document in documents:
+                last_seq = document["finished_seq"]
+                yield {"type": "document", **self._document_dict(document)}
+            if documents:
+                yield {"type": "progress", **{key: job[key] for key in ("status", "total", "completed", "failed", "progress")}}
+
+            if job["finished"]:
+                yield {"type": "done", **job}
+                return
+            if job["stale"]:
+                yield {"type": "error", "message": "Job sem heartbeat do worker; será retomado ou encerrado na recuperação",
+                       **{key: job[key] for key in ("status", "total", "completed", "failed", "progress")}}
+                return
+            time.sleep(poll_interval)
+
+    def cancel(self, job_id: str) -> bool:
+        """Pede o cancelamento de um job não finalizado (vale para o job em qualquer worker)"""
+        conn = self._connect()
+        try:
+            requested = conn.execute(
+                "UPDATE ai_batch_jobs SET cancel_requested = 1 WHERE job_id = ? AND status IN (?, ?)",
+                (job_id, PENDING, RUNNING)
+            ).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        return requested == 1
+
+    def recover_stale_jobs(self) -> int:
+        """Retoma neste worker (ou encerra) jobs cujo worker parou de enviar heartbeat"""
+        cutoff = time.time() - self.config["stale_after_seconds"]
+        conn = self._connect()
+        resumed, recovered = [], 0
+        try:
+            stale = conn.execute("""
+                SELECT job_id, user_id, organization_id, concurrency, cancel_requested, recoveries
+                FROM ai_batch_jobs WHERE status IN (?, ?) AND updated_at < ?
+            """, (PENDING, RUNNING, cutoff)).fetchall()
+            for job in stale:
+                # Reivindicação atômica: só um worker retoma cada job
+                claimed = conn.execute("""
+                    UPDATE ai_batch_jobs SET updated_at = ?, recoveries = recoveries + 1
+                    WHERE job_id = ? AND status IN (?, ?) AND updated_at < ?
+                """, (time.time(), job["job_id"], PENDING, RUNNING, cutoff)).rowcount
+                conn.commit()
+                if not claimed:
+                    continue
+                recovered += 1
+
+                if job["cancel_requested"] or job["recoveries"] >= self.config["max_recoveries"]:
+                    status = CANCELLED if job["cancel_requested"] else FAILED
+                    unfinished = conn.execute("""
+                        UPDATE ai_batch_documents SET status = ?, error = ?, document_text = NULL
+                        WHERE job_id = ? AND status IN (?, ?)
+                    """, (status, None if status == CANCELLED else "Worker interrompido durante o job",
+                          job["job_id"], PENDING, RUNNING)).rowcount
+                    conn.execute("""
+                        UPDATE ai_batch_jobs SET status = ?, failed = failed + ?, finished_at = ?, updated_at = ?
+                        WHERE job_id = ?
+                    """, (status, unfinished if status == FAILED else 0, datetime.now().isoformat(),
+                          time.time(), job["job_id"]))
+                    conn.commit()
+                    logger.warning(f"Job {job['job_id']} sem heartbeat encerrado como {status}")
+                    continue
+
+                conn.execute("UPDATE ai_batch_documents SET status = ? WHERE job_id = ? AND status = ?",
+                             (PENDING, job["job_id"], RUNNING))
+                conn.execute("UPDATE ai_batch_jobs SET status = ? WHERE job_id = ?", (PENDING, job["job_id"]))
+                conn.commit()
+                resumed.append(job)
+        finally:
+            conn.close()
+
+        for job in resumed:
+            logger.warning(f"Job {job['job_id']} sem heartbeat retomado neste worker")
+            self._schedule(job["job_id"], job["user_id"], job["organization_id"], job["concurrency"])
+        return recovered
+
+    def _purge_expired(self):
+        """Remove jobs finalizados além do período de retenção e recupera jobs sem heartbeat"""
+        cutoff = time.time() - self.config["retention_hours"] * 3600
+        conn = self._connect()
+        expired = [row[0] for row in conn.execute(
+            f"SELECT job_id FROM ai_batch_jobs WHERE updated_at < ? AND status IN ({','.join('?' * len(FINISHED_STATES))})",
+            (cutoff, *FINISHED_STATES)
+        ).fetchall()]
+        for job_id in expired:
+            conn.execute("DELETE FROM ai_batch_documents WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM ai_batch_jobs WHERE job_id = ?", (job_id,))
+        conn.commit()
+        conn.close()
+        self.recover_stale_jobs()
+
+    def close(self, timeout: float = 5):
+        """Interrompe os jobs em execução (voltam para a fila) e encerra o loop"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+
+        async def cancel_jobs():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(cancel_jobs(), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Erro ao cancelar jobs em lote: {str(e)}")
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            if self._thread is not None:
+                self._thread.join(timeout)
+            loop.close()
+
+
+# Instância global do gerenciador de jobs
+ai_batch_jobs = registry.service("ai_batch_jobs")
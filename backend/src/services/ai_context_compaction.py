@@ -0,0 +1,218 @@
+"""
+CertGuard AI - Compactação do contexto dos prompts de segurança
+Listas de eventos/registros viram agregados (contagens, faixas, valores mais
+frequentes) mais as linhas de maior risco; campos repetidos em todas as linhas
+são declarados uma única vez. O resultado respeita um orçamento de tokens por
+modelo e o tamanho do prompt é reportado a cada requisição.
+"""
+
+import json
+import math
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Any, List, Tuple
+
+from .registry import registry
+
+logger = logging.getLogger(__name__)
+
+# Orçamento de contexto por modelo
+CONTEXT_BUDGET_CONFIG = {
+    "chars_per_token": 4,               # mesma estimativa da admissão (ai_admission)
+    "model_context_tokens": {           # janela de contexto de cada modelo
+        "meta/llama3-70b-instruct": 8192,
+        "meta/llama-3.3-70b-instruct": 131072
+    },
+    "default_context_tokens": 8192,
+    "context_share": 0.25,              # fração da janela para dados (resto: instruções e resposta)
+    "max_context_tokens": 2000,         # teto mesmo em janelas longas: latência e custo
+    "top_rows": 10,                     # linhas mantidas por lista (maior risco / mais recentes)
+    "top_values": 5,                    # valores mais frequentes por campo
+    "max_value_chars": 200              # textos longos em linhas mantidas são cortados
+}
+
+SEVERITY_RANK = {"critical": 3, "high": 2, "medium": 1, "low": 0}
+
+# Campos usados para ordenar linhas por relevância, nesta ordem
+RISK_FIELDS = ("risk_score", "severity")
+RECENCY_FIELDS = ("timestamp", "last_activity", "created_at")
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and not (
+        isinstance(value, float) and math.isnan(value)
+    )
+
+
+def _present(value: Any) -> bool:
+    return value not in (None, "", [], {}) and not (isinstance(value, float) and math.isnan(value))
+
+
+class AIContextCompactor:
+    """Resume dados de contexto para caber no orçamento de tokens do modelo"""
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = {**CONTEXT_BUDGET_CONFIG, **(config or {})}
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "original_tokens": 0,
+            "context_tokens": 0,
+            "truncated": 0
+        }
+
+    def estimate_tokens(self, text: str) -> int:
+        return math.ceil(len(text) / self.config["chars_per_token"])
+
+    def budget_for(self, model: str) -> int:
+        """Tokens de contexto permitidos para o modelo"""
+        window = self.config["model_context_tokens"].get(model, self.config["default_context_tokens"])
+        return min(self.config["max_context_tokens"], int(window * self.config["context_share"]))
+
+    def render(self, data: Any) -> str:
+        """JSON compacto (sem indentação: cada espaço é token pago)"""
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+    def compact(self, data: Dict[str, Any], model: str, budget_tokens: int = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Contexto compactado e relatório de tamanho (tokens estimados antes/depois)"""
+        budget = budget_tokens or self.budget_for(model)
+        original_tokens = self.estimate_tokens(self.render(data))
+
+        top_rows, top_values = self.config["top_rows"], self.config["top_values"]
+        while True:
+            compacted = self._compact_value(data, top_rows, top_values)
+            rendered = self.render(compacted)
+            if self.estimate_tokens(rendered) <= budget:
+                break
+            if top_rows:
+                top_rows //= 2
+            elif top_values > 1:
+                top_values = 1
+            else:
+                break
+
+        truncated = self.estimate_tokens(rendered) > budget
+        if truncated:
+            # Último recurso: nem os agregados cabem; o texto é cortado no orçamento
+            limit = budget * self.config["chars_per_token"] - len(self.render({"resumo_truncado": ""}))
+            compacted = {"resumo_truncado": rendered[:max(0, limit)]}
+
+        context_tokens = self.estimate_tokens(self.render(compacted))
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["original_tokens"] += original_tokens
+            self.stats["context_tokens"] += context_tokens
+            self.stats["truncated"] += int(truncated)
+
+        report = {
+            "model": model,
+            "budget_tokens": budget,
+            "original_tokens": original_tokens,
+            "context_tokens": context_tokens,
+            "rows_kept": top_rows,
+            "truncated": truncated
+        }
+        return compacted, report
+
+    def _compact_value(self, value: Any, top_rows: int, top_values: int) -> Any:
+        if isinstance(value, dict):
+            return {key: self._compact_value(item, top_rows, top_values) for key, item in value.items() if _present(item)}
+        if isinstance(value, (list, tuple)) and value and all(isinstance(row, dict) for row in value):
+            return self.compact_rows(list(value), top_rows, top_values)
+        if isinstance(value, (list, tuple)) and len(value) > top_values * 4:
+            return {"total": len(value), "amostra": list(value[:top_values * 4])}
+        return value
+
+    def compact_rows(self, rows: List[Dict[str, Any]], top_rows: int, top_values: int) -> Any:
+        """Agregados da lista + linhas mais relevantes sem os campos comuns a todas"""
+        fields: Dict[str, List[Any]] = {}
+        for row in rows:
+            for key, value in row.items():
+                if _present(value) and not isinstance(value, (dict, list)):
+                    fields.setdefault(key, []).append(value)
+
+        # Campos com o mesmo valor em todas as linhas são declarados uma vez
+        common = {
+            key: values[0] for key, values in fields.items()
+            if len(values) == len(rows) and len(rows) > 1 and all(v == values[0] for v in values)
+        }
+
+        limit = self.config["max_value_chars"]
+        ranked = [
+            {
+                key: (value[:limit] + "…" if isinstance(value, str) and len(value) > limit else value)
+                for key, value in row.items()
+                if key not in common and _present(value)
+            }
+            for row in self._rank(rows)[:top_rows]
+        ]
+        if len(rows) <= top_rows and not common:
+            return ranked  # lista pequena e sem repetição: nada a resumir
+
+        result: Dict[str, Any] = {"total": len(rows)}
+        if common:
+            result["comum"] = common
+
+        if len(rows) > top_rows:
+            aggregates = {}
+            for key, values in fields.items():
+                if key in common:
+                    continue
+                summary = self._aggregate(key, values, len(rows), top_values)
+                if summary:
+                    aggregates[key] = summary
+            result["agregados"] = aggregates
+
+        if top_rows:
+            result["principais"] = ranked
+            if len(rows) > top_rows:
+                result["omitidos"] = len(rows) - top_rows
+        return result
+
+    def _aggregate(self, key: str, values: List[Any], total: int, top_values: int) -> Dict[str, Any]:
+        if key == "id" or key.endswith("_id"):
+            return {"distintos": len(set(values))}
+        if all(_is_number(value) for value in values):
+            return {
+                "min": round(min(values), 3),
+                "media": round(sum(values) / len(values), 3),
+                "max": round(max(values), 3)
+            }
+        if key in RECENCY_FIELDS or key.endswith("_at"):
+            texts = [str(value) for value in values]
+            return {"primeiro": min(texts), "ultimo": max(texts)}
+
+        counts = Counter(str(value) for value in values)
+        if len(counts) == len(values) and len(values) == total:
+            return {"distintos": len(counts)}  # identificadores/textos livres: só a cardinalidade
+        return {"distintos": len(counts), "frequentes": dict(counts.most_common(top_values))}
+
+    def _rank(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Maior risco e mais recentes primeiro; sem esses campos, mantém a ordem da consulta"""
+        if not any(key in row for row in rows[:1] for key in RISK_FIELDS + RECENCY_FIELDS):
+            return rows
+
+        def key(row: Dict[str, Any]):
+            risk = row.get("risk_score")
+            recency = next((str(row[field]) for field in RECENCY_FIELDS if _present(row.get(field))), "")
+            return (
+                risk if _is_number(risk) else 0.0,
+                SEVERITY_RANK.get(str(row.get("severity", "")).lower(), -1),
+                recency
+            )
+
+        return sorted(rows, key=key, reverse=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            original = self.stats["original_tokens"]
+            return {
+                **self.stats,
+                "reduction": round(1 - self.stats["context_tokens"] / original, 4) if original else 0.0,
+                "max_context_tokens": self.config["max_context_tokens"]
+            }
+
+
+# Instância global do compactador
+ai_context_compactor = registry.service("ai_context_compactor")
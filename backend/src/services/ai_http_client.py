@@ -0,0 +1,282 @@
+"""
+CertGuard AI - Cliente HTTP com pool de conexões para as APIs de IA
+Sessão aiohttp de longa duração (keep-alive, limite por host, cache de DNS)
+com métricas de reuso de conexões, percentis de latência do upstream e
+streaming SSE com tempo até o primeiro token
+"""
+
+import json
+import time
+import queue
+import atexit
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Tuple, Optional, Iterator, Callable
+
+from .registry import registry, lazy_import
+
+aiohttp = lazy_import("aiohttp")
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros do pool de conexões
+HTTP_POOL_CONFIG = {
+    "limit": 100,               # conexões simultâneas no total
+    "limit_per_host": 64,       # por host (integrate.api.nvidia.com): cobre 50 consultas simultâneas da LucIA
+    "keepalive_timeout": 75,    # segundos que uma conexão ociosa fica no pool
+    "dns_cache_ttl": 300,       # segundos de cache de DNS
+    "latency_window": 1000      # últimas requisições usadas nos percentis
+}
+
+
+class AIHttpClient:
+    """Sessão HTTP compartilhada pelos serviços de IA
+
+    As views assíncronas do Flask rodam cada requisição em um event loop novo;
+    uma sessão por loop seria descartada ao fim de cada requisição. Por isso o
+    cliente mantém seu próprio event loop em uma thread, dono da sessão e do pool
+    de conexões, e as chamadas de qualquer loop são executadas nele.
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = {**HTTP_POOL_CONFIG, **(config or {})}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session = None
+        self._lock = threading.Lock()
+
+        self._latencies = deque(maxlen=self.config["latency_window"])
+        self._ttfts = deque(maxlen=self.config["latency_window"])
+        self.stats = {
+            "requests": 0,
+            "failed_requests": 0,
+            "streams": 0,
+            "failed_streams": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0,
+            "sessions_created": 0
+        }
+
+    async def post_json(self, url: str, payload: Dict[str, Any], headers: Dict[str, str] = None,
+                        timeout: float = 30) -> Tuple[int, Any]:
+        """POST com corpo JSON; retorna (status, JSON da resposta ou texto em caso de erro)"""
+        return await self.run(self._post_json(url, payload, headers, timeout))
+
+    async def run(self, coro):
+        """Executa a corrotina no loop do cliente (onde a sessão vive)"""
+        loop = self._ensure_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    async def _post_json(self, url: str, payload: Dict[str, Any], headers: Dict[str, str], timeout: float) -> Tuple[int, Any]:
+        session = self._get_session()
+        started = time.perf_counter()
+        try:
+            async with session.post(url, json=payload, headers=headers,
+                                    timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                if response.status == 200:
+                    body = await response.json(content_type=None)
+                else:
+                    body = await response.text()
+                status = response.status
+        except Exception:
+            self.stats["failed_requests"] += 1
+            raise
+        finally:
+            self.stats["requests"] += 1
+
+        self._latencies.append(time.perf_counter() - started)
+        return status, body
+
+    def iter_sse(self, url: str, payload: Dict[str, Any], headers: Dict[str, str] = None,
+                 timeout: float = 120) -> Iterator[Dict[str, Any]]:
+        """POST com resposta SSE; gera cada evento `data:` (JSON) assim que chega
+
+        Iterador síncrono para respostas em streaming do Flask: a leitura roda no
+        loop do cliente e os eventos chegam por uma fila. Encerrar o iterador
+        (ex.: o navegador desconectou) cancela a requisição upstream.
+        """
+        events: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._stream_sse(url, payload, headers, timeout, events.put), self._ensure_loop()
+        )
+        try:
+            while True:
+                try:
+                    kind, value = events.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"Sem eventos do upstream em {timeout}s")
+                if kind == "event":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            future.cancel()
+
+    async def _stream_sse(self, url: str, payload: Dict[str, Any], headers: Dict[str, str], timeout: float,
+                          emit: Callable[[Tuple[str, Any]], None]):
+        session = self._get_session()
+        started = time.perf_counter()
+        first_token = None
+        self.stats["streams"] += 1
+        try:
+            async with session.post(url, json=payload, headers={**(headers or {}), "Accept": "text/event-stream"},
+                                    timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                if response.status != 200:
+                    raise Exception(f"API Error {response.status}: {await response.text()}")
+
+                data_lines = []
+                async for raw in response.content:
+                    line = raw.decode("utf-8").rstrip("\r\n")
+                    if line.startswith("data:"):
+                        data_lines.append(line[5:].lstrip(" "))
+                        continue
+                    if line or not data_lines:
+                        continue  # comentários, outros campos SSE ou linhas em branco repetidas
+
+                    # Linha em branco encerra o evento
+                    data, data_lines = "\n".join(data_lines), []
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    if first_token is None and _has_token(event):
+                        first_token = time.perf_counter() - started
+                        self._ttfts.append(first_token)
+                    emit(("event", event))
+                else:
+                    if data_lines and data_lines != ["[DONE]"]:
+                        emit(("event", json.loads("\n".join(data_lines))))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats["failed_streams"] += 1
+            emit(("error", e))
+        else:
+            self._latencies.append(time.perf_counter() - started)
+        finally:
+            self.stats["requests"] += 1
+            emit(("end", None))
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Inicia (uma vez) o event loop do cliente em uma thread daemon"""
+        if self._loop is not None:
+            return self._loop
+
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="ai-http-client", daemon=True)
+                self._thread.start()
+                self._loop = loop
+                atexit.register(self.close)
+                logger.info("Loop do cliente HTTP de IA iniciado")
+        return self._loop
+
+    def _get_session(self):
+        """Sessão do loop do cliente, criada no primeiro uso"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.config["limit"],
+                limit_per_host=self.config["limit_per_host"],
+                keepalive_timeout=self.config["keepalive_timeout"],
+                ttl_dns_cache=self.config["dns_cache_ttl"],
+                use_dns_cache=True
+            )
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=[self._trace_config()])
+            self.stats["sessions_created"] += 1
+        return self._session
+
+    def _trace_config(self):
+        """Contadores de conexões novas/reusadas e de cache de DNS"""
+        trace = aiohttp.TraceConfig()
+
+        def counter(name: str):
+            async def increment(session, context, params):
+                self.stats[name] += 1
+            return increment
+
+        trace.on_connection_create_end.append(counter("connections_created"))
+        trace.on_connection_reuseconn.append(counter("connections_reused"))
+        trace.on_dns_cache_hit.append(counter("dns_cache_hits"))
+        trace.on_dns_cache_miss.append(counter("dns_cache_misses"))
+        return trace
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Reuso de conexões e percentis de latência do upstream"""
+        connections = self.stats["connections_created"] + self.stats["connections_reused"]
+
+        return {
+            **self.stats,
+            "connection_reuse_rate": round(self.stats["connections_reused"] / connections, 4) if connections else 0.0,
+            "latency_ms": latency_percentiles(self._latencies),
+            "time_to_first_token_ms": latency_percentiles(self._ttfts),
+            "pool": {key: self.config[key] for key in ("limit", "limit_per_host", "keepalive_timeout", "dns_cache_ttl")},
+            "running": self._loop is not None and self._loop.is_running()
+        }
+
+    def close(self, timeout: float = 5):
+        """Fecha a sessão e encerra o loop do cliente (hook de desligamento)"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+
+        async def shutdown():
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+            self._session = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Erro ao fechar sessão HTTP de IA: {str(e)}")
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            if self._thread is not None:
+                self._thread.join(timeout)
+            loop.close()
+            atexit.unregister(self.close)
+            logger.info("Cliente HTTP de IA encerrado")
+
+
+def _has_token(event: Dict[str, Any]) -> bool:
+    """Chunk de chat completion com texto gerado (o primeiro costuma trazer só o papel)"""
+    for choice in event.get("choices") or []:
+        if (choice.get("delta") or {}).get("content"):
+            return True
+    return False
+
+
+def latency_percentiles(samples) -> Dict[str, Any]:
+    """Percentis (ms) de uma janela de durações em segundos"""
+    values = sorted(samples)
+
+    def percentile(p: float) -> Optional[float]:
+        if not values:
+            return None
+        return round(values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000, 1)
+
+    return {
+        "samples": len(values),
+        "p50": percentile(50),
+        "p90": percentile(90),
+        "p95": percentile(95),
+        "p99": percentile(99),
+        "max": round(values[-1] * 1000, 1) if values else None
+    }
+
+
+# Instância global do cliente
+ai_http_client = registry.service("ai_http_client")
@@ -0,0 +1,336 @@
+"""
+CertGuard AI - Cache de respostas das APIs de IA
+Chave estável (SHA-256 do modelo, mensagens e parâmetros de amostragem),
+LRU em memória com TTL e orçamento de bytes, camada SQLite opcional
+compartilhada entre workers e reinícios, e coalescência de requisições
+idênticas em andamento (single-flight)
+"""
+
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+import concurrent.futures
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+from .registry import registry
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros do cache de respostas
+RESPONSE_CACHE_CONFIG = {
+    "ttl_seconds": 6 * 3600,            # validade de uma resposta
+    "max_memory_bytes": 64 * 1024**2,   # orçamento da camada em memória
+    "max_disk_bytes": 512 * 1024**2,    # orçamento da camada SQLite
+    "max_entry_bytes": 2 * 1024**2,     # respostas maiores não são armazenadas
+    "db_path": None                     # None desativa a camada em disco
+}
+
+# Parâmetros da requisição que determinam a resposta
+KEY_FIELDS = ("model", "messages", "temperature", "top_p", "max_tokens")
+
+
+class _LeaderCancelled(Exception):
+    """O líder do single-flight foi cancelado; os seguidores tentam de novo"""
+
+
+class AIResponseCache:
+    """Cache LRU+TTL com limite em bytes e camada SQLite compartilhada"""
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = {**RESPONSE_CACHE_CONFIG, **(config or {})}
+        if self.config["db_path"] is None:
+            self.config["db_path"] = os.getenv("CERTGUARD_AI_CACHE_DB")
+
+        # chave -> (armazenado_em, bytes, contexto, modelo, resposta)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # chave -> future da chamada upstream em andamento (compartilhado entre event loops)
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+
+        self.stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "upstream_calls": 0,
+            "coalesced_requests": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "disk_errors": 0
+        }
+
+        if self.config["db_path"]:
+            self._init_disk()
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        """Digest estável entre processos do que determina a resposta"""
+        material = {field: payload.get(field) for field in KEY_FIELDS}
+        canonical = json.dumps(material, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _init_disk(self):
+        """Abre a camada SQLite (WAL permite leitura concorrente entre workers)"""
+        try:
+            self._conn = sqlite3.connect(self.config["db_path"], timeout=5, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS ai_response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    context TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_accessed ON ai_response_cache(accessed_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_context ON ai_response_cache(context, model)")
+            self._conn.commit()
+            logger.info(f"Cache de respostas em disco: {self.config['db_path']}")
+        except sqlite3.Error as e:
+            logger.error(f"Camada em disco do cache de IA desativada: {str(e)}")
+            self._conn = None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Resposta armazenada para a chave, ou None (memória, depois disco)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.config["ttl_seconds"]:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["memory_hits"] += 1
+                    return entry[4]
+                self._drop(key)
+                self.stats["expirations"] += 1
+
+            row = self._disk_get(key, now)
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            created_at, context, model, raw = row
+            response = json.loads(raw)
+            self._store_memory(key, created_at, len(raw.encode("utf-8")), context, model, response)
+            self.stats["hits"] += 1
+            self.stats["disk_hits"] += 1
+            return response
+
+    def put(self, key: str, response: Dict[str, Any], context: str = "general", model: str = ""):
+        """Armazena a resposta nas duas camadas"""
+        raw = json.dumps(response, ensure_ascii=False, separators=(",", ":"))
+        size = len(raw.encode("utf-8"))
+        if size > self.config["max_entry_bytes"]:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._store_memory(key, now, size, context, model, response)
+            self.stats["stores"] += 1
+            self._disk_put(key, context, model, raw, size, now)
+
+    async def single_flight(self, key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Executa fetch() uma vez por chave; chamadas concorrentes aguardam o mesmo resultado ou erro
+
+        As views assíncronas rodam em event loops diferentes, por isso o resultado
+        é publicado em um concurrent.futures.Future e aguardado com wrap_future.
+        Se o líder for cancelado (ex.: cancelamento de job em lote), o cancelamento
+        não é repassado: um dos seguidores assume a chamada.
+        """
+        while True:
+            with self._lock:
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = concurrent.futures.Future()
+                    self._inflight[key] = future
+                    self.stats["upstream_calls"] += 1
+                else:
+                    self.stats["coalesced_requests"] += 1
+
+            if not leader:
+                try:
+                    # shield: cancelar um seguidor não pode cancelar o future compartilhado
+                    return await asyncio.shield(asyncio.wrap_future(future))
+                except _LeaderCancelled:
+                    continue
+
+            try:
+                result = await fetch()
+            except asyncio.CancelledError:
+                self._release(key, future)
+                future.set_exception(_LeaderCancelled())
+                raise
+            except BaseException as e:
+                self._release(key, future)
+                future.set_exception(e)
+                raise
+            self._release(key, future)
+            future.set_result(result)
+            return result
+
+    def _release(self, key: str, future: concurrent.futures.Future):
+        """Remove a chamada em andamento (antes de publicar, para um novo líder não ser apagado)"""
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _store_memory(self, key: str, created_at: float, size: int, context: str, model: str,
+                      response: Dict[str, Any]):
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (created_at, size, context, model, response)
+        self._memory_bytes += size
+
+        while self._memory_bytes > self.config["max_memory_bytes"] and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.stats["evictions"] += 1
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        self._memory_bytes -= entry[1]
+
+    def _disk_get(self, key: str, now: float) -> Optional[tuple]:
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute(
+                "SELECT created_at, context, model, response FROM ai_response_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[0] > self.config["ttl_seconds"]:
+                self._conn.execute("DELETE FROM ai_response_cache WHERE cache_key = ?", (key,))
+                self._conn.commit()
+                self.stats["expirations"] += 1
+                return None
+            self._conn.execute("UPDATE ai_response_cache SET accessed_at = ? WHERE cache_key = ?", (now, key))
+            self._conn.commit()
+            return row
+        except sqlite3.Error as e:
+            self.stats["disk_errors"] += 1
+            logger.warning(f"Erro de leitura no cache de IA em disco: {str(e)}")
+            return None
+
+    def _disk_put(self, key: str, context: str, model: str, raw: str, size: int, now: float):
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute("""
+                INSERT OR REPLACE INTO ai_response_cache
+                    (cache_key, context, model, response, size_bytes, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (key, context, model, raw, size, now, now))
+            self._prune_disk(now)
+            self._conn.commit()
+        except sqlite3.Error as e:
+            self.stats["disk_errors"] += 1
+            logger.warning(f"Erro de escrita no cache de IA em disco: {str(e)}")
+
+    def _prune_disk(self, now: float):
+        """Remove expiradas e, acima do orçamento, as menos acessadas"""
+        self._conn.execute("DELETE FROM ai_response_cache WHERE created_at < ?", (now - self.config["ttl_seconds"],))
+        total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM ai_response_cache").fetchone()[0]
+        excess = total - self.config["max_disk_bytes"]
+        if excess <= 0:
+            return
+
+        removed = 0
+        for cache_key, size in self._conn.execute(
+            "SELECT cache_key, size_bytes FROM ai_response_cache ORDER BY accessed_at"
+        ).fetchall():
+            if excess <= 0:
+                break
+            self._conn.execute("DELETE FROM ai_response_cache WHERE cache_key = ?", (cache_key,))
+            excess -= size
+            removed += 1
+        self.stats["evictions"] += removed
+
+    def invalidate(self, context: str = None, model: str = None, older_than: float = None) -> int:
+        """Remove entradas por contexto, modelo e/ou idade em segundos (sem filtros: tudo)"""
+        cutoff = time.time() - older_than if older_than is not None else None
+
+        def matches(entry_context: str, entry_model: str, created_at: float) -> bool:
+            return ((context is None or entry_context == context) and
+                    (model is None or entry_model == model) and
+                    (cutoff is None or created_at < cutoff))
+
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if matches(entry[2], entry[3], entry[0])]
+            for key in keys:
+                self._drop(key)
+            removed = len(keys)
+
+            if self._conn is not None:
+                conditions, params = [], []
+                if context is not None:
+                    conditions.append("context = ?")
+                    params.append(context)
+                if model is not None:
+                    conditions.append("model = ?")
+                    params.append(model)
+                if cutoff is not None:
+                    conditions.append("created_at < ?")
+                    params.append(cutoff)
+                where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+                try:
+                    cursor = self._conn.execute(f"DELETE FROM ai_response_cache{where}", params)
+                    self._conn.commit()
+                    removed = max(removed, cursor.rowcount)
+                except sqlite3.Error as e:
+                    self.stats["disk_errors"] += 1
+                    logger.warning(f"Erro ao invalidar cache de IA em disco: {str(e)}")
+
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Taxa de acerto, ocupação e configuração das camadas"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            disk = {"enabled": self._conn is not None, "path": self.config["db_path"]}
+            if self._conn is not None:
+                try:
+                    entries, size = self._conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM ai_response_cache"
+                    ).fetchone()
+                    disk.update({"entries": entries, "bytes": size, "max_bytes": self.config["max_disk_bytes"]})
+                except sqlite3.Error:
+                    pass
+
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+                "in_flight": len(self._inflight),
+                "memory": {
+                    "entries": len(self._entries),
+                    "bytes": self._memory_bytes,
+                    "max_bytes": self.config["max_memory_bytes"]
+                },
+                "disk": disk,
+                "ttl_seconds": self.config["ttl_seconds"]
+            }
+
+    def close(self):
+        """Fecha a conexão da camada em disco"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Instância global do cache
+ai_response_cache = registry.service("ai_response_cache")
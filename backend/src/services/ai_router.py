@@ -0,0 +1,231 @@
+"""
+CertGuard AI - Roteamento entre endpoints das APIs de IA
+Latência (EWMA) e taxa de erro por endpoint, circuit breaker com meia-abertura
+e hedging opcional de requisições lentas para o endpoint secundário
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Tuple, Optional, Callable, Awaitable
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros do roteador
+ROUTER_CONFIG = {
+    "ewma_alpha": 0.2,              # peso da amostra mais recente na latência média
+    "error_window": 50,             # últimas requisições usadas na taxa de erro
+    "error_penalty": 4.0,           # quanto a taxa de erro pesa no score do endpoint
+    "preferred_bonus": 0.8,         # endpoint preferido só perde para outro 20% melhor
+    "failure_threshold": 5,         # falhas consecutivas que abrem o circuito
+    "error_rate_threshold": 0.5,    # ...ou taxa de erro na janela (com min_samples)
+    "min_samples": 10,
+    "open_seconds": 30,             # tempo com o circuito aberto antes da sonda
+    "hedge_after_seconds": None     # None desativa o hedging
+}
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class EndpointUnavailableError(Exception):
+    """Todos os endpoints estão com o circuito aberto"""
+
+
+@dataclass
+class EndpointHealth:
+    name: str
+    latency_ewma: Optional[float] = None
+    outcomes: deque = field(default_factory=deque)
+    consecutive_failures: int = 0
+    state: str = CLOSED
+    opened_at: float = 0.0
+    probing: bool = False
+    requests: int = 0
+    failures: int = 0
+    times_opened: int = 0
+
+    @property
+    def error_rate(self) -> float:
+        return (self.outcomes.count(False) / len(self.outcomes)) if self.outcomes else 0.0
+
+
+class AIEndpointRouter:
+    """Escolhe o endpoint mais saudável e faz failover/hedging entre eles"""
+
+    def __init__(self, endpoints: Dict[str, Dict[str, Any]], preferred: str = None, config: Dict[str, Any] = None):
+        self.config = {**ROUTER_CONFIG, **(config or {})}
+        self.endpoints = endpoints
+        self.preferred = preferred or next(iter(endpoints))
+        self.health = {
+            name: EndpointHealth(name, outcomes=deque(maxlen=self.config["error_window"]))
+            for name in endpoints
+        }
+        self._lock = threading.Lock()
+        self.stats = {
+            "routed_requests": 0,
+            "failovers": 0,
+            "hedged_requests": 0,
+            "hedges_won": 0,
+            "rejected_requests": 0
+        }
+
+    def prefer(self, name: str):
+        """Define o endpoint preferido (escolha manual, ex.: /switch-model)"""
+        if name not in self.endpoints:
+            raise ValueError(f"Endpoint desconhecido: {name}")
+        self.preferred = name
+
+    def candidates(self) -> List[str]:
+        """Endpoints disponíveis, do mais saudável para o menos saudável"""
+        now = time.monotonic()
+        available = []
+        with self._lock:
+            for health in self.health.values():
+                if health.state == OPEN and now - health.opened_at >= self.config["open_seconds"]:
+                    health.state = HALF_OPEN
+                    logger.info(f"Circuito de {health.name} meio-aberto: enviando sonda")
+                if health.state == OPEN or (health.state == HALF_OPEN and health.probing):
+                    continue
+                available.append(health)
+
+        def score(health: EndpointHealth) -> float:
+            latency = health.latency_ewma or 0.0
+            value = latency * (1 + self.config["error_penalty"] * health.error_rate)
+            return value * self.config["preferred_bonus"] if health.name == self.preferred else value
+
+        # Circuito meio-aberto recebe a próxima requisição como sonda (com failover se falhar)
+        available.sort(key=lambda health: (health.state != HALF_OPEN, score(health), health.name != self.preferred))
+        return [health.name for health in available]
+
+    def record(self, name: str, elapsed: float, ok: Optional[bool]):
+        """Registra o resultado de uma requisição (ok=None: cancelada, só latência)"""
+        alpha = self.config["ewma_alpha"]
+        with self._lock:
+            health = self.health[name]
+            if ok is False and health.latency_ewma is not None:
+                elapsed = max(elapsed, health.latency_ewma)  # falha rápida não torna o endpoint "mais rápido"
+            health.latency_ewma = elapsed if health.latency_ewma is None else alpha * elapsed + (1 - alpha) * health.latency_ewma
+            health.probing = False
+            if ok is None:
+                return
+
+            health.requests += 1
+            health.outcomes.append(ok)
+            if ok:
+                health.consecutive_failures = 0
+                if health.state != CLOSED:
+                    logger.info(f"Circuito de {name} fechado")
+                health.state = CLOSED
+                return
+
+            health.failures += 1
+            health.consecutive_failures += 1
+            too_many_errors = (len(health.outcomes) >= self.config["min_samples"] and
+                               health.error_rate >= self.config["error_rate_threshold"])
+            if health.state == HALF_OPEN or health.consecutive_failures >= self.config["failure_threshold"] or too_many_errors:
+                if health.state != OPEN:
+                    health.times_opened += 1
+                    logger.warning(f"Circuito de {name} aberto por {self.config['open_seconds']}s")
+                health.state = OPEN
+                health.opened_at = time.monotonic()
+
+    def acquire(self) -> List[str]:
+        """Candidatos para uma requisição; marca a sonda de um circuito meio-aberto"""
+        order = self.candidates()
+        if not order:
+            self.stats["rejected_requests"] += 1
+            raise EndpointUnavailableError("Todos os endpoints de IA indisponíveis (circuit breaker aberto)")
+
+        with self._lock:
+            if self.health[order[0]].state == HALF_OPEN:
+                self.health[order[0]].probing = True
+        self.stats["routed_requests"] += 1
+        return order
+
+    async def execute(self, call: Callable[[str, Dict[str, Any]], Awaitable[Any]]) -> Tuple[Any, str]:
+        """Executa call(nome, config) no melhor endpoint, com failover e hedging; retorna (resultado, nome)"""
+        order = self.acquire()
+
+        hedge_after = self.config["hedge_after_seconds"]
+        if hedge_after is not None and len(order) > 1:
+            return await self._hedged(call, order[0], order[1], hedge_after)
+
+        last_error = None
+        for attempt, name in enumerate(order):
+            if attempt:
+                self.stats["failovers"] += 1
+                logger.warning(f"Failover para {name}: {str(last_error)}")
+            try:
+                return await self._attempt(call, name), name
+            except Exception as e:
+                last_error = e
+        raise last_error
+
+    async def _attempt(self, call: Callable[[str, Dict[str, Any]], Awaitable[Any]], name: str) -> Any:
+        started = time.perf_counter()
+        try:
+            result = await call(name, self.endpoints[name])
+        except asyncio.CancelledError:
+            # Perdeu o hedge: a duração até aqui ainda informa que o endpoint está lento
+            self.record(name, time.perf_counter() - started, None)
+            raise
+        except Exception:
+            self.record(name, time.perf_counter() - started, False)
+            raise
+        self.record(name, time.perf_counter() - started, True)
+        return result
+
+    async def _hedged(self, call, primary_name: str, backup_name: str, hedge_after: float) -> Tuple[Any, str]:
+        """Dispara no secundário se o primário não responder em hedge_after segundos"""
+        primary = asyncio.ensure_future(self._attempt(call, primary_name))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            if primary.exception() is None:
+                return primary.result(), primary_name
+            self.stats["failovers"] += 1
+            return await self._attempt(call, backup_name), backup_name
+
+        self.stats["hedged_requests"] += 1
+        backup = asyncio.ensure_future(self._attempt(call, backup_name))
+        names = {primary: primary_name, backup: backup_name}
+        pending, last_error = set(names), None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.stats["hedges_won"] += 1
+                        return task.result(), names[task]
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estado do circuito, latência e taxa de erro de cada endpoint"""
+        with self._lock:
+            endpoints = [
+                {
+                    "name": health.name,
+                    "model": self.endpoints[health.name].get("model"),
+                    "state": health.state,
+                    "latency_ewma_ms": round(health.latency_ewma * 1000, 1) if health.latency_ewma is not None else None,
+                    "error_rate": round(health.error_rate, 4),
+                    "consecutive_failures": health.consecutive_failures,
+                    "requests": health.requests,
+                    "failures": health.failures,
+                    "times_opened": health.times_opened
+                }
+                for health in self.health.values()
+            ]
+        return {
+            **self.stats,
+            "preferred": self.preferred,
+            "hedge_after_seconds": self.config["hedge_after_seconds"],
+            "endpoints": endpoints
+        }
@@ -0,0 +1,205 @@
+"""
+CertGuard AI - Cache de prompts quase idênticos (MinHash sobre shingles)
+Perguntas e documentos com pequenas variações ("quem acessou ontem?" /
+"quem acessou o sistema ontem?") reaproveitam a resposta do cache exato.
+Opt-in, apenas para perguntas curtas de análise sem efeitos colaterais, e sem
+serviço de embeddings: impressão digital MinHash + LSH em memória.
+Números, identificadores e negações não entram na similaridade: precisam ser
+idênticos ("usuário 12345" / "usuário 12346" nunca compartilham resposta).
+"""
+
+import os
+import re
+import zlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from .registry import registry, lazy_import
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros do cache por similaridade
+SIMILARITY_CACHE_CONFIG = {
+    "enabled": os.getenv("CERTGUARD_AI_SIMILARITY_CACHE", "0") == "1",   # opt-in
+    "threshold": float(os.getenv("CERTGUARD_AI_SIMILARITY_THRESHOLD", "0.85")),  # Jaccard estimada mínima
+    # Contextos elegíveis e limiar próprio (None = threshold). Análise de documentos e
+    # contratos fica de fora: partes, prazos e cláusulas mudam a resposta sem mudar números
+    "contexts": {
+        "security_analysis": None,
+        "jurisprudence_analysis": None
+    },
+    "shingle_chars": 4,             # shingles de caracteres sobre o texto normalizado
+    "num_perm": 128,                # funções de hash do MinHash
+    "bands": 32,                    # LSH: 32 bandas de 4 linhas
+    "max_entries": 50000            # impressões digitais em memória (LRU)
+}
+
+# Palavras sem peso na comparação (já sem acentos), incluindo fórmulas de cortesia
+# e referências genéricas ao próprio sistema ("quem acessou [o sistema] ontem?")
+STOPWORDS = frozenset(
+    "a o as os um uma uns umas de do da dos das no na nos nas em por para pelo pela "
+    "com e ou que se ao aos me meu minha "
+    "sistema plataforma certguard lucia favor voce pode poderia".split()
+)
+
+# Negações (sem acentos): invertem o sentido com poucos caracteres de diferença
+NEGATIONS = frozenset("nao nunca sem nem jamais nenhum nenhuma nada exceto salvo".split())
+
+MERSENNE_PRIME = (1 << 61) - 1
+NON_WORD = re.compile(r"[^a-z0-9]+")
+DIGIT = re.compile(r"[0-9]")
+
+
+def _words(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [word for word in NON_WORD.split(text) if word]
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sem acentos, pontuação e stopwords"""
+    return " ".join(word for word in _words(text) if word not in STOPWORDS)
+
+
+def exact_tokens(text: str) -> Tuple[str, ...]:
+    """Números, identificadores (palavras com dígitos) e negações, na ordem do texto"""
+    return tuple(word for word in _words(text) if word in NEGATIONS or DIGIT.search(word))
+
+
+class AISimilarityCache:
+    """Índice MinHash/LSH que aponta para chaves do cache de respostas exato"""
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = {**SIMILARITY_CACHE_CONFIG, **(config or {})}
+        if self.config["num_perm"] % self.config["bands"]:
+            raise ValueError("num_perm deve ser múltiplo de bands")
+        self.rows = self.config["num_perm"] // self.config["bands"]
+
+        self._permutations = None  # numpy só é carregado no primeiro uso
+
+        # cache_key -> (escopo, assinatura); bandas -> cache_keys
+        self._entries: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+        self._bands: Dict[Tuple[str, int, bytes], set] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "lookups": 0,
+            "hits": 0,
+            "misses": 0,
+            "stale_hits": 0,
+            "indexed": 0,
+            "evicted": 0
+        }
+
+    def enabled_for(self, context: str) -> bool:
+        return self.config["enabled"] and context in self.config["contexts"]
+
+    def threshold_for(self, context: str) -> float:
+        threshold = self.config["contexts"].get(context)
+        return self.config["threshold"] if threshold is None else threshold
+
+    def signature(self, text: str):
+        """Assinatura MinHash dos shingles de caracteres do texto normalizado"""
+        normalized = normalize_text(text)
+        size = self.config["shingle_chars"]
+        shingles = {normalized[i:i + size] for i in range(max(1, len(normalized) - size + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        if self._permutations is None:
+            # Permutações (a*x + b) mod p com semente fixa: assinaturas comparáveis entre processos
+            rng = np.random.default_rng(1729)
+            self._permutations = (
+                rng.integers(1, 1 << 31, size=self.config["num_perm"], dtype=np.uint64)[:, None],
+                rng.integers(0, 1 << 31, size=self.config["num_perm"], dtype=np.uint64)[:, None]
+            )
+        a, b = self._permutations
+        # a, b < 2^31 e hash < 2^32: o produto cabe em uint64 sem estouro
+        return ((a * hashes[None, :] + b) % np.uint64(MERSENNE_PRIME)).min(axis=1)
+
+    @staticmethod
+    def _exact_scope(scope: str, text: str) -> str:
+        """Escopo acrescido dos tokens que precisam coincidir exatamente para um acerto"""
+        return f"{scope}|{' '.join(exact_tokens(text))}"
+
+    def _band_keys(self, scope: str, signature) -> List[Tuple[str, int, bytes]]:
+        rows = self.rows
+        return [(scope, band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.config["bands"])]
+
+    def lookup(self, context: str, scope: str, text: str) -> Optional[Tuple[str, float]]:
+        """Chave do cache exato de um texto semelhante no mesmo escopo, com a similaridade estimada"""
+        scope = self._exact_scope(scope, text)
+        signature = self.signature(text)
+        threshold = self.threshold_for(context)
+        best_key, best_similarity = None, 0.0
+        with self._lock:
+            self.stats["lookups"] += 1
+            candidates = set()
+            for band_key in self._band_keys(scope, signature):
+                candidates |= self._bands.get(band_key, set())
+            for cache_key in candidates:
+                similarity = float(np.mean(self._entries[cache_key][1] == signature))
+                if similarity > best_similarity:
+                    best_key, best_similarity = cache_key, similarity
+
+            if best_key is None or best_similarity < threshold:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.stats["hits"] += 1
+        return best_key, round(best_similarity, 4)
+
+    def add(self, scope: str, text: str, cache_key: str):
+        """Indexa o texto que originou a resposta armazenada em cache_key"""
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                return
+        scope = self._exact_scope(scope, text)
+        signature = self.signature(text)
+        with self._lock:
+            self._entries[cache_key] = (scope, signature)
+            for band_key in self._band_keys(scope, signature):
+                self._bands.setdefault(band_key, set()).add(cache_key)
+            self.stats["indexed"] += 1
+            while len(self._entries) > self.config["max_entries"]:
+                self._remove(next(iter(self._entries)))
+                self.stats["evicted"] += 1
+
+    def discard(self, cache_key: str):
+        """Remove uma entrada cuja resposta não está mais no cache exato (expirou ou foi invalidada)"""
+        with self._lock:
+            if cache_key in self._entries:
+                self._remove(cache_key)
+                self.stats["stale_hits"] += 1
+
+    def _remove(self, cache_key: str):
+        scope, signature = self._entries.pop(cache_key)
+        for band_key in self._band_keys(scope, signature):
+            bucket = self._bands.get(band_key)
+            if bucket is not None:
+                bucket.discard(cache_key)
+                if not bucket:
+                    del self._bands[band_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bands.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                "enabled": self.config["enabled"],
+                "hit_rate": round((self.stats["hits"] - self.stats["stale_hits"]) / self.stats["lookups"], 4) if self.stats["lookups"] else 0.0,
+                "entries": len(self._entries),
+                "threshold": self.config["threshold"],
+                "contexts": self.config["contexts"]
+            }
+
+
+# Instância global do índice
+ai_similarity_cache = registry.service("ai_similarity_cache")
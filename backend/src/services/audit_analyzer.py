@@ -1,6 +1,9 @@
 # Sistema Avançado de Análise de Auditoria e Comportamento - CertGuard AI
 
+import os
 import json
+import gzip
+import shutil
 import sqlite3
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
@@ -10,6 +13,15 @@ from collections import defaultdict, Counter
 import re
 from dataclasses import dataclass
 import logging
+import queue
+import threading
+import time
+import atexit
+
+from .registry import lazy_import
+
+pd = lazy_import("pandas")
+audit_snapshot = lazy_import(".audit_snapshot", __package__)
 
 @dataclass
 class SecurityEvent:
@@ -30,10 +42,45 @@ class UserBehaviorProfile:
     last_updated: datetime
     risk_level: str = "LOW"
 
+# Colunas das partições mensais de security_events (mesma ordem em todas)
+EVENT_COLUMNS = (
+    'id, user_id, event_type, ip_address, timestamp, details, '
+    'risk_score, anomaly_detected, processed, created_at'
+)
+
+EVENT_TABLE_SCHEMA = '''
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+    ip_address TEXT NOT NULL,
+    timestamp DATETIME NOT NULL,
+    details TEXT NOT NULL,
+    risk_score REAL DEFAULT 0.0,
+    anomaly_detected BOOLEAN DEFAULT FALSE,
+    processed BOOLEAN DEFAULT FALSE,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    claimed_at DATETIME
+'''
+
 class AuditAnalyzer:
-    def __init__(self, db_path: str = "certguard_audit.db"):
+    def __init__(self, db_path: str = "certguard_audit.db", archive_dir: Optional[str] = None,
+                 detection_workers: int = 2, async_detection: bool = True):
         self.db_path = db_path
         self.logger = logging.getLogger(__name__)
+        
+        # Particionamento mensal e retenção de security_events
+        self.storage_config = {
+            'retention_months': 12,
+            'archive_dir': archive_dir or os.path.join(
+                os.path.dirname(os.path.abspath(db_path)), 'audit_archive'
+            )
+        }
+        self._known_partitions = set()
+        
+        # Snapshots colunares para relatórios no modo analítico
+        snapshot_dir = os.environ.get('CERTGUARD_SNAPSHOT_DIR')
+        self.snapshot_store = audit_snapshot.AuditSnapshotStore(snapshot_dir, audit_db_path=db_path) if snapshot_dir else None
+        
         self.init_database()
         
         # Configurações de detecção de anomalias
@@ -42,7 +89,8 @@ class AuditAnalyzer:
             'max_login_distance_km': 1000,
             'max_actions_per_hour': 100,
             'suspicious_time_window': 3600,  # 1 hora
-            'max_concurrent_sessions': 3
+            'max_concurrent_sessions': 3,
+            'alert_suppression_window': 900  # 15 minutos
         }
         
         # Padrões suspeitos
@@ -67,28 +115,74 @@ class AuditAnalyzer:
                 r"/windows/system32"
             ]
         }
+        
+        # Pipeline de detecção assíncrono: ingestão retorna após o INSERT,
+        # detectores rodam em workers (fila por usuário preserva a ordem)
+        self.detection_config = {
+            'async': async_detection,
+            'workers': max(1, detection_workers),
+            'queue_size': 10000,
+            'recovery_window_hours': 24,
+            'recovery_grace_seconds': 300,  # eventos mais novos podem estar na fila de outro processo
+            'recovery_lease_seconds': 300   # reivindicação mais antiga que isso: o processo caiu, reivindica de novo
+        }
+        self._detection_queues = []
+        self._detection_workers = []
+        self._detection_pending = {}
+        self._detection_lock = threading.Lock()
+        self._detection_metrics = {
+            'enqueued': 0,
+            'processed': 0,
+            'failed': 0,
+            'inline_fallbacks': 0,
+            'recovered': 0,
+            'anomalous_events': 0,
+            'last_lag_seconds': 0.0,
+            'avg_lag_seconds': 0.0,
+            'max_lag_seconds': 0.0,
+            'avg_detection_seconds': 0.0
+        }
+        
+        if async_detection:
+            self.start_detection_workers()
+            self.recover_unprocessed_events()
 
     def init_database(self):
         """Inicializar banco de dados de auditoria"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        # Tabela de eventos de segurança
+        # Registro das partições mensais de eventos de segurança
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS security_events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                event_type TEXT NOT NULL,
-                ip_address TEXT NOT NULL,
-                timestamp DATETIME NOT NULL,
-                details TEXT NOT NULL,
-                risk_score REAL DEFAULT 0.0,
-                anomaly_detected BOOLEAN DEFAULT FALSE,
-                processed BOOLEAN DEFAULT FALSE,
+            CREATE TABLE IF NOT EXISTS security_event_partitions (
+                name TEXT PRIMARY KEY,
+                period TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'active',
+                row_count INTEGER,
+                archive_path TEXT,
+                archived_at DATETIME,
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         ''')
         
+        # IDs de eventos são globais entre partições
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS security_event_sequence (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                value INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('INSERT OR IGNORE INTO security_event_sequence (id, value) VALUES (1, 0)')
+        
+        # Bancos antigos têm security_events como tabela única
+        cursor.execute("SELECT type FROM sqlite_master WHERE name = 'security_events'")
+        legacy = cursor.fetchone()
+        if legacy and legacy[0] == 'table':
+            self._migrate_legacy_events(cursor)
+        
+        self._ensure_partition(cursor, self._period_of(datetime.now()))
+        self._refresh_events_view(cursor)
+        
         # Tabela de perfis comportamentais
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS user_behavior_profiles (
@@ -113,10 +207,24 @@ class AuditAnalyzer:
                 description TEXT NOT NULL,
                 details TEXT,
                 resolved BOOLEAN DEFAULT FALSE,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                fingerprint TEXT,
+                occurrence_count INTEGER DEFAULT 1,
+                last_seen DATETIME
             )
         ''')
         
+        # Bancos criados antes da deduplicação de alertas não têm as colunas novas
+        cursor.execute('PRAGMA table_info(security_alerts)')
+        alert_columns = {row[1] for row in cursor.fetchall()}
+        for column, definition in (
+            ('fingerprint', 'TEXT'),
+            ('occurrence_count', 'INTEGER DEFAULT 1'),
+            ('last_seen', 'DATETIME')
+        ):
+            if column not in alert_columns:
+                cursor.execute(f'ALTER TABLE security_alerts ADD COLUMN {column} {definition}')
+        
         # Tabela de sessões ativas
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS active_sessions (
@@ -131,25 +239,145 @@ class AuditAnalyzer:
             )
         ''')
         
-        # Índices para performance
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_user_time ON security_events(user_id, timestamp)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_ip_time ON security_events(ip_address, timestamp)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_type ON security_events(event_type)')
+        # Índices para performance (os de eventos ficam em cada partição)
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_user ON active_sessions(user_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_fingerprint ON security_alerts(fingerprint, resolved, last_seen)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_active ON security_alerts(resolved, severity)')
         
         conn.commit()
         conn.close()
 
+    def _period_of(self, timestamp) -> str:
+        """Período (YYYYMM) da partição de um timestamp"""
+        if isinstance(timestamp, datetime):
+            return timestamp.strftime('%Y%m')
+        timestamp = str(timestamp)
+        return timestamp[0:4] + timestamp[5:7]
+
+    def _ensure_partition(self, cursor, period: str) -> str:
+        """Garante que a partição mensal existe e está ativa"""
+        name = f'security_events_p{period}'
+        if name in self._known_partitions:
+            # O cache é por processo: outro worker pode ter arquivado (e removido) a partição
+            cursor.execute('SELECT status FROM security_event_partitions WHERE name = ?', (name,))
+            row = cursor.fetchone()
+            if row and row[0] == 'active':
+                return name
+            self._known_partitions.discard(name)
+        
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS {name} ({EVENT_TABLE_SCHEMA})')
+        self._ensure_claim_column(cursor, name)
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{name}_user_time ON {name}(user_id, timestamp)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{name}_ip_time ON {name}(ip_address, timestamp)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{name}_type_time ON {name}(event_type, timestamp)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{name}_time ON {name}(timestamp)')
+        
+        cursor.execute('''
+            SELECT status FROM security_event_partitions WHERE name = ?
+        ''', (name,))
+        row = cursor.fetchone()
+        
+        if not row:
+            cursor.execute('''
+                INSERT INTO security_event_partitions (name, period) VALUES (?, ?)
+            ''', (name, period))
+            self._refresh_events_view(cursor)
+        elif row[0] != 'active':
+            # Evento tardio para um mês já arquivado: reabre a partição;
+            # o próximo arquivamento mescla as linhas no arquivo existente
+            cursor.execute('''
+                UPDATE security_event_partitions SET status = 'active' WHERE name = ?
+            ''', (name,))
+            self._refresh_events_view(cursor)
+        
+        self._known_partitions.add(name)
+        return name
+
+    def _ensure_claim_column(self, cursor, name: str):
+        """Partições criadas antes da reivindicação na recuperação não têm claimed_at"""
+        cursor.execute(f'PRAGMA table_info({name})')
+        if 'claimed_at' not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(f'ALTER TABLE {name} ADD COLUMN claimed_at DATETIME')
+
+    def _active_partitions(self, cursor, start=None, end=None) -> List[str]:
+        """Partições ativas que cobrem o intervalo [start, end]"""
+        cursor.execute('''
+            SELECT name, period FROM security_event_partitions 
+            WHERE status = 'active'
+            ORDER BY period
+        ''')
+        start_period = self._period_of(start) if start else None
+        end_period = self._period_of(end) if end else None
+        
+        return [
+            name for name, period in cursor.fetchall()
+            if (not start_period or period >= start_period)
+            and (not end_period or period <= end_period)
+        ]
+
+    def _events_source(self, cursor, start=None, end=None) -> str:
+        """Roteador de consultas: subconsulta sobre as partições do intervalo"""
+        partitions = self._active_partitions(cursor, start, end)
+        if not partitions:
+            current = self._ensure_partition(cursor, self._period_of(datetime.now()))
+            return f'(SELECT {EVENT_COLUMNS} FROM {current} WHERE 0)'
+        
+        return '(' + ' UNION ALL '.join(
+            f'SELECT {EVENT_COLUMNS} FROM {name}' for name in partitions
+        ) + ')'
+
+    def _refresh_events_view(self, cursor):
+        """Recria a view security_events sobre todas as partições ativas"""
+        partitions = self._active_partitions(cursor)
+        cursor.execute('DROP VIEW IF EXISTS security_events')
+        if partitions:
+            cursor.execute('CREATE VIEW security_events AS ' + ' UNION ALL '.join(
+                f'SELECT {EVENT_COLUMNS} FROM {name}' for name in partitions
+            ))
+
+    def _next_event_id(self, cursor) -> int:
+        """Aloca ID global de evento (único entre partições)"""
+        cursor.execute('UPDATE security_event_sequence SET value = value + 1 WHERE id = 1')
+        cursor.execute('SELECT value FROM security_event_sequence WHERE id = 1')
+        return cursor.fetchone()[0]
+
+    def _migrate_legacy_events(self, cursor):
+        """Distribui a tabela única antiga de security_events em partições mensais"""
+        cursor.execute('ALTER TABLE security_events RENAME TO security_events_legacy')
+        
+        cursor.execute('''
+            SELECT DISTINCT substr(timestamp, 1, 4) || substr(timestamp, 6, 2)
+            FROM security_events_legacy
+        ''')
+        periods = [row[0] for row in cursor.fetchall() if row[0]]
+        
+        for period in periods:
+            name = self._ensure_partition(cursor, period)
+            cursor.execute(f'''
+                INSERT INTO {name} ({EVENT_COLUMNS})
+                SELECT {EVENT_COLUMNS} FROM security_events_legacy
+                WHERE substr(timestamp, 1, 4) || substr(timestamp, 6, 2) = ?
+            ''', (period,))
+        
+        cursor.execute('''
+            UPDATE security_event_sequence 
+            SET value = MAX(value, (SELECT COALESCE(MAX(id), 0) FROM security_events_legacy))
+            WHERE id = 1
+        ''')
+        cursor.execute('DROP TABLE security_events_legacy')
+        
+        self.logger.info(f"security_events migrada para {len(periods)} partições mensais")
+
     def log_security_event(self, event: SecurityEvent) -> int:
         """Registrar evento de segurança"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT INTO security_events 
-            (user_id, event_type, ip_address, timestamp, details, risk_score, anomaly_detected)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        period = self._period_of(event.timestamp)
+        partition = self._ensure_partition(cursor, period)
+        event_id = self._next_event_id(cursor)
+        values = (
+            event_id,
             event.user_id,
             event.event_type,
             event.ip_address,
@@ -157,18 +385,238 @@ class AuditAnalyzer:
             json.dumps(event.details),
             event.risk_score,
             event.anomaly_detected
-        ))
+        )
+        
+        for attempt in range(2):
+            try:
+                cursor.execute(f'''
+                    INSERT INTO {partition} 
+                    (id, user_id, event_type, ip_address, timestamp, details, risk_score, anomaly_detected)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', values)
+                break
+            except sqlite3.OperationalError as e:
+                if attempt or 'no such table' not in str(e):
+                    raise
+                # Partição arquivada por outro processo entre a verificação e o INSERT: recria
+                self._known_partitions.discard(partition)
+                partition = self._ensure_partition(cursor, period)
         
-        event_id = cursor.lastrowid
         conn.commit()
         conn.close()
         
-        # Analisar evento em tempo real
-        self.analyze_event_realtime(event)
+        # Detecção fora do caminho da requisição
+        if self.detection_config['async']:
+            self.enqueue_detection(event_id, partition, event)
+        else:
+            self.process_detection(event_id, partition, event)
         
         return event_id
 
-    def analyze_event_realtime(self, event: SecurityEvent):
+    def start_detection_workers(self):
+        """Iniciar workers de detecção"""
+        if self._detection_workers:
+            return
+        
+        queue_size = self.detection_config['queue_size'] // self.detection_config['workers']
+        for i in range(self.detection_config['workers']):
+            detection_queue = queue.Queue(maxsize=queue_size)
+            worker = threading.Thread(
+                target=self._detection_worker,
+                args=(detection_queue,),
+                name=f'audit-detection-{i}',
+                daemon=True
+            )
+            self._detection_queues.append(detection_queue)
+            self._detection_workers.append(worker)
+            worker.start()
+        
+        atexit.register(self.shutdown_detection)
+        self.logger.info(f"{len(self._detection_workers)} workers de detecção iniciados")
+
+    def enqueue_detection(self, event_id: int, partition: str, event: SecurityEvent):
+        """Enfileirar evento para detecção assíncrona"""
+        # Mesmo usuário sempre no mesmo worker: detectores e agrupamento
+        # de alertas veem os eventos na ordem de ingestão
+        shard = int(hashlib.md5(event.user_id.encode()).hexdigest(), 16) % len(self._detection_queues)
+        enqueued_at = time.monotonic()
+        
+        with self._detection_lock:
+            self._detection_pending[event_id] = enqueued_at
+            self._detection_metrics['enqueued'] += 1
+        
+        try:
+            self._detection_queues[shard].put_nowait((event_id, partition, event, enqueued_at))
+        except queue.Full:
+            # Fila cheia: aplica backpressure processando no chamador
+            with self._detection_lock:
+                self._detection_pending.pop(event_id, None)
+                self._detection_metrics['inline_fallbacks'] += 1
+            self.logger.warning("Fila de detecção cheia, processando evento de forma síncrona")
+            self.process_detection(event_id, partition, event)
+
+    def _detection_worker(self, detection_queue: queue.Queue):
+        """Loop do worker de detecção"""
+        while True:
+            item = detection_queue.get()
+            if item is None:
+                detection_queue.task_done()
+                break
+            
+            event_id, partition, event, enqueued_at = item
+            lag = time.monotonic() - enqueued_at
+            
+            try:
+                self.process_detection(event_id, partition, event, lag)
+            except Exception as e:
+                with self._detection_lock:
+                    self._detection_metrics['failed'] += 1
+                self.logger.error(f"Erro na detecção do evento {event_id}: {str(e)}")
+            finally:
+                with self._detection_lock:
+                    self._detection_pending.pop(event_id, None)
+                detection_queue.task_done()
+
+    def process_detection(self, event_id: int, partition: str, event: SecurityEvent, lag: float = 0.0):
+        """Executar detectores e gravar o resultado no evento"""
+        started = time.monotonic()
+        anomalies = self.analyze_event_realtime(event)
+        
+        risk_score = self.calculate_event_risk_score(event, anomalies)
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            UPDATE {partition} 
+            SET risk_score = ?, anomaly_detected = ?, processed = 1
+            WHERE id = ?
+        ''', (risk_score, bool(anomalies), event_id))
+        conn.commit()
+        conn.close()
+        
+        duration = time.monotonic() - started
+        with self._detection_lock:
+            metrics = self._detection_metrics
+            metrics['processed'] += 1
+            if anomalies:
+                metrics['anomalous_events'] += 1
+            metrics['last_lag_seconds'] = lag
+            metrics['max_lag_seconds'] = max(metrics['max_lag_seconds'], lag)
+            # Média móvel exponencial
+            metrics['avg_lag_seconds'] = 0.9 * metrics['avg_lag_seconds'] + 0.1 * lag
+            metrics['avg_detection_seconds'] = 0.9 * metrics['avg_detection_seconds'] + 0.1 * duration
+        
+        return anomalies
+
+    def calculate_event_risk_score(self, event: SecurityEvent, anomalies: List[str]) -> float:
+        """Pontuação de risco do evento a partir das anomalias detectadas"""
+        if not anomalies:
+            return event.risk_score
+        
+        severity_scores = {'LOW': 0.25, 'MEDIUM': 0.5, 'HIGH': 0.75, 'CRITICAL': 1.0}
+        severity = self.calculate_alert_severity(event, anomalies)
+        return max(event.risk_score, severity_scores[severity])
+
+    def recover_unprocessed_events(self) -> int:
+        """Reenfileirar eventos recentes que não passaram pela detecção (ex.: reinício)
+        
+        Cada processo chama isto ao iniciar; eventos dentro do período de carência
+        ainda podem estar na fila de outro worker vivo e são ignorados. As linhas
+        são reivindicadas (claimed_at) antes de enfileirar, de modo que dois
+        processos iniciando juntos não executam a detecção do mesmo evento; se o
+        processo que reivindicou cair antes da detecção, a reivindicação expira
+        após recovery_lease_seconds e a próxima recuperação a retoma.
+        """
+        since = datetime.now() - timedelta(hours=self.detection_config['recovery_window_hours'])
+        grace = f"-{int(self.detection_config['recovery_grace_seconds'])} seconds"
+        lease = f"-{int(self.detection_config['recovery_lease_seconds'])} seconds"
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        pending = []
+        for partition in self._active_partitions(cursor, since):
+            self._ensure_claim_column(cursor, partition)
+            # created_at, claimed_at e datetime('now') estão todos em UTC
+            cursor.execute(f'''
+                SELECT id, user_id, event_type, ip_address, timestamp, details, risk_score
+                FROM {partition}
+                WHERE processed = 0 AND timestamp > ? AND created_at < datetime('now', ?)
+                AND (claimed_at IS NULL OR claimed_at < datetime('now', ?))
+                ORDER BY id
+            ''', (since, grace, lease))
+            for row in cursor.fetchall():
+                cursor.execute(f'''
+                    UPDATE {partition} SET claimed_at = datetime('now')
+                    WHERE id = ? AND processed = 0 AND (claimed_at IS NULL OR claimed_at < datetime('now', ?))
+                ''', (row[0], lease))
+                if cursor.rowcount == 1:
+                    pending.append((partition, row))
+            conn.commit()
+        
+        conn.close()
+        
+        for partition, row in pending:
+            event = SecurityEvent(
+                user_id=row[1],
+                event_type=row[2],
+                ip_address=row[3],
+                timestamp=datetime.fromisoformat(row[4]),
+                details=json.loads(row[5]) if row[5] else {},
+                risk_score=row[6] or 0.0
+            )
+            self.enqueue_detection(row[0], partition, event)
+        
+        if pending:
+            with self._detection_lock:
+                self._detection_metrics['recovered'] += len(pending)
+            self.logger.info(f"{len(pending)} eventos pendentes reenfileirados para detecção")
+        
+        return len(pending)
+
+    def get_detection_metrics(self) -> Dict[str, Any]:
+        """Métricas do pipeline de detecção (profundidade e atraso da fila)"""
+        now = time.monotonic()
+        with self._detection_lock:
+            metrics = dict(self._detection_metrics)
+            pending = len(self._detection_pending)
+            oldest = next(iter(self._detection_pending.values()), None)
+        
+        metrics.update({
+            'async': self.detection_config['async'],
+            'workers': len(self._detection_workers),
+            'queue_depth': sum(q.qsize() for q in self._detection_queues),
+            'pending_events': pending,
+            # Atraso atual: há quanto tempo o evento mais antigo espera
+            'queue_lag_seconds': round(now - oldest, 3) if oldest is not None else 0.0
+        })
+        return metrics
+
+    def wait_for_detection(self, timeout: Optional[float] = None) -> bool:
+        """Aguardar a fila de detecção esvaziar"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            with self._detection_lock:
+                if not self._detection_pending:
+                    return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def shutdown_detection(self, timeout: float = 5.0):
+        """Encerrar workers após drenar a fila"""
+        if not self._detection_workers:
+            return
+        
+        for detection_queue in self._detection_queues:
+            detection_queue.put(None)
+        for worker in self._detection_workers:
+            worker.join(timeout)
+        
+        self._detection_workers = []
+        self._detection_queues = []
+
+    def analyze_event_realtime(self, event: SecurityEvent) -> List[str]:
         """Análise em tempo real de eventos"""
         anomalies = []
         
@@ -195,6 +643,8 @@ class AuditAnalyzer:
         # Gerar alertas se necessário
         if anomalies:
             self.create_security_alert(event, anomalies)
+        
+        return anomalies
 
     def detect_suspicious_patterns(self, event: SecurityEvent) -> bool:
         """Detectar padrões suspeitos nos dados do evento"""
@@ -260,9 +710,10 @@ class AuditAnalyzer:
         
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
+        source = self._events_source(cursor, one_hour_ago, event.timestamp)
         
-        cursor.execute('''
-            SELECT COUNT(*) FROM security_events 
+        cursor.execute(f'''
+            SELECT COUNT(*) FROM {source} AS security_events 
             WHERE event_type = 'login_failed' 
             AND ip_address = ? 
             AND timestamp > ?
@@ -291,35 +742,87 @@ class AuditAnalyzer:
         
         return active_sessions >= self.anomaly_thresholds['max_concurrent_sessions']
 
-    def create_security_alert(self, event: SecurityEvent, anomalies: List[str]):
-        """Criar alerta de segurança"""
+    def create_security_alert(self, event: SecurityEvent, anomalies: List[str]) -> int:
+        """Criar alerta de segurança (ou agrupar em alerta equivalente recente)"""
+        alert_type = 'BEHAVIORAL_ANOMALY'
         severity = self.calculate_alert_severity(event, anomalies)
         description = f"Anomalias detectadas: {', '.join(anomalies)}"
+        fingerprint = self.get_alert_fingerprint(alert_type, event, anomalies)
+        window_start = event.timestamp - timedelta(seconds=self.anomaly_thresholds['alert_suppression_window'])
         
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        # Alerta equivalente ainda aberto dentro da janela de supressão
         cursor.execute('''
-            INSERT INTO security_alerts 
-            (alert_type, severity, user_id, ip_address, description, details)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            'BEHAVIORAL_ANOMALY',
-            severity,
-            event.user_id,
-            event.ip_address,
-            description,
-            json.dumps({
-                'event': event.__dict__,
-                'anomalies': anomalies,
-                'timestamp': event.timestamp.isoformat()
-            })
-        ))
+            SELECT id, severity FROM security_alerts 
+            WHERE fingerprint = ? AND resolved = 0 AND last_seen > ?
+            ORDER BY last_seen DESC
+            LIMIT 1
+        ''', (fingerprint, window_start))
+        
+        existing = cursor.fetchone()
+        
+        if existing:
+            alert_id = existing[0]
+            cursor.execute('''
+                UPDATE security_alerts 
+                SET occurrence_count = occurrence_count + 1,
+                    last_seen = MAX(last_seen, ?),
+                    severity = ?
+                WHERE id = ?
+            ''', (
+                event.timestamp,
+                self.max_severity(existing[1], severity),
+                alert_id
+            ))
+        else:
+            cursor.execute('''
+                INSERT INTO security_alerts 
+                (alert_type, severity, user_id, ip_address, description, details,
+                 fingerprint, occurrence_count, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)
+            ''', (
+                alert_type,
+                severity,
+                event.user_id,
+                event.ip_address,
+                description,
+                json.dumps({
+                    'event': event.__dict__,
+                    'anomalies': anomalies,
+                    'timestamp': event.timestamp.isoformat()
+                }, default=str),
+                fingerprint,
+                event.timestamp
+            ))
+            alert_id = cursor.lastrowid
         
         conn.commit()
         conn.close()
         
-        self.logger.warning(f"Alerta de segurança criado: {description}")
+        if existing:
+            self.logger.info(f"Alerta {alert_id} repetido, ocorrência agrupada: {description}")
+        else:
+            self.logger.warning(f"Alerta de segurança criado: {description}")
+        
+        return alert_id
+
+    def get_alert_fingerprint(self, alert_type: str, event: SecurityEvent, anomalies: List[str]) -> str:
+        """Chave de deduplicação: tipo do alerta, usuário, IP e conjunto de anomalias"""
+        key = '|'.join([
+            alert_type,
+            event.user_id or '',
+            event.ip_address or '',
+            ','.join(sorted(set(anomalies)))
+        ])
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def max_severity(self, current: str, new: str) -> str:
+        """Retorna a severidade mais alta entre duas"""
+        order = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+        ranks = {level: i for i, level in enumerate(order)}
+        return current if ranks.get(current, 0) >= ranks.get(new, 0) else new
 
     def calculate_alert_severity(self, event: SecurityEvent, anomalies: List[str]) -> str:
         """Calcular severidade do alerta"""
@@ -365,10 +868,11 @@ class AuditAnalyzer:
         
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
+        source = self._events_source(cursor, thirty_days_ago)
         
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT event_type, ip_address, timestamp, details 
-            FROM security_events 
+            FROM {source} AS security_events 
             WHERE user_id = ? AND timestamp > ?
             ORDER BY timestamp
         ''', (user_id, thirty_days_ago))
@@ -444,30 +948,39 @@ class AuditAnalyzer:
             risk_level=result[4]
         )
 
-    def generate_security_report(self, days: int = 7) -> Dict[str, Any]:
-        """Gerar relatório de segurança"""
+    def enable_analytics_mode(self, snapshot_dir: str):
+        """Configurar snapshots colunares de security_events para relatórios analíticos"""
+        self.snapshot_store = audit_snapshot.AuditSnapshotStore(snapshot_dir, audit_db_path=self.db_path)
+        return self.snapshot_store
+
+    def generate_security_report(self, days: int = 7, use_snapshot: bool = False) -> Dict[str, Any]:
+        """Gerar relatório de segurança (use_snapshot lê os snapshots colunares)"""
+        if use_snapshot:
+            return self._generate_snapshot_report(days)
+        
         start_date = datetime.now() - timedelta(days=days)
         
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
+        source = self._events_source(cursor, start_date)
         
         # Estatísticas gerais
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT 
                 COUNT(*) as total_events,
                 COUNT(CASE WHEN anomaly_detected = 1 THEN 1 END) as anomalies,
                 COUNT(DISTINCT user_id) as unique_users,
                 COUNT(DISTINCT ip_address) as unique_ips
-            FROM security_events 
+            FROM {source} AS security_events 
             WHERE timestamp > ?
         ''', (start_date,))
         
         stats = cursor.fetchone()
         
         # Eventos por tipo
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT event_type, COUNT(*) as count
-            FROM security_events 
+            FROM {source} AS security_events 
             WHERE timestamp > ?
             GROUP BY event_type
             ORDER BY count DESC
@@ -476,10 +989,10 @@ class AuditAnalyzer:
         events_by_type = dict(cursor.fetchall())
         
         # Top IPs suspeitos
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT ip_address, COUNT(*) as events, 
                    COUNT(CASE WHEN anomaly_detected = 1 THEN 1 END) as anomalies
-            FROM security_events 
+            FROM {source} AS security_events 
             WHERE timestamp > ?
             GROUP BY ip_address
             HAVING anomalies > 0
@@ -507,9 +1020,9 @@ class AuditAnalyzer:
         alerts_by_severity = dict(cursor.fetchall())
         
         # Usuários com mais anomalias
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT user_id, COUNT(*) as anomalies
-            FROM security_events 
+            FROM {source} AS security_events 
             WHERE timestamp > ? AND anomaly_detected = 1
             GROUP BY user_id
             ORDER BY anomalies DESC
@@ -542,16 +1055,94 @@ class AuditAnalyzer:
             'users_with_anomalies': users_with_anomalies
         }
 
+    def _generate_snapshot_report(self, days: int) -> Dict[str, Any]:
+        """Relatório de segurança com estatísticas de eventos lidas dos snapshots"""
+        if self.snapshot_store is None:
+            raise RuntimeError('Modo analítico sem diretório de snapshots configurado')
+        
+        start_date = datetime.now() - timedelta(days=days)
+        
+        # Agregados parciais por lote, combinados no final
+        total_events = anomalies = 0
+        by_type, by_ip, by_user, users, ips = [], [], [], [], []
+        for chunk in self.snapshot_store.scan(
+            'security_events', start=str(start_date),
+            columns=['user_id', 'event_type', 'ip_address', 'anomaly_detected']
+        ):
+            flagged = chunk['anomaly_detected'] == 1
+            total_events += len(chunk)
+            anomalies += int(flagged.sum())
+            by_type.append(chunk['event_type'].value_counts())
+            by_ip.append(chunk.assign(anomalies=flagged.astype(int)).groupby('ip_address').agg(
+                events=('event_type', 'size'), anomalies=('anomalies', 'sum')
+            ))
+            by_user.append(chunk.loc[flagged, 'user_id'].value_counts())
+            users.append(chunk['user_id'].drop_duplicates())
+            ips.append(chunk['ip_address'].drop_duplicates())
+        
+        events_by_type, suspicious_ips, users_with_anomalies = {}, [], []
+        unique_users = unique_ips = 0
+        if total_events:
+            type_counts = pd.concat(by_type).groupby(level=0).sum().sort_values(ascending=False)
+            events_by_type = {event_type: int(count) for event_type, count in type_counts.items()}
+            
+            ip_stats = pd.concat(by_ip).groupby(level=0).sum()
+            ip_stats = ip_stats[ip_stats['anomalies'] > 0].sort_values(['anomalies', 'events'], ascending=False)
+            suspicious_ips = [
+                {'ip': ip, 'events': int(row['events']), 'anomalies': int(row['anomalies'])}
+                for ip, row in ip_stats.head(10).iterrows()
+            ]
+            
+            user_counts = pd.concat(by_user).groupby(level=0).sum().sort_values(ascending=False)
+            users_with_anomalies = [
+                {'user_id': user_id, 'anomalies': int(count)}
+                for user_id, count in user_counts.head(10).items()
+            ]
+            
+            unique_users = pd.concat(users).dropna().nunique()
+            unique_ips = pd.concat(ips).dropna().nunique()
+        
+        # Alertas continuam no banco (tabela pequena, não exportada)
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT severity, COUNT(*) as count
+            FROM security_alerts 
+            WHERE created_at > ?
+            GROUP BY severity
+        ''', (start_date,))
+        alerts_by_severity = dict(cursor.fetchall())
+        conn.close()
+        
+        return {
+            'period': f"Últimos {days} dias",
+            'generated_at': datetime.now().isoformat(),
+            'source': 'snapshot',
+            'snapshot_exported_at': self.snapshot_store.snapshot_version(['security_events']),
+            'statistics': {
+                'total_events': total_events,
+                'anomalies_detected': anomalies,
+                'unique_users': int(unique_users),
+                'unique_ips': int(unique_ips),
+                'anomaly_rate': round((anomalies / total_events * 100) if total_events > 0 else 0, 2)
+            },
+            'events_by_type': events_by_type,
+            'suspicious_ips': suspicious_ips,
+            'alerts_by_severity': alerts_by_severity,
+            'users_with_anomalies': users_with_anomalies
+        }
+
     def get_user_activity_timeline(self, user_id: str, days: int = 30) -> List[Dict[str, Any]]:
         """Obter timeline de atividades do usuário"""
         start_date = datetime.now() - timedelta(days=days)
         
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
+        source = self._events_source(cursor, start_date)
         
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT event_type, ip_address, timestamp, details, risk_score, anomaly_detected
-            FROM security_events 
+            FROM {source} AS security_events 
             WHERE user_id = ? AND timestamp > ?
             ORDER BY timestamp DESC
         ''', (user_id, start_date))
@@ -576,25 +1167,26 @@ class AuditAnalyzer:
         
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
+        source = self._events_source(cursor, start_date)
         
         # Estatísticas do IP
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT 
                 COUNT(*) as total_events,
                 COUNT(CASE WHEN anomaly_detected = 1 THEN 1 END) as anomalies,
                 COUNT(DISTINCT user_id) as unique_users,
                 MIN(timestamp) as first_seen,
                 MAX(timestamp) as last_seen
-            FROM security_events 
+            FROM {source} AS security_events 
             WHERE ip_address = ? AND timestamp > ?
         ''', (ip_address, start_date))
         
         stats = cursor.fetchone()
         
         # Eventos por tipo
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT event_type, COUNT(*) as count
-            FROM security_events 
+            FROM {source} AS security_events 
             WHERE ip_address = ? AND timestamp > ?
             GROUP BY event_type
             ORDER BY count DESC
@@ -603,9 +1195,9 @@ class AuditAnalyzer:
         events_by_type = dict(cursor.fetchall())
         
         # Usuários acessados
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT user_id, COUNT(*) as events
-            FROM security_events 
+            FROM {source} AS security_events 
             WHERE ip_address = ? AND timestamp > ?
             GROUP BY user_id
             ORDER BY events DESC
@@ -686,7 +1278,8 @@ class AuditAnalyzer:
         
         query = '''
             SELECT id, alert_type, severity, user_id, ip_address, 
-                   description, details, created_at
+                   description, details, created_at,
+                   COALESCE(occurrence_count, 1), COALESCE(last_seen, created_at)
             FROM security_alerts 
             WHERE resolved = 0
         '''
@@ -696,7 +1289,7 @@ class AuditAnalyzer:
             query += ' AND severity = ?'
             params.append(severity)
         
-        query += ' ORDER BY created_at DESC'
+        query += ' ORDER BY COALESCE(last_seen, created_at) DESC'
         
         cursor.execute(query, params)
         
@@ -710,7 +1303,9 @@ class AuditAnalyzer:
                 'ip_address': row[4],
                 'description': row[5],
                 'details': json.loads(row[6]) if row[6] else {},
-                'created_at': row[7]
+                'created_at': row[7],
+                'occurrence_count': row[8],
+                'last_seen': row[9]
             })
         
         conn.close()
@@ -731,6 +1326,259 @@ class AuditAnalyzer:
         conn.commit()
         conn.close()
 
+    def get_security_events(self, days: int = 7, user_id: Optional[str] = None,
+                            event_type: Optional[str] = None, ip_address: Optional[str] = None,
+                            limit: int = 100) -> List[Dict[str, Any]]:
+        """Obter eventos de segurança filtrados (partições do período)"""
+        start_date = datetime.now() - timedelta(days=days)
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        source = self._events_source(cursor, start_date)
+        
+        query = f'''
+            SELECT id, user_id, event_type, ip_address, timestamp, 
+                   details, risk_score, anomaly_detected
+            FROM {source} AS security_events 
+            WHERE timestamp > ?
+        '''
+        params = [start_date]
+        
+        if user_id:
+            query += ' AND user_id = ?'
+            params.append(user_id)
+        
+        if event_type:
+            query += ' AND event_type = ?'
+            params.append(event_type)
+        
+        if ip_address:
+            query += ' AND ip_address = ?'
+            params.append(ip_address)
+        
+        query += ' ORDER BY timestamp DESC LIMIT ?'
+        params.append(limit)
+        
+        cursor.execute(query, params)
+        
+        events = []
+        for row in cursor.fetchall():
+            events.append({
+                'id': row[0],
+                'user_id': row[1],
+                'event_type': row[2],
+                'ip_address': row[3],
+                'timestamp': row[4],
+                'details': json.loads(row[5]),
+                'risk_score': row[6],
+                'anomaly_detected': bool(row[7])
+            })
+        
+        conn.close()
+        return events
+
+    def count_events(self, since: datetime, anomalies_only: bool = False) -> int:
+        """Contar eventos desde uma data"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        source = self._events_source(cursor, since)
+        
+        query = f'SELECT COUNT(*) FROM {source} AS security_events WHERE timestamp > ?'
+        if anomalies_only:
+            query += ' AND anomaly_detected = 1'
+        
+        cursor.execute(query, (since,))
+        count = cursor.fetchone()[0]
+        
+        conn.close()
+        return count
+
+    def get_partition_info(self) -> List[Dict[str, Any]]:
+        """Listar partições de eventos (ativas e arquivadas)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT name, period, status, row_count, archive_path, archived_at, created_at
+            FROM security_event_partitions
+            ORDER BY period DESC
+        ''')
+        rows = cursor.fetchall()
+        
+        partitions = []
+        for name, period, status, row_count, archive_path, archived_at, created_at in rows:
+            if status == 'active':
+                cursor.execute(f'SELECT COUNT(*) FROM {name}')
+                row_count = cursor.fetchone()[0]
+            partitions.append({
+                'name': name,
+                'period': period,
+                'status': status,
+                'row_count': row_count,
+                'archive_path': archive_path,
+                'archived_at': archived_at,
+                'created_at': created_at
+            })
+        
+        conn.close()
+        return partitions
+
+    def archive_old_partitions(self, retention_months: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Mover partições fora da retenção para arquivos compactados somente leitura"""
+        retention = retention_months if retention_months is not None else self.storage_config['retention_months']
+        
+        now = datetime.now()
+        months = now.year * 12 + now.month - 1 - retention
+        cutoff_period = f"{months // 12:04d}{months % 12 + 1:02d}"
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT name, period, archive_path FROM security_event_partitions
+            WHERE status = 'active' AND period < ?
+            ORDER BY period
+        ''', (cutoff_period,))
+        
+        archived = []
+        for name, period, archive_path in cursor.fetchall():
+            archived.append(self._archive_partition(conn, name, period, archive_path))
+        
+        conn.close()
+        return archived
+
+    def _archive_partition(self, conn, name: str, period: str, archive_path: Optional[str]) -> Dict[str, Any]:
+        """Copia a partição para um SQLite gzip, depois a remove do banco principal"""
+        archive_dir = self.storage_config['archive_dir']
+        os.makedirs(archive_dir, exist_ok=True)
+        
+        archive_path = archive_path or os.path.join(archive_dir, f'{name}.db.gz')
+        work_path = os.path.join(archive_dir, f'{name}.db.tmp')
+        
+        # Partição reaberta por evento tardio: mescla no arquivo existente
+        if os.path.exists(archive_path):
+            with gzip.open(archive_path, 'rb') as src, open(work_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+        
+        cursor = conn.cursor()
+        cursor.execute('ATTACH DATABASE ? AS archive', (work_path,))
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS archive.security_events ({EVENT_TABLE_SCHEMA})')
+        cursor.execute('CREATE INDEX IF NOT EXISTS archive.idx_archive_user_time ON security_events(user_id, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS archive.idx_archive_ip_time ON security_events(ip_address, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS archive.idx_archive_time ON security_events(timestamp)')
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO archive.security_events ({EVENT_COLUMNS})
+            SELECT {EVENT_COLUMNS} FROM main.{name}
+        ''')
+        cursor.execute('SELECT COUNT(*) FROM archive.security_events')
+        row_count = cursor.fetchone()[0]
+        conn.commit()
+        cursor.execute('DETACH DATABASE archive')
+        
+        partial_path = archive_path + '.part'
+        with open(work_path, 'rb') as src, gzip.open(partial_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.chmod(partial_path, 0o444)
+        os.replace(partial_path, archive_path)
+        os.remove(work_path)
+        
+        # Só remove a partição depois do arquivo gravado
+        cursor.execute(f'DROP TABLE {name}')
+        cursor.execute('''
+            UPDATE security_event_partitions
+            SET status = 'archived', archive_path = ?, row_count = ?, archived_at = ?
+            WHERE name = ?
+        ''', (archive_path, row_count, datetime.now(), name))
+        self._refresh_events_view(cursor)
+        conn.commit()
+        
+        self._known_partitions.discard(name)
+        self.logger.info(f"Partição {name} arquivada em {archive_path} ({row_count} eventos)")
+        
+        return {
+            'name': name,
+            'period': period,
+            'archive_path': archive_path,
+            'row_count': row_count
+        }
+
+    def _open_archive(self, name: str, archive_path: str):
+        """Abrir arquivo de partição em modo somente leitura"""
+        cache_dir = os.path.join(self.storage_config['archive_dir'], '.cache')
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_path = os.path.join(cache_dir, f'{name}.db')
+        
+        if (not os.path.exists(cache_path)
+                or os.path.getmtime(cache_path) < os.path.getmtime(archive_path)):
+            partial_path = cache_path + '.part'
+            with gzip.open(archive_path, 'rb') as src, open(partial_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.chmod(partial_path, 0o444)
+            os.replace(partial_path, cache_path)
+        
+        return sqlite3.connect(f'file:{cache_path}?mode=ro&immutable=1', uri=True)
+
+    def query_archived_events(self, start_date: datetime, end_date: Optional[datetime] = None,
+                              user_id: Optional[str] = None, ip_address: Optional[str] = None,
+                              event_type: Optional[str] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Consultar eventos em partições arquivadas (investigações)"""
+        end_date = end_date or datetime.now()
+        start_period = self._period_of(start_date)
+        end_period = self._period_of(end_date)
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT name, archive_path FROM security_event_partitions
+            WHERE status = 'archived' AND period >= ? AND period <= ?
+            ORDER BY period DESC
+        ''', (start_period, end_period))
+        archives = cursor.fetchall()
+        conn.close()
+        
+        query = '''
+            SELECT id, user_id, event_type, ip_address, timestamp, 
+                   details, risk_score, anomaly_detected
+            FROM security_events 
+            WHERE timestamp >= ? AND timestamp <= ?
+        '''
+        params = [start_date, end_date]
+        
+        if user_id:
+            query += ' AND user_id = ?'
+            params.append(user_id)
+        
+        if ip_address:
+            query += ' AND ip_address = ?'
+            params.append(ip_address)
+        
+        if event_type:
+            query += ' AND event_type = ?'
+            params.append(event_type)
+        
+        query += ' ORDER BY timestamp DESC LIMIT ?'
+        params.append(limit)
+        
+        events = []
+        for name, archive_path in archives:
+            archive_conn = self._open_archive(name, archive_path)
+            for row in archive_conn.execute(query, params):
+                events.append({
+                    'id': row[0],
+                    'user_id': row[1],
+                    'event_type': row[2],
+                    'ip_address': row[3],
+                    'timestamp': row[4],
+                    'details': json.loads(row[5]),
+                    'risk_score': row[6],
+                    'anomaly_detected': bool(row[7]),
+                    'partition': name
+                })
+            archive_conn.close()
+        
+        events.sort(key=lambda e: e['timestamp'], reverse=True)
+        return events[:limit]
+
 # Exemplo de uso e testes
 if __name__ == "__main__":
     analyzer = AuditAnalyzer()
@@ -764,6 +1612,10 @@ if __name__ == "__main__":
     for event in test_events:
         analyzer.log_security_event(event)
     
+    # Aguardar a detecção assíncrona antes do relatório
+    analyzer.wait_for_detection(timeout=10)
+    print("Métricas de detecção:", analyzer.get_detection_metrics())
+    
     # Gerar relatório
     report = analyzer.generate_security_report(days=1)
     print("Relatório de Segurança:")
@@ -0,0 +1,393 @@
+"""
+CertGuard AI - Snapshots colunares de auditoria para análises offline
+Exporta access_logs, audit_events e security_events em arquivos Arrow IPC
+particionados por dia e os lê com mapeamento em memória, sem tocar o banco OLTP
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Any, Optional, Iterator, Tuple, TYPE_CHECKING
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+
+if TYPE_CHECKING:
+    import pandas
+
+logger = logging.getLogger(__name__)
+
+# Tabelas exportadas: banco de origem, coluna de tempo (None = dimensão exportada
+# inteira) e consulta (colunas derivadas vêm prontas para as agregações)
+SNAPSHOT_TABLES: Dict[str, Dict[str, Any]] = {
+    "access_logs": {
+        "database": "lucia",
+        "time_column": "timestamp",
+        "query": """
+            SELECT al.*,
+                   DATE(al.timestamp) AS day,
+                   strftime('%H', al.timestamp) AS hour,
+                   strftime('%w', al.timestamp) AS day_of_week
+            FROM access_logs al
+            WHERE al.timestamp >= ? AND al.timestamp < ?
+            ORDER BY al.timestamp
+        """
+    },
+    "audit_events": {
+        "database": "lucia",
+        "time_column": "timestamp",
+        "query": """
+            SELECT * FROM audit_events
+            WHERE timestamp >= ? AND timestamp < ?
+            ORDER BY timestamp
+        """
+    },
+    "security_events": {
+        "database": "audit",
+        "time_column": "timestamp",
+        "query": """
+            SELECT * FROM security_events
+            WHERE timestamp >= ? AND timestamp < ?
+            ORDER BY timestamp
+        """
+    },
+    "users": {"database": "lucia", "time_column": None, "query": "SELECT * FROM users ORDER BY id"},
+    "organizations": {"database": "lucia", "time_column": None, "query": "SELECT * FROM organizations ORDER BY id"}
+}
+
+
+class AuditSnapshotStore:
+    """Exportação e leitura de snapshots Arrow IPC particionados por dia"""
+
+    def __init__(self, snapshot_dir: str, lucia_db_path: Optional[str] = None,
+                 audit_db_path: Optional[str] = None, batch_rows: int = 50000):
+        self.snapshot_dir = Path(snapshot_dir)
+        self.databases = {"lucia": lucia_db_path, "audit": audit_db_path}
+        self.config = {
+            "batch_rows": batch_rows,
+            # Dias fechados são reexportados até esse tempo após a meia-noite
+            # (eventos atrasados, risk_score gravado pela detecção assíncrona)
+            "settle_seconds": 3600
+        }
+        self._export_lock = threading.Lock()
+        self._periodic_thread: Optional[threading.Thread] = None
+        self._periodic_stop = threading.Event()
+
+    @staticmethod
+    def is_available() -> bool:
+        """pyarrow instalado"""
+        return pa is not None
+
+    def _require_arrow(self):
+        if pa is None:
+            raise RuntimeError("pyarrow não encontrado. Instale com: pip install pyarrow")
+
+    def tables(self) -> List[str]:
+        """Tabelas cujo banco de origem foi configurado"""
+        return [name for name, spec in SNAPSHOT_TABLES.items() if self.databases.get(spec["database"])]
+
+    # ------------------------------------------------------------------
+    # Exportação
+    # ------------------------------------------------------------------
+
+    def export(self, days: int = 2, force: bool = False) -> Dict[str, Any]:
+        """Exporta os últimos `days` dias (e as dimensões) para o diretório de snapshots"""
+        self._require_arrow()
+
+        today = date.today()
+        window = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+        summary = {"exported_at": datetime.now().isoformat(), "tables": {}}
+
+        with self._export_lock:
+            for table in self.tables():
+                spec = SNAPSHOT_TABLES[table]
+                try:
+                    conn = self._open_source(spec["database"])
+                except sqlite3.Error as e:
+                    logger.warning(f"Snapshot de {table} ignorado: {str(e)}")
+                    continue
+
+                try:
+                    manifest = self._load_manifest(table)
+                    if spec["time_column"] is None:
+                        rows = self._export_file(conn, table, spec["query"], [], self._dimension_path(table))
+                        manifest.update({"rows": rows, "exported_at": datetime.now().isoformat()})
+                        summary["tables"][table] = {"rows": rows}
+                    else:
+                        exported = {}
+                        for day in window:
+                            if not force and self._is_settled(manifest.get("days", {}).get(day.isoformat()), day):
+                                continue
+                            rows = self._export_file(
+                                conn, table, spec["query"],
+                                [day.isoformat(), (day + timedelta(days=1)).isoformat()],
+                                self._day_path(table, day)
+                            )
+                            manifest.setdefault("days", {})[day.isoformat()] = {
+                                "rows": rows,
+                                "exported_at": datetime.now().isoformat()
+                            }
+                            exported[day.isoformat()] = rows
+                        summary["tables"][table] = {"days": exported, "rows": sum(exported.values())}
+                    self._save_manifest(table, manifest)
+                except sqlite3.OperationalError as e:
+                    logger.warning(f"Snapshot de {table} ignorado: {str(e)}")
+                finally:
+                    conn.close()
+
+        logger.info(f"Snapshots exportados: {json.dumps(summary['tables'])}")
+        return summary
+
+    def _open_source(self, database: str) -> sqlite3.Connection:
+        """Conexão somente leitura com o banco de origem"""
+        path = Path(self.databases[database]).absolute()
+        if not path.exists():
+            raise sqlite3.OperationalError(f"banco {path} não encontrado")
+        return sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True)
+
+    def _is_settled(self, entry: Optional[Dict[str, Any]], day: date) -> bool:
+        """Dia fechado já exportado depois do período de acomodação"""
+        if not entry or day >= date.today():
+            return False
+        settled_at = datetime.combine(day + timedelta(days=1), datetime.min.time()) + \
+            timedelta(seconds=self.config["settle_seconds"])
+        return datetime.fromisoformat(entry["exported_at"]) >= settled_at
+
+    def _export_file(self, conn: sqlite3.Connection, table: str, query: str,
+                     params: List[Any], path: Path) -> int:
+        """Grava o resultado da consulta em um arquivo Arrow IPC (troca atômica)"""
+        cursor = conn.execute(query, params)
+        names = [column[0] for column in cursor.description]
+        schema = self._arrow_schema(conn, table, names)
+
+        rows = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with ipc.new_file(sink, schema) as writer:
+                while True:
+                    batch = cursor.fetchmany(self.config["batch_rows"])
+                    if not batch:
+                        break
+                    writer.write_batch(self._record_batch(schema, batch))
+                    rows += len(batch)
+
+        if rows:
+            os.replace(tmp_path, path)
+        else:
+            # Dia sem dados: nenhum arquivo (o manifesto registra rows = 0)
+            tmp_path.unlink()
+            if path.exists():
+                path.unlink()
+        return rows
+
+    def _arrow_schema(self, conn: sqlite3.Connection, table: str, names: List[str]) -> "pa.Schema":
+        """Tipos Arrow a partir dos tipos declarados; colunas derivadas como texto"""
+        declared = {row[1]: (row[2] or "").upper() for row in conn.execute(f"PRAGMA table_info({table})")}
+
+        fields = []
+        for name in names:
+            declared_type = declared.get(name, "")
+            if "INT" in declared_type or "BOOL" in declared_type:
+                arrow_type = pa.int64()
+            elif any(token in declared_type for token in ("REAL", "FLOA", "DOUB")):
+                arrow_type = pa.float64()
+            else:
+                arrow_type = pa.string()
+            fields.append(pa.field(name, arrow_type))
+        return pa.schema(fields)
+
+    def _record_batch(self, schema: "pa.Schema", rows: List[Tuple]) -> "pa.RecordBatch":
+        """Converte linhas do SQLite em um RecordBatch com o esquema da tabela"""
+        arrays = []
+        for index, field in enumerate(schema):
+            values = [row[index] for row in rows]
+            try:
+                arrays.append(pa.array(values, type=field.type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+                arrays.append(pa.array(self._coerce(values, field), type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def _coerce(self, values: List[Any], field: "pa.Field") -> List[Any]:
+        """Tipagem dinâmica do SQLite: ajusta valores fora do tipo declarado da coluna"""
+        if field.type == pa.string():
+            return [None if value is None else str(value) for value in values]
+
+        convert = int if field.type == pa.int64() else float
+        coerced = []
+        for value in values:
+            try:
+                coerced.append(None if value is None else convert(value))
+            except (TypeError, ValueError):
+                coerced.append(None)
+        logger.warning(f"Coluna {field.name}: valores não numéricos exportados como nulos")
+        return coerced
+
+    def start_periodic_export(self, interval_seconds: int = 3600, days: int = 2):
+        """Exporta periodicamente em uma thread daemon"""
+        if self._periodic_thread and self._periodic_thread.is_alive():
+            return
+
+        self._periodic_stop.clear()
+
+        def run():
+            while not self._periodic_stop.is_set():
+                try:
+                    self.export(days=days)
+                except Exception as e:
+                    logger.error(f"Erro na exportação periódica de snapshots: {str(e)}")
+                self._periodic_stop.wait(interval_seconds)
+
+        self._periodic_thread = threading.Thread(target=run, name="audit-snapshot-export", daemon=True)
+        self._periodic_thread.start()
+
+    def stop_periodic_export(self, timeout: float = 5.0):
+        """Interrompe a exportação periódica"""
+        self._periodic_stop.set()
+        if self._periodic_thread:
+            self._periodic_thread.join(timeout)
+            self._periodic_thread = None
+
+    # ------------------------------------------------------------------
+    # Leitura (mapeamento em memória)
+    # ------------------------------------------------------------------
+
+    def scan(self, table: str, start: Optional[str] = None, end: Optional[str] = None,
+             columns: Optional[List[str]] = None, equals: Optional[Dict[str, Any]] = None) -> Iterator["pandas.DataFrame"]:
+        """Percorre os lotes das partições diárias do período, em ordem de tempo
+
+        Arquivos são lidos via mmap: só as colunas pedidas são paginadas do disco.
+        `start`/`end` comparam como texto ISO, como as consultas do SQLite;
+        `equals` filtra colunas por igualdade antes da conversão para pandas.
+        """
+        self._require_arrow()
+        time_column = SNAPSHOT_TABLES[table]["time_column"]
+
+        # Lotes filtrados são agrupados até batch_rows linhas antes da conversão
+        pending, pending_rows = [], 0
+        for day, path in self._day_files(table, start, end):
+            with pa.memory_map(str(path), "r") as source:
+                reader = ipc.open_file(source)
+                for index in range(reader.num_record_batches):
+                    batch = reader.get_batch(index)
+
+                    if start and day == start[:10]:
+                        batch = batch.filter(pc.greater_equal(batch[time_column], start))
+                    if end and day == end[:10]:
+                        batch = batch.filter(pc.less(batch[time_column], end))
+                    for column, value in (equals or {}).items():
+                        batch = batch.filter(pc.equal(batch[column], pa.scalar(value, batch.schema.field(column).type)))
+                    if not batch.num_rows:
+                        continue
+
+                    pending.append(batch.select(columns) if columns else batch)
+                    pending_rows += batch.num_rows
+                    if pending_rows >= self.config["batch_rows"]:
+                        yield pa.Table.from_batches(pending).to_pandas()
+                        pending, pending_rows = [], 0
+
+        if pending:
+            yield pa.Table.from_batches(pending).to_pandas()
+
+    def read_dimension(self, table: str, columns: Optional[List[str]] = None) -> "pandas.DataFrame":
+        """Lê uma tabela de dimensão exportada inteira"""
+        self._require_arrow()
+        path = self._dimension_path(table)
+        if not path.exists():
+            raise FileNotFoundError(f"Snapshot de {table} não encontrado em {path}")
+
+        with pa.memory_map(str(path), "r") as source:
+            data = ipc.open_file(source).read_all()
+            if columns:
+                data = data.select(columns)
+            return data.to_pandas()
+
+    def _day_files(self, table: str, start: Optional[str], end: Optional[str]) -> List[Tuple[str, Path]]:
+        """Arquivos diários existentes no período, em ordem"""
+        table_dir = self.snapshot_dir / table
+        if not table_dir.exists():
+            return []
+
+        files = []
+        for partition in sorted(table_dir.glob("day=*")):
+            day = partition.name[len("day="):]
+            if start and day < start[:10]:
+                continue
+            if end and day > end[:10]:
+                continue
+            path = partition / "part.arrow"
+            if path.exists():
+                files.append((day, path))
+        return files
+
+    def _day_path(self, table: str, day: date) -> Path:
+        return self.snapshot_dir / table / f"day={day.isoformat()}" / "part.arrow"
+
+    def _dimension_path(self, table: str) -> Path:
+        return self.snapshot_dir / table / "part.arrow"
+
+    # ------------------------------------------------------------------
+    # Manifesto
+    # ------------------------------------------------------------------
+
+    def _manifest_path(self, table: str) -> Path:
+        return self.snapshot_dir / table / "_manifest.json"
+
+    def _load_manifest(self, table: str) -> Dict[str, Any]:
+        path = self._manifest_path(table)
+        if not path.exists():
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self, table: str, manifest: Dict[str, Any]):
+        path = self._manifest_path(table)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def snapshot_version(self, tables: Optional[List[str]] = None) -> Optional[str]:
+        """Horário da exportação mais recente (chave de cache das análises)"""
+        latest = None
+        for table in tables or list(SNAPSHOT_TABLES):
+            manifest = self._load_manifest(table)
+            stamps = [manifest.get("exported_at")] + [
+                entry["exported_at"] for entry in manifest.get("days", {}).values()
+            ]
+            for stamp in filter(None, stamps):
+                latest = max(latest, stamp) if latest else stamp
+        return latest
+
+    def get_snapshot_info(self) -> Dict[str, Any]:
+        """Resumo das partições exportadas por tabela"""
+        info = {"snapshot_dir": str(self.snapshot_dir), "available": self.is_available(), "tables": {}}
+
+        for table in SNAPSHOT_TABLES:
+            manifest = self._load_manifest(table)
+            if not manifest:
+                continue
+
+            if SNAPSHOT_TABLES[table]["time_column"] is None:
+                info["tables"][table] = {"rows": manifest.get("rows", 0), "exported_at": manifest.get("exported_at")}
+                continue
+
+            days = manifest.get("days", {})
+            info["tables"][table] = {
+                "partitions": len(days),
+                "rows": sum(entry["rows"] for entry in days.values()),
+                "first_day": min(days) if days else None,
+                "last_day": max(days) if days else None,
+                "size_bytes": sum(path.stat().st_size for _, path in self._day_files(table, None, None))
+            }
+        return info
@@ -5,16 +5,22 @@ Implementação enterprise com Hyperledger Fabric e versão MVP simulada
 
 import os
 import json
+import re
 import hashlib
 import time
+import unicodedata
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Set
+from collections import defaultdict
 import logging
 from dataclasses import dataclass, asdict
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 import asyncio
-import aiofiles
+
+from .registry import registry, lazy_import
+
+aiofiles = lazy_import("aiofiles")
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
@@ -202,6 +208,11 @@ class BlockchainAuditService:
         self.pending_records: List[AuditRecord] = []
         self.block_size = 10  # Número de registros por bloco
         
+        # Índice invertido para busca textual: termo -> IDs de registros
+        self.search_index: Dict[str, Set[str]] = defaultdict(set)
+        self.record_lookup: Dict[str, AuditRecord] = {}
+        self.record_locations: Dict[str, Any] = {}  # ID -> índice do bloco ou "pending"
+        
         # Configurações de segurança
         self.private_key = rsa.generate_private_key(
             public_exponent=65537,
@@ -245,6 +256,7 @@ class BlockchainAuditService:
         
         genesis_block.mine_block()
         self.blockchain.append(genesis_block)
+        self._index_record(genesis_record, 0)
         self.stats["total_blocks"] = 1
         
         logger.info("Bloco gênesis criado")
@@ -280,6 +292,7 @@ class BlockchainAuditService:
         
         # Adiciona à lista de registros pendentes
         self.pending_records.append(audit_record)
+        self._index_record(audit_record, "pending")
         self.stats["total_records"] += 1
         
         logger.info(f"Evento de auditoria registrado: {record_id}")
@@ -321,6 +334,8 @@ class BlockchainAuditService:
         
         # Adiciona à blockchain
         self.blockchain.append(new_block)
+        for record in new_block.data:
+            self.record_locations[record.id] = new_block.index
         self.pending_records.clear()
         
         # Atualiza estatísticas
@@ -374,31 +389,46 @@ class BlockchainAuditService:
                             resource_id: Optional[str] = None,
                             start_date: Optional[str] = None,
                             end_date: Optional[str] = None,
-                            limit: int = 100) -> List[Dict[str, Any]]:
+                            limit: int = 100,
+                            action: Optional[str] = None,
+                            search_text: Optional[str] = None) -> List[Dict[str, Any]]:
         """Recupera trilha de auditoria com filtros"""
         
         all_records = []
         
-        # Coleta registros de todos os blocos
-        for block in self.blockchain:
-            for record in block.data:
+        if search_text:
+            # Candidatos vêm do índice invertido, sem percorrer a cadeia
+            for record_id in self.search_records(search_text):
+                location = self.record_locations[record_id]
+                all_records.append({
+                    **self.record_lookup[record_id].to_dict(),
+                    "block_index": location,
+                    "block_hash": self.blockchain[location].hash if location != "pending" else "pending"
+                })
+        else:
+            # Coleta registros de todos os blocos
+            for block in self.blockchain:
+                for record in block.data:
+                    all_records.append({
+                        **record.to_dict(),
+                        "block_index": block.index,
+                        "block_hash": block.hash
+                    })
+            
+            # Adiciona registros pendentes
+            for record in self.pending_records:
                 all_records.append({
                     **record.to_dict(),
-                    "block_index": block.index,
-                    "block_hash": block.hash
+                    "block_index": "pending",
+                    "block_hash": "pending"
                 })
         
-        # Adiciona registros pendentes
-        for record in self.pending_records:
-            all_records.append({
-                **record.to_dict(),
-                "block_index": "pending",
-                "block_hash": "pending"
-            })
-        
         # Aplica filtros
         filtered_records = all_records
         
+        if action:
+            filtered_records = [r for r in filtered_records if r["action"] == action]
+        
         if user_id:
             filtered_records = [r for r in filtered_records if r["user_id"] == user_id]
         
@@ -420,6 +450,64 @@ class BlockchainAuditService:
         # Aplica limite
         return filtered_records[:limit]
     
+    def _tokenize(self, text: str) -> List[str]:
+        """Termos normalizados (minúsculas, sem acentos)"""
+        normalized = unicodedata.normalize('NFKD', text.lower())
+        normalized = ''.join(c for c in normalized if not unicodedata.combining(c))
+        return re.findall(r'[a-z0-9]+', normalized)
+    
+    def _searchable_text(self, record: AuditRecord) -> str:
+        """Texto indexado de um registro"""
+        return ' '.join([
+            record.user_id or '',
+            record.action or '',
+            record.resource_type or '',
+            record.resource_id or '',
+            json.dumps(record.details, ensure_ascii=False, default=str)
+        ])
+    
+    def _index_record(self, record: AuditRecord, location: Any):
+        """Adiciona registro ao índice invertido"""
+        self.record_lookup[record.id] = record
+        self.record_locations[record.id] = location
+        for term in set(self._tokenize(self._searchable_text(record))):
+            self.search_index[term].add(record.id)
+    
+    def search_records(self, search_text: str) -> Set[str]:
+        """IDs dos registros que contêm todos os termos da busca
+        
+        Suporta "frase exata" e prefixo (termo*).
+        """
+        result: Optional[Set[str]] = None
+        phrases = []
+        
+        for phrase, word in re.findall(r'"([^"]*)"|(\S+)', search_text):
+            tokens = self._tokenize(phrase or word)
+            if phrase and len(tokens) > 1:
+                phrases.append(tokens)
+            
+            for i, token in enumerate(tokens):
+                if word.endswith('*') and i == len(tokens) - 1:
+                    matches = set()
+                    for term, ids in self.search_index.items():
+                        if term.startswith(token):
+                            matches |= ids
+                else:
+                    matches = self.search_index.get(token, set())
+                
+                result = set(matches) if result is None else result & matches
+                if not result:
+                    return set()
+        
+        # Frases: confirma a sequência de termos nos candidatos
+        for tokens in phrases:
+            result = {
+                record_id for record_id in result
+                if ' '.join(tokens) in ' '.join(self._tokenize(self._searchable_text(self.record_lookup[record_id])))
+            }
+        
+        return result or set()
+    
     async def get_certificate_usage_history(self, certificate_id: str) -> List[Dict[str, Any]]:
         """Recupera histórico de uso de certificado específico"""
         
@@ -555,6 +643,9 @@ class BlockchainAuditService:
                 
                 # Reconstrói blockchain
                 self.blockchain = []
+                self.search_index.clear()
+                self.record_lookup.clear()
+                self.record_locations.clear()
                 for block_data in blockchain_data["blocks"]:
                     records = []
                     for record_data in block_data["data"]:
@@ -569,6 +660,11 @@ class BlockchainAuditService:
                         hash=block_data["hash"]
                     )
                     self.blockchain.append(block)
+                    for record in records:
+                        self._index_record(record, block.index)
+                
+                for record in self.pending_records:
+                    self._index_record(record, "pending")
                 
                 # Restaura estatísticas
                 self.stats.update(blockchain_data.get("stats", {}))
@@ -597,7 +693,7 @@ class BlockchainAuditService:
         }
 
 # Instância global do serviço
-blockchain_audit_service = BlockchainAuditService(use_hyperledger=False)  # MVP mode
+blockchain_audit_service = registry.service("blockchain_audit_service")
 
 # Funções de conveniência
 async def record_audit(user_id: str, action: str, resource_type: str, 
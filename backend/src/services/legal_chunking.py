@@ -0,0 +1,319 @@
+"""
+CertGuard AI - Análise map-reduce de documentos jurídicos longos
+Divide o documento em fronteiras estruturais (cláusulas, artigos, seções),
+analisa os trechos em paralelo e consolida as análises parciais (reduce).
+Análises de trechos ficam no cache por hash do conteúdo: reanalisar um
+documento editado só reprocessa os trechos alterados.
+"""
+
+import re
+import json
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from .ai_response_cache import ai_response_cache
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros do chunking
+CHUNKING_CONFIG = {
+    "max_chunk_chars": 6000,        # ~1500 tokens por trecho; até isso, documento inteiro em um prompt
+    "boundary_modulus": 3,          # fronteira definida pelo conteúdo: ~3 seções por trecho
+    "map_concurrency": 4,           # trechos analisados em paralelo por documento
+    "reduce_fan_in": 8,             # análises parciais por chamada de reduce
+    "partial_max_chars": 1500       # limite de cada análise parcial no prompt de reduce
+}
+
+# Início de unidade estrutural: cláusula, artigo, capítulo/seção/título,
+# títulos de peça ("DOS FATOS", "DO DIREITO") e itens numerados ("1.", "IV –")
+HEADING_PATTERN = re.compile(r"""
+    ^[ \t]*(?:
+        CL[ÁA]USULA\b | Cl[áa]usula[ \t]+\S |
+        Art(?:igo|\.)[ \t]*\d |
+        CAP[ÍI]TULO\b | Cap[íi]tulo[ \t]+\S |
+        SE[ÇC][ÃA]O\b | T[ÍI]TULO\b |
+        D[OA]S?[ \t]+[A-ZÁÉÍÓÚÂÊÔÃÕÇ][A-ZÁÉÍÓÚÂÊÔÃÕÇ \t,]{2,}$ |
+        (?:\d+(?:\.\d+)*|[IVXLC]+)[ \t]*[.)\-–—][ \t]+[A-ZÁÉÍÓÚÂÊÔÃÕÇ]
+    )
+""", re.VERBOSE | re.MULTILINE)
+
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+SENTENCE_END = re.compile(r"(?<=[.;:!?])\s+")
+
+CHUNK_SCHEMAS = {
+    "legal": '{"resumo": "...", "pontos_de_atencao": ["..."], "riscos": ["..."], '
+             '"conformidade": ["..."], "referencias_legais": ["..."]}',
+    "contract": '{"resumo": "...", "clausulas": [{"titulo": "...", "resumo": "...", "problematica": false}], '
+                '"riscos": ["..."], "conformidade": ["..."]}'
+}
+
+REDUCE_SECTIONS = {
+    "legal": """1. TIPO DE DOCUMENTO: Classificação precisa do documento
+        2. RESUMO EXECUTIVO: Síntese dos pontos principais
+        3. ANÁLISE JURÍDICA: Aspectos legais relevantes
+        4. PONTOS DE ATENÇÃO: Questões que requerem cuidado especial
+        5. RECOMENDAÇÕES: Sugestões de ação ou melhoria
+        6. CONFORMIDADE: Verificação com normas aplicáveis (ICP-Brasil, LGPD, CNJ)
+        7. RISCOS IDENTIFICADOS: Potenciais problemas legais
+        8. PRÓXIMOS PASSOS: Ações recomendadas""",
+    "contract": """1. TIPO DE CONTRATO: Classificação do instrumento
+        2. PARTES ENVOLVIDAS: Identificação dos contratantes
+        3. OBJETO DO CONTRATO: Finalidade e escopo
+        4. CLÁUSULAS PRINCIPAIS: Disposições mais importantes
+        5. CLÁUSULAS PROBLEMÁTICAS: Pontos que podem gerar conflito
+        6. CLÁUSULAS AUSENTES: Disposições que deveriam estar presentes
+        7. CONFORMIDADE LEGAL: Adequação à legislação
+        8. RECOMENDAÇÕES: Sugestões de melhoria
+        9. RISCOS IDENTIFICADOS: Potenciais problemas legais"""
+}
+
+
+@dataclass
+class LegalChunk:
+    index: int
+    heading: str
+    text: str
+    start: int
+    end: int
+    content_hash: str
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _split_oversized(text: str, start: int, max_chars: int) -> List[Tuple[int, str]]:
+    """Divide uma seção longa em parágrafos e, se preciso, em frases"""
+    pieces, offset = [], 0
+    for separator in (PARAGRAPH_BREAK, SENTENCE_END):
+        units, position = [], 0
+        for match in separator.finditer(text):
+            units.append(text[position:match.end()])
+            position = match.end()
+        units.append(text[position:])
+        if max(len(unit) for unit in units) <= max_chars:
+            break
+    else:
+        units = [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+    current = ""
+    for unit in units:
+        if current and len(current) + len(unit) > max_chars:
+            pieces.append((start + offset, current))
+            offset += len(current)
+            current = ""
+        current += unit
+    if current:
+        pieces.append((start + offset, current))
+    return pieces
+
+
+def split_legal_document(text: str, max_chunk_chars: int = None, boundary_modulus: int = None) -> List[LegalChunk]:
+    """Trechos do documento em fronteiras estruturais
+
+    Seções consecutivas são agrupadas até max_chunk_chars; um trecho também
+    termina após uma seção cujo hash é múltiplo de boundary_modulus. Como a
+    fronteira depende do conteúdo, e não da posição, editar uma seção muda
+    apenas o trecho que a contém e os demais continuam no cache.
+    """
+    max_chunk_chars = max_chunk_chars or CHUNKING_CONFIG["max_chunk_chars"]
+    boundary_modulus = boundary_modulus or CHUNKING_CONFIG["boundary_modulus"]
+
+    starts = sorted({0, *(match.start() for match in HEADING_PATTERN.finditer(text))})
+    sections: List[Tuple[int, str]] = []
+    for position, end in zip(starts, starts[1:] + [len(text)]):
+        section = text[position:end]
+        if len(section) > max_chunk_chars:
+            sections.extend(_split_oversized(section, position, max_chunk_chars))
+        elif section.strip():
+            sections.append((position, section))
+
+    chunks: List[LegalChunk] = []
+    group: List[Tuple[int, str]] = []
+
+    def flush():
+        if not group:
+            return
+        body = "".join(section for _, section in group).strip()
+        if body:
+            start = group[0][0]
+            chunks.append(LegalChunk(
+                index=len(chunks),
+                heading=body.splitlines()[0].strip()[:120],
+                text=body,
+                start=start,
+                end=group[-1][0] + len(group[-1][1]),
+                content_hash=_content_hash(body)
+            ))
+        group.clear()
+
+    for position, section in sections:
+        if group and sum(len(s) for _, s in group) + len(section) > max_chunk_chars:
+            flush()
+        group.append((position, section))
+        if int(_content_hash(section.strip())[:8], 16) % boundary_modulus == 0:
+            flush()
+    flush()
+    return chunks
+
+
+def _extract_json(content: str) -> Optional[Dict[str, Any]]:
+    """JSON de uma resposta do modelo (bloco ```json ou primeiro objeto)"""
+    if "```json" in content:
+        start = content.find("```json") + 7
+        candidate = content[start:content.find("```", start)]
+    else:
+        candidate = content[content.find("{"):content.rfind("}") + 1]
+    try:
+        parsed = json.loads(candidate.strip())
+        return parsed if isinstance(parsed, dict) else None
+    except (ValueError, TypeError):
+        return None
+
+
+class LegalDocumentPipeline:
+    """Map-reduce de análise jurídica sobre o serviço de IA (cache, roteamento e admissão inclusos)"""
+
+    def __init__(self, ai_service, config: Dict[str, Any] = None):
+        self.ai_service = ai_service
+        self.config = {**CHUNKING_CONFIG, **(config or {})}
+        self.stats = {
+            "documents": 0,
+            "chunks": 0,
+            "cached_chunks": 0,
+            "reduce_calls": 0
+        }
+
+    def needs_chunking(self, text: str) -> bool:
+        """Map-reduce só quando o documento não cabe em um trecho (senão seriam 2 chamadas em série)"""
+        return len(text) > self.config["max_chunk_chars"]
+
+    async def analyze(self, text: str, kind: str = "legal", document_type: str = "generic") -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Executa map e reduce; retorna (resposta no formato de chat completion, metadados)"""
+        partials, metadata = await self.map_chunks(text, kind, document_type)
+        prompt = await self.reduce_to_prompt(partials, kind, document_type, metadata)
+        response = await self.ai_service._make_api_request(prompt, context=f"{kind}_reduce")
+        metadata["reduce_calls"] += 1
+        self.stats["reduce_calls"] += 1
+        return response, metadata
+
+    async def map_chunks(self, text: str, kind: str, document_type: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Análise parcial de cada trecho, em paralelo, reaproveitando trechos inalterados"""
+        chunks = split_legal_document(text, self.config["max_chunk_chars"], self.config["boundary_modulus"])
+        semaphore = asyncio.Semaphore(self.config["map_concurrency"])
+        model = self.ai_service.active_config["model"]
+        cached = 0
+
+        async def analyze_chunk(chunk: LegalChunk) -> Dict[str, Any]:
+            nonlocal cached
+            key = _content_hash(f"{kind}:{document_type}:{model}:{chunk.content_hash}")
+            entry = ai_response_cache.get(key)
+            if entry is not None:
+                cached += 1
+                return entry["partial"]
+
+            async with semaphore:
+                response = await self.ai_service._make_api_request(
+                    self._chunk_prompt(chunk, kind, document_type), context=f"{kind}_chunk"
+                )
+            content = response["choices"][0]["message"]["content"]
+            partial = _extract_json(content) or {"resumo": content[:self.config["partial_max_chars"]]}
+            if response.get("model", model) == model:
+                # Parcial de outro modelo (failover) não fica sob a chave do preferido
+                ai_response_cache.put(key, {"partial": partial}, context=f"{kind}_chunk", model=model)
+            return partial
+
+        partials = await asyncio.gather(*(analyze_chunk(chunk) for chunk in chunks))
+
+        self.stats["documents"] += 1
+        self.stats["chunks"] += len(chunks)
+        self.stats["cached_chunks"] += cached
+        metadata = {
+            "document_chars": len(text),
+            "chunks": len(chunks),
+            "cached_chunks": cached,
+            "reduce_calls": 0,
+            "sections": [{"heading": chunk.heading, "start": chunk.start, "end": chunk.end} for chunk in chunks]
+        }
+        return [
+            {"trecho": chunk.index + 1, "titulo": chunk.heading, **partial}
+            for chunk, partial in zip(chunks, partials)
+        ], metadata
+
+    async def reduce_to_prompt(self, partials: List[Dict[str, Any]], kind: str, document_type: str,
+                               metadata: Dict[str, Any]) -> str:
+        """Reduz as parciais em níveis (fan-in) até caberem em um único prompt final"""
+        fan_in = self.config["reduce_fan_in"]
+        while len(partials) > fan_in:
+            groups = [partials[i:i + fan_in] for i in range(0, len(partials), fan_in)]
+            responses = await asyncio.gather(*(
+                self.ai_service._make_api_request(
+                    self._reduce_prompt(group, kind, document_type, final=False), context=f"{kind}_reduce"
+                )
+                for group in groups
+            ))
+            metadata["reduce_calls"] += len(groups)
+            self.stats["reduce_calls"] += len(groups)
+            partials = [
+                {"trecho": f"{group[0]['trecho']}-{group[-1]['trecho']}",
+                 **(_extract_json(response["choices"][0]["message"]["content"]) or
+                    {"resumo": response["choices"][0]["message"]["content"][:self.config["partial_max_chars"]]})}
+                for group, response in zip(groups, responses)
+            ]
+        return self._reduce_prompt(partials, kind, document_type, final=True)
+
+    def _chunk_prompt(self, chunk: LegalChunk, kind: str, document_type: str) -> str:
+        # Só o conteúdo do trecho entra no prompt (sem posição), para o cache valer após edições
+        subject = "contrato" if kind == "contract" else f'documento jurídico do tipo "{document_type}"'
+        return f"""
+        Analise o trecho abaixo, parte de um {subject}.
+
+        TRECHO:
+        {chunk.text}
+
+        Responda apenas com JSON no formato:
+        {CHUNK_SCHEMAS[kind]}
+        """
+
+    def _reduce_prompt(self, partials: List[Dict[str, Any]], kind: str, document_type: str, final: bool) -> str:
+        subject = "um contrato" if kind == "contract" else f'um documento jurídico do tipo "{document_type}"'
+        limit = self.config["partial_max_chars"]
+        summaries = "\n".join(
+            f"[{partial['trecho']}] {json.dumps(partial, ensure_ascii=False)[:limit]}" for partial in partials
+        )
+
+        if not final:
+            return f"""
+        Consolide as análises parciais abaixo, de trechos consecutivos de {subject},
+        em uma única análise parcial, sem perder riscos e pontos de atenção.
+
+        ANÁLISES PARCIAIS:
+        {summaries}
+
+        Responda apenas com JSON no formato:
+        {CHUNK_SCHEMAS[kind]}
+        """
+
+        return f"""
+        As análises parciais abaixo cobrem, em ordem, todos os trechos de {subject}.
+        Consolide-as em uma análise do documento inteiro:
+
+        ANÁLISES PARCIAIS:
+        {summaries}
+
+        Forneça uma análise estruturada incluindo:
+
+        {REDUCE_SECTIONS[kind]}
+
+        Responda em formato JSON estruturado para facilitar o processamento.
+        """
+
+    def get_stats(self) -> Dict[str, Any]:
+        chunks = self.stats["chunks"]
+        return {
+            **self.stats,
+            "chunk_cache_hit_rate": round(self.stats["cached_chunks"] / chunks, 4) if chunks else 0.0
+        }
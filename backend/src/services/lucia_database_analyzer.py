@@ -5,6 +5,7 @@ Sistema avançado de análise de banco de dados, comportamento e auditoria
 
 import os
 import json
+import base64
 import asyncio
 import sqlite3
 import pandas as pd
@@ -12,18 +13,49 @@ from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 import logging
 import re
-from collections import defaultdict, Counter
+import time
+import hashlib
+import threading
+import contextvars
+from collections import defaultdict, Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import numpy as np
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 
 from .nvidia_ai import nvidia_ai_service
 from .blockchain_audit import blockchain_audit_service
 from .lucia_security_ai import lucia_security_ai
+from .lucia_schema import apply_migrations
+from .audit_snapshot import AuditSnapshotStore
+from .ai_context_compaction import ai_context_compactor
+from .registry import registry
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Colunas lidas de access_logs pela análise comportamental em passada única
+BEHAVIOR_SCAN_COLUMNS = [
+    "user_id", "timestamp", "day", "hour", "day_of_week",
+    "action", "ip_address", "success", "session_id", "response_time"
+]
+
+# Coletas de answer_security_question: (fonte, tipos de pergunta), na ordem em que entram no prompt
+GATHER_SOURCES = [
+    ("user_activity", {"user_activity", "general", "statistical_query"}),
+    ("security_events", {"security_incident", "audit_query", "general"}),
+    ("certificate_usage", {"certificate_usage", "general"}),
+    ("performance_metrics", {"performance_analysis", "general"}),
+    ("access_logs", {"user_activity", "security_incident", "audit_query"})
+]
+
+# Tipo de pergunta da LucIA em andamento (atribui as consultas de coleta à pergunta)
+CURRENT_QUESTION_TYPE: contextvars.ContextVar = contextvars.ContextVar("lucia_question_type", default=None)
+
+# Nomes de dia da semana de query_audit_logs (datetime.weekday(): 0 = segunda)
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
 @dataclass
 class DatabaseQuery:
     """Consulta ao banco de dados"""
@@ -36,6 +68,10 @@ class DatabaseQuery:
     execution_time: float
     success: bool
     error_message: Optional[str] = None
+    fingerprint: str = ""
+    question_type: Optional[str] = None
+    slow: bool = False
+    query_plan: Optional[List[str]] = None
 
 @dataclass
 class BehaviorPattern:
@@ -55,7 +91,6 @@ class LucIADatabaseAnalyzer:
     
     def __init__(self, db_path: str = "/tmp/certguard.db"):
         self.db_path = db_path
-        self.query_history: List[DatabaseQuery] = []
         self.behavior_patterns: List[BehaviorPattern] = []
         
         # Configurações de análise
@@ -63,10 +98,26 @@ class LucIADatabaseAnalyzer:
             "max_query_history": 10000,
             "behavior_analysis_window_days": 30,
             "anomaly_threshold": 2.5,  # desvios padrão
+            "behavior_scan_mode": "single_pass",  # "multi_query" ou "snapshot" (modo analítico)
+            "scan_chunk_size": 100000,
             "min_pattern_frequency": 3,
-            "confidence_threshold": 0.7
+            "confidence_threshold": 0.7,
+            "gather_workers": 5,
+            "prompt_data_chars": 5000,  # dados brutos aguardados antes de montar o prompt (ver ai_context_compaction)
+            "slow_query_threshold": 0.5  # segundos; consultas lentas têm o plano capturado
         }
         
+        # Histórico de consultas (buffer circular) e agregados por fingerprint / tipo
+        self.query_history: "deque[DatabaseQuery]" = deque(maxlen=self.analysis_config["max_query_history"])
+        self.query_stats = {
+            "by_fingerprint": {},
+            "by_query_type": {},
+            "by_question_type": {}
+        }
+        self._query_sequence = 0
+        self._query_lock = threading.Lock()
+        self._query_hours = Counter()
+        
         # Métricas de performance
         self.performance_metrics = {
             "total_queries": 0,
@@ -77,8 +128,34 @@ class LucIADatabaseAnalyzer:
             "peak_usage_hour": 0
         }
         
-        # Cache de análises
-        self.analysis_cache = {}
+        # Cache de análises: (user_id, days, watermark) -> resultado, em ordem LRU
+        self.analysis_cache: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.cache_config = {
+            "ttl_seconds": 300,
+            "max_entries": 128
+        }
+        self.cache_stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0
+        }
+        self._cache_lock = threading.Lock()
+        
+        # Índice FTS5 de auditoria (criado pela migração 2)
+        self._search_index_available = False
+        
+        # Snapshots colunares para o modo analítico (ver enable_analytics_mode)
+        snapshot_dir = os.getenv("CERTGUARD_SNAPSHOT_DIR")
+        self.snapshot_store = AuditSnapshotStore(snapshot_dir, lucia_db_path=db_path) if snapshot_dir else None
+        
+        # Pool de coleta de dados das perguntas; cada thread mantém sua conexão de leitura
+        self._gather_executor = ThreadPoolExecutor(
+            max_workers=self.analysis_config["gather_workers"],
+            thread_name_prefix="lucia-gather"
+        )
+        self._gather_local = threading.local()
         
         # Inicializar banco de dados
         self._init_database()
@@ -170,6 +247,9 @@ class LucIADatabaseAnalyzer:
                 self._insert_sample_data(cursor)
             
             conn.commit()
+            
+            # Índices e demais alterações versionadas
+            apply_migrations(conn)
             conn.close()
             
             logger.info("Banco de dados inicializado com sucesso")
@@ -177,6 +257,190 @@ class LucIADatabaseAnalyzer:
         except Exception as e:
             logger.error(f"Erro ao inicializar banco de dados: {str(e)}")
     
+    def _connect(self) -> sqlite3.Connection:
+        """Abre conexão com o banco de análise"""
+        return sqlite3.connect(self.db_path)
+    
+    @contextmanager
+    def _track_query(self, conn: sqlite3.Connection, query_type: str, sql: str, params=None, user_id: str = None):
+        """Mede uma consulta e a registra no histórico
+        
+        O bloco informa as linhas lidas em tracked["rows"]; consultas lidas em blocos
+        podem informar só o tempo de banco em tracked["elapsed"].
+        """
+        tracked = {"rows": 0, "elapsed": None}
+        error = None
+        started = time.perf_counter()
+        try:
+            yield tracked
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            elapsed = tracked["elapsed"] if tracked["elapsed"] is not None else time.perf_counter() - started
+            self._record_query(conn, query_type, sql, params, tracked["rows"], elapsed, error, user_id)
+    
+    def _read_sql(self, conn: sqlite3.Connection, query_type: str, sql: str, params=None,
+                  user_id: str = None, **kwargs) -> pd.DataFrame:
+        """pd.read_sql_query instrumentado"""
+        with self._track_query(conn, query_type, sql, params, user_id) as tracked:
+            df = pd.read_sql_query(sql, conn, params=params, **kwargs)
+            tracked["rows"] = len(df)
+        return df
+    
+    def _fetch_in_chunks(self, conn: sqlite3.Connection, sql: str, params, tracked: Dict[str, Any]):
+        """Lê a consulta em blocos de scan_chunk_size linhas, somando só o tempo de banco em `tracked`"""
+        tracked["elapsed"] = 0.0
+        started = time.perf_counter()
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(self.analysis_config["scan_chunk_size"])
+            tracked["elapsed"] += time.perf_counter() - started
+            if not rows:
+                return
+            tracked["rows"] += len(rows)
+            yield rows
+            started = time.perf_counter()
+    
+    def _record_query(self, conn: sqlite3.Connection, query_type: str, sql: str, params,
+                      rows: int, elapsed: float, error: Optional[str], user_id: Optional[str]):
+        """Registra a consulta no buffer circular e nos agregados; captura o plano das lentas"""
+        
+        fingerprint, normalized = self._fingerprint_sql(sql)
+        slow = error is None and elapsed >= self.analysis_config["slow_query_threshold"]
+        query_plan = self._explain_query(conn, sql, params) if slow else None
+        question_type = CURRENT_QUESTION_TYPE.get()
+        now = datetime.now()
+        
+        with self._query_lock:
+            self._query_sequence += 1
+            entry = DatabaseQuery(
+                id=f"q{self._query_sequence}",
+                timestamp=now.isoformat(),
+                user_id=str(user_id) if user_id is not None else None,
+                query_type=query_type,
+                sql_query=normalized,
+                results_count=rows,
+                execution_time=round(elapsed, 6),
+                success=error is None,
+                error_message=error,
+                fingerprint=fingerprint,
+                question_type=question_type,
+                slow=slow,
+                query_plan=query_plan
+            )
+            self.query_history.append(entry)
+            
+            metrics = self.performance_metrics
+            metrics["total_queries"] += 1
+            metrics["avg_query_time"] += (elapsed - metrics["avg_query_time"]) / metrics["total_queries"]
+            metrics["slow_queries"] += slow
+            metrics["failed_queries"] += error is not None
+            if user_id is not None:
+                metrics["unique_users"].add(str(user_id))
+            self._query_hours[now.hour] += 1
+            metrics["peak_usage_hour"] = self._query_hours.most_common(1)[0][0]
+            
+            by_fingerprint = self.query_stats["by_fingerprint"].setdefault(fingerprint, {
+                "fingerprint": fingerprint,
+                "sql": normalized,
+                "query_types": Counter(),
+                "count": 0,
+                "total_time": 0.0,
+                "max_time": 0.0,
+                "slow_count": 0,
+                "rows_returned": 0,
+                "last_plan": None
+            })
+            by_fingerprint["query_types"][query_type] += 1
+            by_fingerprint["max_time"] = max(by_fingerprint["max_time"], elapsed)
+            by_fingerprint["rows_returned"] += rows
+            if query_plan:
+                by_fingerprint["last_plan"] = query_plan
+            
+            for stats in (by_fingerprint,
+                          self.query_stats["by_query_type"].setdefault(query_type, {"count": 0, "total_time": 0.0, "slow_count": 0}),
+                          self.query_stats["by_question_type"].setdefault(question_type or "nenhuma", {"count": 0, "total_time": 0.0, "slow_count": 0})):
+                stats["count"] += 1
+                stats["total_time"] += elapsed
+                stats["slow_count"] += slow
+        
+        if slow:
+            logger.warning(
+                f"Consulta lenta ({query_type}, {elapsed:.3f}s, {rows} linhas, pergunta={question_type}): "
+                f"{fingerprint} plano={query_plan}"
+            )
+    
+    def _fingerprint_sql(self, sql: str) -> Tuple[str, str]:
+        """SQL normalizado (literais viram ?, espaços colapsados) e seu hash curto"""
+        normalized = re.sub(r"'(?:[^']|'')*'", "?", sql)
+        normalized = re.sub(r"\b\d+(?:\.\d+)?\b", "?", normalized)
+        normalized = " ".join(normalized.split())
+        return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+    
+    def _explain_query(self, conn: sqlite3.Connection, sql: str, params) -> Optional[List[str]]:
+        """Plano de execução (EXPLAIN QUERY PLAN) da consulta"""
+        try:
+            return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params or [])]
+        except sqlite3.Error as e:
+            logger.debug(f"Plano indisponível: {str(e)}")
+            return None
+    
+    def get_query_stats(self, limit: int = 20, slow_only: bool = False) -> Dict[str, Any]:
+        """Estatísticas das consultas do analisador (mais custosas primeiro)"""
+        
+        def summarize(stats: Dict[str, Any]) -> Dict[str, Any]:
+            return {
+                "count": stats["count"],
+                "total_time": round(stats["total_time"], 4),
+                "avg_time": round(stats["total_time"] / stats["count"], 4) if stats["count"] else 0.0,
+                "slow_count": stats["slow_count"]
+            }
+        
+        with self._query_lock:
+            metrics = self.performance_metrics
+            fingerprints = sorted(self.query_stats["by_fingerprint"].values(), key=lambda f: f["total_time"], reverse=True)
+            if slow_only:
+                fingerprints = [f for f in fingerprints if f["slow_count"]]
+            recent = [entry for entry in self.query_history if entry.slow or not slow_only][-limit:]
+            
+            return {
+                "summary": {
+                    "total_queries": metrics["total_queries"],
+                    "avg_query_time": round(metrics["avg_query_time"], 4),
+                    "slow_queries": metrics["slow_queries"],
+                    "failed_queries": metrics["failed_queries"],
+                    "unique_users": len(metrics["unique_users"]),
+                    "peak_usage_hour": metrics["peak_usage_hour"],
+                    "slow_query_threshold": self.analysis_config["slow_query_threshold"],
+                    "history_size": len(self.query_history),
+                    "history_capacity": self.query_history.maxlen
+                },
+                "by_question_type": [
+                    {"question_type": name, **summarize(stats)} for name, stats in sorted(
+                        self.query_stats["by_question_type"].items(), key=lambda item: item[1]["total_time"], reverse=True
+                    )
+                ],
+                "by_query_type": [
+                    {"query_type": name, **summarize(stats)} for name, stats in sorted(
+                        self.query_stats["by_query_type"].items(), key=lambda item: item[1]["total_time"], reverse=True
+                    )
+                ],
+                "top_queries": [
+                    {
+                        **summarize(f),
+                        "fingerprint": f["fingerprint"],
+                        "sql": f["sql"],
+                        "query_types": dict(f["query_types"]),
+                        "max_time": round(f["max_time"], 4),
+                        "rows_returned": f["rows_returned"],
+                        "last_plan": f["last_plan"]
+                    }
+                    for f in fingerprints[:limit]
+                ],
+                "recent_queries": [asdict(entry) for entry in reversed(recent)]
+            }
+    
     def _insert_sample_data(self, cursor):
         """Insere dados de exemplo no banco"""
         
@@ -294,99 +558,35 @@ class LucIADatabaseAnalyzer:
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, audit_events)
     
-    async def analyze_user_behavior(self, user_id: str = None, days: int = 30) -> Dict[str, Any]:
+    async def analyze_user_behavior(self, user_id: str = None, days: int = 30, scan_mode: str = None) -> Dict[str, Any]:
         """Analisa comportamento detalhado do usuário"""
         
+        scan_mode = scan_mode or self.analysis_config["behavior_scan_mode"]
+        cache_key = None
+        
         try:
-            conn = sqlite3.connect(self.db_path)
-            
-            # Query base para análise comportamental
-            if user_id:
-                where_clause = "WHERE al.user_id = ? AND al.timestamp >= ?"
-                params = [user_id, (datetime.now() - timedelta(days=days)).isoformat()]
+            if scan_mode == "snapshot":
+                # Modo analítico: lê os snapshots colunares, sem abrir o banco OLTP
+                if self.snapshot_store is None:
+                    raise RuntimeError("Modo analítico sem diretório de snapshots configurado")
+                df_activity, df_temporal, df_actions, df_ips = self._snapshot_behavior_aggregates(user_id, days)
             else:
-                where_clause = "WHERE al.timestamp >= ?"
-                params = [(datetime.now() - timedelta(days=days)).isoformat()]
-            
-            # Análise de atividades
-            activity_query = f"""
-                SELECT 
-                    u.username,
-                    u.full_name,
-                    u.role,
-                    o.name as organization,
-                    COUNT(*) as total_activities,
-                    COUNT(DISTINCT DATE(al.timestamp)) as active_days,
-                    AVG(al.response_time) as avg_response_time,
-                    COUNT(CASE WHEN al.success = 0 THEN 1 END) as failed_attempts,
-                    COUNT(DISTINCT al.ip_address) as unique_ips,
-                    COUNT(DISTINCT al.session_id) as unique_sessions,
-                    MIN(al.timestamp) as first_activity,
-                    MAX(al.timestamp) as last_activity
-                FROM access_logs al
-                JOIN users u ON al.user_id = u.id
-                JOIN organizations o ON u.organization_id = o.id
-                {where_clause}
-                GROUP BY al.user_id, u.username, u.full_name, u.role, o.name
-                ORDER BY total_activities DESC
-            """
-            
-            df_activity = pd.read_sql_query(activity_query, conn, params=params)
-            
-            # Análise de padrões temporais
-            temporal_query = f"""
-                SELECT 
-                    al.user_id,
-                    u.username,
-                    strftime('%H', al.timestamp) as hour,
-                    strftime('%w', al.timestamp) as day_of_week,
-                    COUNT(*) as activity_count
-                FROM access_logs al
-                JOIN users u ON al.user_id = u.id
-                {where_clause}
-                GROUP BY al.user_id, u.username, hour, day_of_week
-            """
-            
-            df_temporal = pd.read_sql_query(temporal_query, conn, params=params)
-            
-            # Análise de ações
-            action_query = f"""
-                SELECT 
-                    al.user_id,
-                    u.username,
-                    al.action,
-                    COUNT(*) as count,
-                    AVG(al.response_time) as avg_time,
-                    COUNT(CASE WHEN al.success = 0 THEN 1 END) as failures
-                FROM access_logs al
-                JOIN users u ON al.user_id = u.id
-                {where_clause}
-                GROUP BY al.user_id, u.username, al.action
-                ORDER BY count DESC
-            """
-            
-            df_actions = pd.read_sql_query(action_query, conn, params=params)
-            
-            # Análise de IPs
-            ip_query = f"""
-                SELECT 
-                    al.user_id,
-                    u.username,
-                    al.ip_address,
-                    COUNT(*) as usage_count,
-                    MIN(al.timestamp) as first_seen,
-                    MAX(al.timestamp) as last_seen,
-                    COUNT(CASE WHEN al.success = 0 THEN 1 END) as failed_attempts
-                FROM access_logs al
-                JOIN users u ON al.user_id = u.id
-                {where_clause}
-                GROUP BY al.user_id, u.username, al.ip_address
-                ORDER BY usage_count DESC
-            """
-            
-            df_ips = pd.read_sql_query(ip_query, conn, params=params)
-            
-            conn.close()
+                conn = self._connect()
+                
+                # Resultado em cache enquanto nenhum access_log novo chegar
+                cache_key = (str(user_id) if user_id is not None else None, int(days), self._data_watermark(conn))
+                cached = self._get_cached_analysis(cache_key)
+                if cached is not None:
+                    conn.close()
+                    return cached
+                
+                # Agregados de atividade, temporais, ações e IPs
+                if scan_mode == "single_pass":
+                    df_activity, df_temporal, df_actions, df_ips = self._scan_behavior_aggregates(conn, user_id, days)
+                else:
+                    df_activity, df_temporal, df_actions, df_ips = self._query_behavior_aggregates(conn, user_id, days)
+                
+                conn.close()
             
             # Processa dados para análise
             analysis_result = {
@@ -403,26 +603,117 @@ class LucIADatabaseAnalyzer:
                 "risk_assessment": self._assess_user_risks(df_activity, df_ips, df_actions)
             }
             
+            if cache_key is not None:
+                self._store_cached_analysis(cache_key, analysis_result)
+            
             return analysis_result
             
         except Exception as e:
             logger.error(f"Erro na análise comportamental: {str(e)}")
             return {"error": str(e)}
     
+    def enable_analytics_mode(self, snapshot_dir: str, default: bool = True) -> AuditSnapshotStore:
+        """Ativa o modo analítico: análises comportamentais sobre os snapshots colunares"""
+        self.snapshot_store = AuditSnapshotStore(snapshot_dir, lucia_db_path=self.db_path)
+        if default:
+            self.analysis_config["behavior_scan_mode"] = "snapshot"
+        return self.snapshot_store
+    
+    def _data_watermark(self, conn: sqlite3.Connection) -> int:
+        """Marca d'água dos dados: avança quando novas linhas entram em access_logs"""
+        sql = "SELECT COALESCE(MAX(rowid), 0) FROM access_logs"
+        with self._track_query(conn, "data_watermark", sql) as tracked:
+            watermark = conn.execute(sql).fetchone()[0]
+            tracked["rows"] = 1
+        return watermark
+    
+    def _get_cached_analysis(self, cache_key: Tuple) -> Optional[Dict[str, Any]]:
+        """Busca análise no cache (o resultado é compartilhado: não modificar)"""
+        with self._cache_lock:
+            entry = self.analysis_cache.get(cache_key)
+            if entry is None:
+                self.cache_stats["misses"] += 1
+                return None
+            
+            stored_at, result = entry
+            if time.monotonic() - stored_at > self.cache_config["ttl_seconds"]:
+                del self.analysis_cache[cache_key]
+                self.cache_stats["expirations"] += 1
+                self.cache_stats["misses"] += 1
+                return None
+            
+            self.analysis_cache.move_to_end(cache_key)
+            self.cache_stats["hits"] += 1
+            return result
+    
+    def _store_cached_analysis(self, cache_key: Tuple, result: Dict[str, Any]):
+        """Armazena análise no cache, descartando versões antigas dos dados"""
+        watermark = cache_key[2]
+        
+        with self._cache_lock:
+            # Entradas de marcas d'água anteriores nunca mais serão lidas
+            stale = [key for key in self.analysis_cache if key[2] < watermark]
+            for key in stale:
+                del self.analysis_cache[key]
+            self.cache_stats["invalidations"] += len(stale)
+            
+            self.analysis_cache[cache_key] = (time.monotonic(), result)
+            self.analysis_cache.move_to_end(cache_key)
+            
+            while len(self.analysis_cache) > self.cache_config["max_entries"]:
+                self.analysis_cache.popitem(last=False)
+                self.cache_stats["evictions"] += 1
+    
+    def clear_analysis_cache(self):
+        """Limpa o cache de análises"""
+        with self._cache_lock:
+            self.cache_stats["invalidations"] += len(self.analysis_cache)
+            self.analysis_cache.clear()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Estatísticas do cache de análises"""
+        with self._cache_lock:
+            total = self.cache_stats["hits"] + self.cache_stats["misses"]
+            return {
+                **self.cache_stats,
+                "entries": len(self.analysis_cache),
+                "max_entries": self.cache_config["max_entries"],
+                "ttl_seconds": self.cache_config["ttl_seconds"],
+                "hit_rate": round(self.cache_stats["hits"] / total, 4) if total else 0.0
+            }
+    
     async def query_audit_logs(self, 
                              query: str,
                              user_id: str = None,
                              start_date: str = None,
                              end_date: str = None,
-                             severity: str = None) -> Dict[str, Any]:
-        """Consulta logs de auditoria com filtros avançados"""
+                             severity: str = None,
+                             limit: int = 1000,
+                             cursor: str = None,
+                             analysis_scope: str = "page") -> Dict[str, Any]:
+        """Consulta logs de auditoria com filtros avançados (busca textual ranqueada e paginada)
+        
+        Os eventos retornados são sempre uma página (no máximo `limit`, com cursor para
+        a próxima). Com analysis_scope="window" a análise estatística cobre todos os
+        eventos do filtro, lidos em blocos e agregados em contadores (memória constante);
+        exige start_date.
+        """
         
         try:
-            conn = sqlite3.connect(self.db_path)
+            if analysis_scope not in ("page", "window"):
+                raise ValueError("analysis_scope deve ser 'page' ou 'window'")
+            if analysis_scope == "window" and not start_date:
+                raise ValueError("Análise da janela completa requer start_date")
+            
+            conn = self._connect()
+            limit = max(1, min(int(limit), 1000))
             
-            # Constrói query dinâmica
-            base_query = """
-                SELECT 
+            # Busca textual pelo índice FTS5 (ranqueada por bm25); LIKE se indisponível
+            fts_query = self._build_fts_query(query) if query and self._has_search_index(conn) else None
+            search_mode = "fts" if fts_query else ("like" if query else "none")
+            after = self._decode_cursor(cursor, search_mode) if cursor else None
+            
+            columns = """
                     ae.id,
                     ae.user_id,
                     u.username,
@@ -436,69 +727,120 @@ class LucIADatabaseAnalyzer:
                     ae.timestamp,
                     ae.ip_address,
                     ae.resolved
-                FROM audit_events ae
-                JOIN users u ON ae.user_id = u.id
-                JOIN organizations o ON u.organization_id = o.id
-                WHERE 1=1
             """
             
-            params = []
+            if fts_query:
+                # CROSS JOIN fixa o FTS como laço externo; senão, com filtro de data, o SQLite
+                # percorre audit_events pelo timestamp e consulta o índice FTS a cada linha
+                source = """
+                    FROM (
+                        SELECT rowid AS event_id{rank}
+                        FROM audit_events_fts
+                        WHERE audit_events_fts MATCH ?
+                    ) m
+                    CROSS JOIN audit_events ae ON ae.id = m.event_id
+                    JOIN users u ON ae.user_id = u.id
+                    JOIN organizations o ON u.organization_id = o.id
+                    WHERE 1=1
+                """
+                params = [fts_query]
+                columns += ", m.search_rank"
+            else:
+                source = """
+                    FROM audit_events ae
+                    JOIN users u ON ae.user_id = u.id
+                    JOIN organizations o ON u.organization_id = o.id
+                    WHERE 1=1
+                """
+                params = []
             
             if user_id:
-                base_query += " AND ae.user_id = ?"
+                source += " AND ae.user_id = ?"
                 params.append(user_id)
             
             if start_date:
-                base_query += " AND ae.timestamp >= ?"
+                source += " AND ae.timestamp >= ?"
                 params.append(start_date)
             
             if end_date:
-                base_query += " AND ae.timestamp <= ?"
+                source += " AND ae.timestamp <= ?"
                 params.append(end_date)
             
             if severity:
-                base_query += " AND ae.severity = ?"
+                source += " AND ae.severity = ?"
                 params.append(severity)
             
-            # Busca textual
-            if query:
-                base_query += " AND (ae.description LIKE ? OR ae.details LIKE ? OR u.username LIKE ?)"
+            if search_mode == "like":
+                source += " AND (ae.description LIKE ? OR ae.details LIKE ? OR u.username LIKE ?)"
                 search_term = f"%{query}%"
                 params.extend([search_term, search_term, search_term])
             
-            base_query += " ORDER BY ae.timestamp DESC LIMIT 1000"
+            # Paginação por cursor (keyset): continua após o último item da página anterior
+            rank = ", bm25(audit_events_fts, 2.0, 1.0, 1.5) AS search_rank" if fts_query else ""
+            page_query = f"SELECT {columns} {source.format(rank=rank)}"
+            page_params = list(params)
+            if search_mode == "fts":
+                if after:
+                    page_query += " AND (m.search_rank > ? OR (m.search_rank = ? AND ae.id > ?))"
+                    page_params.extend([after[0], after[0], after[1]])
+                page_query += " ORDER BY m.search_rank, ae.id LIMIT ?"
+            else:
+                if after:
+                    page_query += " AND (ae.timestamp < ? OR (ae.timestamp = ? AND ae.id < ?))"
+                    page_params.extend([after[0], after[0], after[1]])
+                page_query += " ORDER BY ae.timestamp DESC, ae.id DESC LIMIT ?"
+            page_params.append(limit + 1)
             
-            df_audit = pd.read_sql_query(base_query, conn, params=params)
+            with self._track_query(conn, f"audit_page_{search_mode}", page_query, page_params, user_id) as tracked:
+                page_cursor = conn.execute(page_query, page_params)
+                names = [column[0] for column in page_cursor.description]
+                events = [dict(zip(names, row)) for row in page_cursor.fetchall()]
+                tracked["rows"] = len(events)
             
-            # Análise estatística dos resultados
-            if not df_audit.empty:
-                severity_counts = df_audit['severity'].value_counts().to_dict()
-                event_type_counts = df_audit['event_type'].value_counts().to_dict()
-                user_counts = df_audit['username'].value_counts().to_dict()
-                
-                # Análise temporal
-                df_audit['timestamp'] = pd.to_datetime(df_audit['timestamp'])
-                df_audit['hour'] = df_audit['timestamp'].dt.hour
-                df_audit['day_of_week'] = df_audit['timestamp'].dt.day_name()
-                
-                hourly_distribution = df_audit['hour'].value_counts().sort_index().to_dict()
-                daily_distribution = df_audit['day_of_week'].value_counts().to_dict()
-                
-                # Eventos não resolvidos
-                unresolved_events = df_audit[df_audit['resolved'] == False]
-                
+            has_more = len(events) > limit
+            events = events[:limit]
+            next_cursor = None
+            if has_more:
+                last = events[-1]
+                sort_key = last['search_rank'] if search_mode == "fts" else last['timestamp']
+                next_cursor = self._encode_cursor(search_mode, sort_key, last['id'])
+            
+            # Análise estatística: da página ou de toda a janela (em blocos)
+            stats = self._new_audit_stats()
+            if analysis_scope == "window":
+                # Sem ranking: a janela inteira é lida, em qualquer ordem
+                window_query = (
+                    f"SELECT ae.severity, ae.event_type, u.username, ae.timestamp, ae.resolved {source.format(rank='')}"
+                )
+                with self._track_query(conn, f"audit_window_{search_mode}", window_query, params, user_id) as tracked:
+                    for rows in self._fetch_in_chunks(conn, window_query, params, tracked):
+                        self._fold_audit_stats(stats, rows)
+            else:
+                self._fold_audit_stats(stats, (
+                    (event['severity'], event['event_type'], event['username'], event['timestamp'], event['resolved'])
+                    for event in events
+                ))
+            
+            # Hora e dia da semana de cada evento da página
+            for event in events:
+                moment = self._parse_event_timestamp(event['timestamp'])
+                event['hour'] = moment.hour if moment else None
+                event['day_of_week'] = WEEKDAY_NAMES[moment.weekday()] if moment else None
+            
+            if stats["total"]:
+                severity_counts = stats["severity"]
                 analysis = {
-                    "total_events": len(df_audit),
-                    "severity_distribution": severity_counts,
-                    "event_type_distribution": event_type_counts,
-                    "user_distribution": user_counts,
+                    "total_events": stats["total"],
+                    "severity_distribution": dict(severity_counts.most_common()),
+                    "event_type_distribution": dict(stats["event_type"].most_common()),
+                    "user_distribution": dict(stats["username"].most_common()),
                     "temporal_analysis": {
-                        "hourly_distribution": hourly_distribution,
-                        "daily_distribution": daily_distribution
+                        "hourly_distribution": dict(sorted(stats["hour"].items())),
+                        "daily_distribution": dict(stats["day_of_week"].most_common())
                     },
-                    "unresolved_events": len(unresolved_events),
-                    "critical_events": len(df_audit[df_audit['severity'] == 'critical']),
-                    "high_severity_events": len(df_audit[df_audit['severity'] == 'high'])
+                    "unresolved_events": stats["unresolved"],
+                    "critical_events": severity_counts["critical"],
+                    "high_severity_events": severity_counts["high"]
                 }
             else:
                 analysis = {"message": "Nenhum evento encontrado com os critérios especificados"}
@@ -513,7 +855,14 @@ class LucIADatabaseAnalyzer:
                     "end_date": end_date,
                     "severity": severity
                 },
-                "events": df_audit.to_dict('records'),
+                "search_mode": search_mode,
+                "analysis_scope": analysis_scope,
+                "pagination": {
+                    "limit": limit,
+                    "has_more": has_more,
+                    "next_cursor": next_cursor
+                },
+                "events": events,
                 "analysis": analysis,
                 "timestamp": datetime.now().isoformat()
             }
@@ -522,24 +871,140 @@ class LucIADatabaseAnalyzer:
             logger.error(f"Erro na consulta de auditoria: {str(e)}")
             return {"error": str(e)}
     
+    def _new_audit_stats(self) -> Dict[str, Any]:
+        """Contadores acumulados da análise de eventos de auditoria"""
+        return {
+            "total": 0,
+            "unresolved": 0,
+            "severity": Counter(),
+            "event_type": Counter(),
+            "username": Counter(),
+            "hour": Counter(),
+            "day_of_week": Counter()
+        }
+    
+    def _fold_audit_stats(self, stats: Dict[str, Any], rows):
+        """Agrega linhas (severity, event_type, username, timestamp, resolved) nos contadores"""
+        for severity, event_type, username, timestamp, resolved in rows:
+            stats["total"] += 1
+            stats["severity"][severity] += 1
+            stats["event_type"][event_type] += 1
+            stats["username"][username] += 1
+            if resolved == 0:
+                stats["unresolved"] += 1
+            
+            moment = self._parse_event_timestamp(timestamp)
+            if moment is None:
+                continue
+            stats["hour"][moment.hour] += 1
+            stats["day_of_week"][WEEKDAY_NAMES[moment.weekday()]] += 1
+    
+    def _parse_event_timestamp(self, timestamp: Any) -> Optional[datetime]:
+        """Converte o timestamp ISO armazenado; None se ausente ou inválido"""
+        try:
+            return datetime.fromisoformat(timestamp)
+        except (TypeError, ValueError):
+            return None
+    
+    def _has_search_index(self, conn: sqlite3.Connection) -> bool:
+        """Verifica se o índice FTS5 de auditoria existe"""
+        if not self._search_index_available:
+            row = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'audit_events_fts'"
+            ).fetchone()
+            self._search_index_available = row is not None
+        return self._search_index_available
+    
+    def _build_fts_query(self, text: str) -> Optional[str]:
+        """Converte a busca do usuário em expressão FTS5 segura
+        
+        "frase exata" vira consulta de frase, termo* vira prefixo e os demais
+        termos são combinados com AND. Sintaxe FTS5 digitada pelo usuário é
+        sempre tratada como texto.
+        """
+        terms = []
+        for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+            if phrase:
+                tokens = re.findall(r'\w+', phrase)
+                if tokens:
+                    terms.append('"' + ' '.join(tokens) + '"')
+                continue
+            
+            tokens = re.findall(r'\w+', word)
+            for i, token in enumerate(tokens):
+                term = f'"{token}"'
+                if word.endswith('*') and i == len(tokens) - 1:
+                    term += '*'
+                terms.append(term)
+        
+        return ' '.join(terms) or None
+    
+    def _encode_cursor(self, mode: str, sort_key: Any, event_id: Any) -> str:
+        """Codifica cursor de paginação"""
+        payload = json.dumps([mode, sort_key.item() if hasattr(sort_key, 'item') else sort_key, int(event_id)])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+    
+    def _decode_cursor(self, cursor: str, mode: str) -> Tuple[Any, int]:
+        """Decodifica cursor de paginação"""
+        try:
+            cursor_mode, sort_key, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except Exception:
+            raise ValueError("Cursor de paginação inválido")
+        
+        if cursor_mode != mode:
+            raise ValueError("Cursor de paginação não corresponde à busca")
+        
+        return sort_key, event_id
+    
     async def answer_security_question(self, question: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """Responde perguntas sobre segurança, auditoria e comportamento"""
         
+        started = time.perf_counter()
+        timings = {}
+        
         # Analisa a pergunta para determinar o tipo de consulta
         question_analysis = self._analyze_question(question)
+        time_period = question_analysis.get("time_period") or 7
+        timings["question_analysis"] = round(time.perf_counter() - started, 4)
         
-        # Coleta dados relevantes baseado na pergunta
-        relevant_data = await self._gather_relevant_data(question_analysis)
-        
-        # Constrói prompt para IA
-        prompt = self._build_analysis_prompt(question, question_analysis, relevant_data, context)
+        # Dispara todas as coletas em paralelo
+        pending = self._dispatch_gathers(question_analysis["type"], time_period)
+        relevant_data = {"sources": []}
         
         try:
-            # Usa NVIDIA AI para análise
-            response = await nvidia_ai_service._make_api_request(prompt, context="database_analysis")
+            # Contexto mínimo: fontes na ordem do prompt até preencher o orçamento de dados
+            pending = await self._collect_gathers(
+                relevant_data, pending, timings, budget_chars=self.analysis_config["prompt_data_chars"]
+            )
+            prompt_data = dict(relevant_data)
+            prompt_data["statistics"] = self._gather_statistics(
+                relevant_data, time_period, pending_sources=[source for source, _ in pending]
+            )
+            
+            # Constrói prompt (dados resumidos no orçamento do modelo) e inicia a chamada
+            # à NVIDIA AI sem esperar as coletas restantes
+            prompt_data, prompt_stats = ai_context_compactor.compact(
+                prompt_data, model=nvidia_ai_service.active_config["model"]
+            )
+            prompt = self._build_analysis_prompt(question, question_analysis, prompt_data, context)
+            prompt_stats["prompt_tokens"] = ai_context_compactor.estimate_tokens(prompt)
+            timings["context_ready"] = round(time.perf_counter() - started, 4)
+            ai_started = time.perf_counter()
+            ai_request = asyncio.ensure_future(
+                nvidia_ai_service._make_api_request(prompt, context="database_analysis")
+            )
+            
+            await self._collect_gathers(relevant_data, pending, timings)
+            relevant_data["statistics"] = self._gather_statistics(relevant_data, time_period)
+            timings["gather_total"] = round(time.perf_counter() - started - timings["question_analysis"], 4)
+            
+            response = await ai_request
+            timings["ai_request"] = round(time.perf_counter() - ai_started, 4)
             
             # Processa resposta
             analysis = self._process_analysis_response(response, question, relevant_data)
+            timings["total"] = round(time.perf_counter() - started, 4)
+            logger.info(f"Pergunta respondida em {timings['total']:.3f}s (etapas: {timings})")
             
             return {
                 "success": True,
@@ -548,15 +1013,19 @@ class LucIADatabaseAnalyzer:
                 "analysis": analysis,
                 "data_sources": relevant_data.get("sources", []),
                 "confidence": analysis.get("confidence", 0.8),
+                "stage_timings": timings,
+                "prompt_stats": prompt_stats,
                 "timestamp": datetime.now().isoformat()
             }
             
         except Exception as e:
             logger.error(f"Erro na análise de pergunta: {str(e)}")
+            timings["total"] = round(time.perf_counter() - started, 4)
             return {
                 "success": False,
                 "error": str(e),
-                "question": question
+                "question": question,
+                "stage_timings": timings
             }
     
     def _analyze_question(self, question: str) -> Dict[str, Any]:
@@ -654,133 +1123,182 @@ class LucIADatabaseAnalyzer:
             "complexity": len(matched_patterns) + len([e for e in entities.values() if e])
         }
     
-    async def _gather_relevant_data(self, question_analysis: Dict[str, Any]) -> Dict[str, Any]:
+    async def _gather_relevant_data(self,
+                                    question_analysis: Dict[str, Any],
+                                    timings: Dict[str, float] = None) -> Dict[str, Any]:
         """Coleta dados relevantes baseado na análise da pergunta"""
         
+        time_period = question_analysis.get("time_period") or 7
         data = {"sources": []}
-        question_type = question_analysis["type"]
-        time_period = question_analysis.get("time_period", 7)
         
-        try:
-            conn = sqlite3.connect(self.db_path)
-            
-            # Dados básicos sempre incluídos
-            if question_type in ["user_activity", "general", "statistical_query"]:
-                # Atividade recente dos usuários
-                user_activity_query = """
-                    SELECT 
-                        u.id, u.username, u.full_name, u.role, u.status,
-                        o.name as organization,
-                        COUNT(al.id) as recent_activities,
-                        MAX(al.timestamp) as last_activity,
-                        COUNT(DISTINCT al.ip_address) as unique_ips
-                    FROM users u
-                    LEFT JOIN organizations o ON u.organization_id = o.id
-                    LEFT JOIN access_logs al ON u.id = al.user_id 
-                        AND al.timestamp >= ?
-                    GROUP BY u.id, u.username, u.full_name, u.role, u.status, o.name
-                    ORDER BY recent_activities DESC
-                """
-                
-                start_date = (datetime.now() - timedelta(days=time_period)).isoformat()
-                df_users = pd.read_sql_query(user_activity_query, conn, params=[start_date])
-                data["user_activity"] = df_users.to_dict('records')
-                data["sources"].append("user_activity")
-            
-            if question_type in ["security_incident", "audit_query", "general"]:
-                # Eventos de segurança recentes
-                security_query = """
-                    SELECT 
-                        ae.*, u.username, u.full_name, o.name as organization
-                    FROM audit_events ae
-                    JOIN users u ON ae.user_id = u.id
-                    JOIN organizations o ON u.organization_id = o.id
-                    WHERE ae.timestamp >= ?
-                    ORDER BY ae.timestamp DESC
-                    LIMIT 100
-                """
-                
-                start_date = (datetime.now() - timedelta(days=time_period)).isoformat()
-                df_security = pd.read_sql_query(security_query, conn, params=[start_date])
-                data["security_events"] = df_security.to_dict('records')
-                data["sources"].append("security_events")
-            
-            if question_type in ["certificate_usage", "general"]:
-                # Uso de certificados
-                cert_query = """
-                    SELECT 
-                        c.*, u.username, u.full_name,
-                        COUNT(al.id) as recent_usage
-                    FROM certificates c
-                    JOIN users u ON c.user_id = u.id
-                    LEFT JOIN access_logs al ON u.id = al.user_id 
-                        AND al.action LIKE '%certificate%'
-                        AND al.timestamp >= ?
-                    GROUP BY c.id, c.user_id, c.certificate_type, c.serial_number, 
-                             c.subject_name, c.status, u.username, u.full_name
-                    ORDER BY recent_usage DESC
-                """
-                
-                start_date = (datetime.now() - timedelta(days=time_period)).isoformat()
-                df_certs = pd.read_sql_query(cert_query, conn, params=[start_date])
-                data["certificate_usage"] = df_certs.to_dict('records')
-                data["sources"].append("certificate_usage")
-            
-            if question_type in ["performance_analysis", "general"]:
-                # Análise de performance
-                perf_query = """
-                    SELECT 
-                        al.action,
-                        COUNT(*) as count,
-                        AVG(al.response_time) as avg_response_time,
-                        MAX(al.response_time) as max_response_time,
-                        MIN(al.response_time) as min_response_time,
-                        COUNT(CASE WHEN al.response_time > 5.0 THEN 1 END) as slow_requests
-                    FROM access_logs al
-                    WHERE al.timestamp >= ?
-                    GROUP BY al.action
-                    ORDER BY avg_response_time DESC
-                """
-                
-                start_date = (datetime.now() - timedelta(days=time_period)).isoformat()
-                df_perf = pd.read_sql_query(perf_query, conn, params=[start_date])
-                data["performance_metrics"] = df_perf.to_dict('records')
-                data["sources"].append("performance_metrics")
-            
-            # Logs de acesso detalhados para análises específicas
-            if question_type in ["user_activity", "security_incident", "audit_query"]:
-                access_query = """
-                    SELECT 
-                        al.*, u.username, u.full_name, u.role
-                    FROM access_logs al
-                    JOIN users u ON al.user_id = u.id
-                    WHERE al.timestamp >= ?
-                    ORDER BY al.timestamp DESC
-                    LIMIT 500
-                """
-                
-                start_date = (datetime.now() - timedelta(days=time_period)).isoformat()
-                df_access = pd.read_sql_query(access_query, conn, params=[start_date])
-                data["access_logs"] = df_access.to_dict('records')
-                data["sources"].append("access_logs")
-            
-            conn.close()
-            
-            # Adiciona estatísticas gerais
-            data["statistics"] = {
-                "total_users": len(data.get("user_activity", [])),
-                "total_security_events": len(data.get("security_events", [])),
-                "total_certificates": len(data.get("certificate_usage", [])),
-                "analysis_period_days": time_period,
-                "data_collected_at": datetime.now().isoformat()
-            }
-            
-        except Exception as e:
-            logger.error(f"Erro ao coletar dados: {str(e)}")
-            data["error"] = str(e)
+        pending = self._dispatch_gathers(question_analysis["type"], time_period)
+        await self._collect_gathers(data, pending, timings if timings is not None else {})
         
+        data["statistics"] = self._gather_statistics(data, time_period)
         return data
     
+    def _dispatch_gathers(self, question_type: str, time_period: int) -> List[Tuple[str, asyncio.Future]]:
+        """Dispara em paralelo, no pool de coleta, as consultas do tipo de pergunta"""
+        
+        loop = asyncio.get_running_loop()
+        start_date = (datetime.now() - timedelta(days=time_period)).isoformat()
+        
+        return [
+            (source, loop.run_in_executor(self._gather_executor, self._run_gather, source, start_date, question_type))
+            for source, question_types in GATHER_SOURCES
+            if question_type in question_types
+        ]
+    
+    async def _collect_gathers(self,
+                               data: Dict[str, Any],
+                               pending: List[Tuple[str, asyncio.Future]],
+                               timings: Dict[str, float],
+                               budget_chars: int = None) -> List[Tuple[str, asyncio.Future]]:
+        """Incorpora resultados na ordem do prompt; com orçamento, para quando ele é preenchido
+        
+        Retorna as coletas ainda não incorporadas.
+        """
+        
+        while pending:
+            if budget_chars is not None and len(json.dumps(data, ensure_ascii=False, default=str)) >= budget_chars:
+                break
+            
+            source, future = pending.pop(0)
+            try:
+                records, elapsed = await future
+                data[source] = records
+                data["sources"].append(source)
+                timings[f"gather_{source}"] = round(elapsed, 4)
+            except Exception as e:
+                logger.error(f"Erro ao coletar dados ({source}): {str(e)}")
+                data["error"] = str(e)
+        
+        return pending
+    
+    def _run_gather(self, source: str, start_date: str, question_type: str = None) -> Tuple[List[Dict[str, Any]], float]:
+        """Executa uma coleta na thread do pool, com a conexão de leitura da thread"""
+        
+        started = time.perf_counter()
+        token = CURRENT_QUESTION_TYPE.set(question_type)
+        try:
+            records = getattr(self, f"_fetch_{source}")(self._read_connection(), start_date)
+        finally:
+            CURRENT_QUESTION_TYPE.reset(token)
+        return records, time.perf_counter() - started
+    
+    def _read_connection(self) -> sqlite3.Connection:
+        """Conexão somente leitura própria da thread atual (reutilizada entre coletas)"""
+        
+        conn = getattr(self._gather_local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            self._gather_local.conn = conn
+        return conn
+    
+    def _gather_statistics(self, data: Dict[str, Any], time_period: int, pending_sources: List[str] = None) -> Dict[str, Any]:
+        """Estatísticas gerais sobre os dados coletados"""
+        
+        statistics = {
+            "total_users": len(data.get("user_activity", [])),
+            "total_security_events": len(data.get("security_events", [])),
+            "total_certificates": len(data.get("certificate_usage", [])),
+            "analysis_period_days": time_period,
+            "data_collected_at": datetime.now().isoformat()
+        }
+        if pending_sources:
+            statistics["pending_sources"] = pending_sources
+        return statistics
+    
+    def _fetch_user_activity(self, conn: sqlite3.Connection, start_date: str) -> List[Dict[str, Any]]:
+        """Atividade recente dos usuários"""
+        
+        user_activity_query = """
+            SELECT 
+                u.id, u.username, u.full_name, u.role, u.status,
+                o.name as organization,
+                COUNT(al.id) as recent_activities,
+                MAX(al.timestamp) as last_activity,
+                COUNT(DISTINCT al.ip_address) as unique_ips
+            FROM users u
+            LEFT JOIN organizations o ON u.organization_id = o.id
+            LEFT JOIN access_logs al ON u.id = al.user_id 
+                AND al.timestamp >= ?
+            GROUP BY u.id, u.username, u.full_name, u.role, u.status, o.name
+            ORDER BY recent_activities DESC
+        """
+        
+        return self._read_sql(conn, "gather_user_activity", user_activity_query, [start_date]).to_dict('records')
+    
+    def _fetch_security_events(self, conn: sqlite3.Connection, start_date: str) -> List[Dict[str, Any]]:
+        """Eventos de segurança recentes"""
+        
+        security_query = """
+            SELECT 
+                ae.*, u.username, u.full_name, o.name as organization
+            FROM audit_events ae
+            JOIN users u ON ae.user_id = u.id
+            JOIN organizations o ON u.organization_id = o.id
+            WHERE ae.timestamp >= ?
+            ORDER BY ae.timestamp DESC
+            LIMIT 100
+        """
+        
+        return self._read_sql(conn, "gather_security_events", security_query, [start_date]).to_dict('records')
+    
+    def _fetch_certificate_usage(self, conn: sqlite3.Connection, start_date: str) -> List[Dict[str, Any]]:
+        """Uso de certificados"""
+        
+        cert_query = """
+            SELECT 
+                c.*, u.username, u.full_name,
+                COUNT(al.id) as recent_usage
+            FROM certificates c
+            JOIN users u ON c.user_id = u.id
+            LEFT JOIN access_logs al ON u.id = al.user_id 
+                AND al.action LIKE '%certificate%'
+                AND al.timestamp >= ?
+            GROUP BY c.id, c.user_id, c.certificate_type, c.serial_number, 
+                     c.subject_name, c.status, u.username, u.full_name
+            ORDER BY recent_usage DESC
+        """
+        
+        return self._read_sql(conn, "gather_certificate_usage", cert_query, [start_date]).to_dict('records')
+    
+    def _fetch_performance_metrics(self, conn: sqlite3.Connection, start_date: str) -> List[Dict[str, Any]]:
+        """Análise de performance por ação"""
+        
+        perf_query = """
+            SELECT 
+                al.action,
+                COUNT(*) as count,
+                AVG(al.response_time) as avg_response_time,
+                MAX(al.response_time) as max_response_time,
+                MIN(al.response_time) as min_response_time,
+                COUNT(CASE WHEN al.response_time > 5.0 THEN 1 END) as slow_requests
+            FROM access_logs al
+            WHERE al.timestamp >= ?
+            GROUP BY al.action
+            ORDER BY avg_response_time DESC
+        """
+        
+        return self._read_sql(conn, "gather_performance_metrics", perf_query, [start_date]).to_dict('records')
+    
+    def _fetch_access_logs(self, conn: sqlite3.Connection, start_date: str) -> List[Dict[str, Any]]:
+        """Logs de acesso detalhados para análises específicas"""
+        
+        access_query = """
+            SELECT 
+                al.*, u.username, u.full_name, u.role
+            FROM access_logs al
+            JOIN users u ON al.user_id = u.id
+            WHERE al.timestamp >= ?
+            ORDER BY al.timestamp DESC
+            LIMIT 500
+        """
+        
+        return self._read_sql(conn, "gather_access_logs", access_query, [start_date]).to_dict('records')
+    
     def _build_analysis_prompt(self, 
                              question: str, 
                              question_analysis: Dict[str, Any], 
@@ -802,10 +1320,11 @@ class LucIADatabaseAnalyzer:
         
         DADOS DISPONÍVEIS:
         - Fontes de dados: {relevant_data.get('sources', [])}
-        - Estatísticas gerais: {relevant_data.get('statistics', {})}
+        - Estatísticas gerais: {ai_context_compactor.render(relevant_data.get('statistics', {}))}
         
-        DADOS DETALHADOS:
-        {json.dumps(relevant_data, indent=2, ensure_ascii=False, default=str)[:5000]}...
+        DADOS DETALHADOS (JSON resumido: "total" e "agregados" cobrem todos os registros,
+        "principais" traz os mais relevantes, "comum" vale para todos):
+        {ai_context_compactor.render({k: v for k, v in relevant_data.items() if k not in ("sources", "statistics")})}
         
         INSTRUÇÕES PARA RESPOSTA:
         1. Analise os dados fornecidos em relação à pergunta
@@ -863,6 +1382,284 @@ class LucIADatabaseAnalyzer:
                 "error": str(e)
             }
     
+    def _query_behavior_aggregates(self, conn: sqlite3.Connection, user_id: str, days: int) -> Tuple[pd.DataFrame, ...]:
+        """Agregados comportamentais via quatro consultas GROUP BY (modo multi_query)"""
+        
+        # Query base para análise comportamental
+        if user_id:
+            where_clause = "WHERE al.user_id = ? AND al.timestamp >= ?"
+            params = [user_id, (datetime.now() - timedelta(days=days)).isoformat()]
+        else:
+            where_clause = "WHERE al.timestamp >= ?"
+            params = [(datetime.now() - timedelta(days=days)).isoformat()]
+        
+        # Análise de atividades
+        activity_query = f"""
+            SELECT 
+                u.username,
+                u.full_name,
+                u.role,
+                o.name as organization,
+                COUNT(*) as total_activities,
+                COUNT(DISTINCT DATE(al.timestamp)) as active_days,
+                AVG(al.response_time) as avg_response_time,
+                COUNT(CASE WHEN al.success = 0 THEN 1 END) as failed_attempts,
+                COUNT(DISTINCT al.ip_address) as unique_ips,
+                COUNT(DISTINCT al.session_id) as unique_sessions,
+                MIN(al.timestamp) as first_activity,
+                MAX(al.timestamp) as last_activity
+            FROM access_logs al
+            JOIN users u ON al.user_id = u.id
+            JOIN organizations o ON u.organization_id = o.id
+            {where_clause}
+            GROUP BY al.user_id, u.username, u.full_name, u.role, o.name
+            ORDER BY total_activities DESC
+        """
+        
+        df_activity = self._read_sql(conn, "behavior_activity", activity_query, params, user_id)
+        
+        # Análise de padrões temporais
+        temporal_query = f"""
+            SELECT 
+                al.user_id,
+                u.username,
+                strftime('%H', al.timestamp) as hour,
+                strftime('%w', al.timestamp) as day_of_week,
+                COUNT(*) as activity_count
+            FROM access_logs al
+            JOIN users u ON al.user_id = u.id
+            {where_clause}
+            GROUP BY al.user_id, u.username, hour, day_of_week
+        """
+        
+        df_temporal = self._read_sql(conn, "behavior_temporal", temporal_query, params, user_id)
+        
+        # Análise de ações
+        action_query = f"""
+            SELECT 
+                al.user_id,
+                u.username,
+                al.action,
+                COUNT(*) as count,
+                AVG(al.response_time) as avg_time,
+                COUNT(CASE WHEN al.success = 0 THEN 1 END) as failures
+            FROM access_logs al
+            JOIN users u ON al.user_id = u.id
+            {where_clause}
+            GROUP BY al.user_id, u.username, al.action
+            ORDER BY count DESC
+        """
+        
+        df_actions = self._read_sql(conn, "behavior_actions", action_query, params, user_id)
+        
+        # Análise de IPs
+        ip_query = f"""
+            SELECT 
+                al.user_id,
+                u.username,
+                al.ip_address,
+                COUNT(*) as usage_count,
+                MIN(al.timestamp) as first_seen,
+                MAX(al.timestamp) as last_seen,
+                COUNT(CASE WHEN al.success = 0 THEN 1 END) as failed_attempts
+            FROM access_logs al
+            JOIN users u ON al.user_id = u.id
+            {where_clause}
+            GROUP BY al.user_id, u.username, al.ip_address
+            ORDER BY usage_count DESC
+        """
+        
+        df_ips = self._read_sql(conn, "behavior_ips", ip_query, params, user_id)
+        
+        return df_activity, df_temporal, df_actions, df_ips
+    
+    def _scan_behavior_aggregates(self, conn: sqlite3.Connection, user_id: str, days: int) -> Tuple[pd.DataFrame, ...]:
+        """Agregados comportamentais em uma única leitura de access_logs
+        
+        Percorre as linhas da janela uma vez, em ordem de timestamp (pelo índice
+        coberto) e em blocos, agregando cada bloco de forma vetorizada; os parciais
+        são combinados nos mesmos quatro DataFrames das consultas GROUP BY.
+        """
+        start_date = (datetime.now() - timedelta(days=days)).isoformat()
+        
+        # Dimensões pequenas carregadas uma vez (JOINs em memória)
+        users = self._read_sql(conn, "behavior_users", """
+            SELECT u.id, u.username, u.full_name, u.role, o.name AS organization, o.id AS organization_id
+            FROM users u
+            LEFT JOIN organizations o ON u.organization_id = o.id
+        """, index_col="id")
+        
+        scan_query = """
+            SELECT 
+                al.user_id,
+                al.timestamp,
+                DATE(al.timestamp),
+                strftime('%H', al.timestamp),
+                strftime('%w', al.timestamp),
+                al.action,
+                al.ip_address,
+                al.success,
+                al.session_id,
+                al.response_time
+            FROM access_logs al
+        """
+        if user_id:
+            scan_query += " WHERE al.user_id = ? AND al.timestamp >= ? ORDER BY al.timestamp"
+            params = [user_id, start_date]
+        else:
+            scan_query += " WHERE al.timestamp >= ? ORDER BY al.timestamp"
+            params = [start_date]
+        
+        with self._track_query(conn, "behavior_scan", scan_query, params, user_id) as tracked:
+            return self._aggregate_behavior_chunks(users, (
+                pd.DataFrame.from_records(rows, columns=BEHAVIOR_SCAN_COLUMNS)
+                for rows in self._fetch_in_chunks(conn, scan_query, params, tracked)
+            ))
+    
+    def _snapshot_behavior_aggregates(self, user_id: str, days: int) -> Tuple[pd.DataFrame, ...]:
+        """Agregados comportamentais a partir dos snapshots colunares (sem acessar o banco)"""
+        
+        start_date = (datetime.now() - timedelta(days=days)).isoformat()
+        
+        users = self.snapshot_store.read_dimension("users", ["id", "username", "full_name", "role", "organization_id"])
+        organizations = self.snapshot_store.read_dimension("organizations", ["id", "name"])
+        users = users.merge(
+            organizations.rename(columns={"id": "org_id", "name": "organization"}),
+            how="left", left_on="organization_id", right_on="org_id"
+        )
+        users["organization_id"] = users["organization_id"].where(users["org_id"].notna())
+        users = users.set_index("id")[["username", "full_name", "role", "organization", "organization_id"]]
+        
+        equals = None
+        if user_id:
+            # Mesma coerção do SQLite para user_id INTEGER
+            try:
+                equals = {"user_id": int(user_id)}
+            except (TypeError, ValueError):
+                return self._aggregate_behavior_chunks(users, [])
+        
+        chunks = self.snapshot_store.scan("access_logs", start=start_date, columns=BEHAVIOR_SCAN_COLUMNS, equals=equals)
+        return self._aggregate_behavior_chunks(users, chunks)
+    
+    def _aggregate_behavior_chunks(self, users: pd.DataFrame, chunks) -> Tuple[pd.DataFrame, ...]:
+        """Agrega blocos de linhas de access_logs (em ordem de timestamp) nos quatro DataFrames
+        
+        Cada bloco é dobrado nos agregados acumulados antes do próximo ser lido, então
+        a memória depende do número de chaves (usuário, ação, IP, hora...) e do tamanho
+        do bloco, não do tamanho da janela.
+        """
+        
+        # Parciais por bloco, compactados nos agregados acumulados sempre que os
+        # pendentes passam de scan_chunk_size linhas (custo amortizado, memória limitada)
+        parts = defaultdict(list)
+        pending_rows = defaultdict(int)
+        budget = self.analysis_config["scan_chunk_size"]
+        
+        combiners = {
+            "actions": lambda frame: frame.groupby(["user_id", "action"], dropna=False, sort=False).agg({
+                "count": "sum", "time_sum": "sum", "timed": "sum", "failures": "sum"
+            }).reset_index(),
+            "ips": lambda frame: frame.groupby(["user_id", "ip_address"], dropna=False, sort=False).agg({
+                "usage_count": "sum", "first_seen": "first", "last_seen": "last", "failed_attempts": "sum"
+            }).reset_index(),
+            "temporal": lambda frame: frame.groupby(
+                ["user_id", "hour", "day_of_week"], dropna=False, sort=False
+            )["activity_count"].sum().reset_index(),
+            "days": lambda frame: frame.drop_duplicates(),
+            "sessions": lambda frame: frame.drop_duplicates()
+        }
+        
+        def fold(name: str, partial: pd.DataFrame = None):
+            if partial is not None:
+                parts[name].append(partial)
+                pending_rows[name] += len(partial)
+            if len(parts[name]) > 1 and (partial is None or pending_rows[name] > budget):
+                merged = combiners[name](pd.concat(parts[name], ignore_index=True))
+                parts[name] = [merged]
+                pending_rows[name] = 0
+        
+        for chunk in chunks:
+            chunk = chunk[chunk["user_id"].isin(users.index)]  # JOIN users
+            chunk = chunk.astype({"user_id": users.index.dtype})
+            chunk["failed"] = (chunk["success"] == 0).astype(int)
+            chunk["timed"] = chunk["response_time"].notna().astype(int)
+            
+            fold("actions", chunk.groupby(["user_id", "action"], dropna=False, sort=False).agg(
+                count=("timestamp", "size"),
+                time_sum=("response_time", "sum"),
+                timed=("timed", "sum"),
+                failures=("failed", "sum")
+            ).reset_index())
+            fold("ips", chunk.groupby(["user_id", "ip_address"], dropna=False, sort=False).agg(
+                usage_count=("timestamp", "size"),
+                first_seen=("timestamp", "first"),  # linhas em ordem de timestamp
+                last_seen=("timestamp", "last"),
+                failed_attempts=("failed", "sum")
+            ).reset_index())
+            fold("temporal", chunk.groupby(
+                ["user_id", "hour", "day_of_week"], dropna=False, sort=False
+            ).size().reset_index(name="activity_count"))
+            fold("days", chunk[["user_id", "day"]].dropna().drop_duplicates())
+            fold("sessions", chunk[["user_id", "session_id"]].dropna().drop_duplicates())
+        
+        for name in list(parts):
+            fold(name)
+        running = {name: frames[0] for name, frames in parts.items()}
+        
+        activity_columns = [
+            "username", "full_name", "role", "organization", "total_activities", "active_days",
+            "avg_response_time", "failed_attempts", "unique_ips", "unique_sessions",
+            "first_activity", "last_activity"
+        ]
+        temporal_columns = ["user_id", "username", "hour", "day_of_week", "activity_count"]
+        action_columns = ["user_id", "username", "action", "count", "avg_time", "failures"]
+        ip_columns = ["user_id", "username", "ip_address", "usage_count", "first_seen", "last_seen", "failed_attempts"]
+        
+        if "actions" not in running:
+            return (pd.DataFrame(columns=activity_columns), pd.DataFrame(columns=temporal_columns),
+                    pd.DataFrame(columns=action_columns), pd.DataFrame(columns=ip_columns))
+        
+        # Ordenação igual à das consultas GROUP BY ... ORDER BY contagem
+        # (empates em ordem de chave, NULL primeiro)
+        actions = running["actions"]
+        actions["avg_time"] = actions["time_sum"] / actions["timed"].where(actions["timed"] > 0)
+        actions["username"] = actions["user_id"].map(users["username"])
+        df_actions = actions.sort_values(
+            ["count", "user_id", "action"], ascending=[False, True, True], na_position="first", kind="stable"
+        )[action_columns].reset_index(drop=True)
+        
+        ips = running["ips"]
+        ips["username"] = ips["user_id"].map(users["username"])
+        df_ips = ips.sort_values(
+            ["usage_count", "user_id", "ip_address"], ascending=[False, True, True], na_position="first", kind="stable"
+        )[ip_columns].reset_index(drop=True)
+        
+        temporal = running["temporal"]
+        temporal["username"] = temporal["user_id"].map(users["username"])
+        df_temporal = temporal.sort_values(
+            ["user_id", "hour", "day_of_week"], na_position="first", kind="stable"
+        )[temporal_columns].reset_index(drop=True)
+        
+        per_user = actions.groupby("user_id")[["count", "time_sum", "timed", "failures"]].sum()
+        activity = users.loc[per_user.index, ["username", "full_name", "role", "organization", "organization_id"]].copy()
+        activity["total_activities"] = per_user["count"]
+        activity["active_days"] = running["days"].groupby("user_id").size()
+        activity["avg_response_time"] = per_user["time_sum"] / per_user["timed"].where(per_user["timed"] > 0)
+        activity["failed_attempts"] = per_user["failures"]
+        activity["unique_ips"] = ips.dropna(subset=["ip_address"]).groupby("user_id").size()
+        activity["unique_sessions"] = running["sessions"].groupby("user_id").size()
+        activity["first_activity"] = ips.groupby("user_id")["first_seen"].min()
+        activity["last_activity"] = ips.groupby("user_id")["last_seen"].max()
+        for column in ["active_days", "unique_ips", "unique_sessions"]:
+            activity[column] = activity[column].fillna(0).astype(int)
+        
+        activity = activity[activity["organization_id"].notna()]  # JOIN organizations
+        df_activity = activity.rename_axis("user_id").reset_index().sort_values(
+            ["total_activities", "user_id"], ascending=[False, True], kind="stable"
+        )[activity_columns].reset_index(drop=True)
+        
+        return df_activity, df_temporal, df_actions, df_ips
+    
     def _analyze_temporal_patterns(self, df_temporal: pd.DataFrame) -> Dict[str, Any]:
         """Analisa padrões temporais de atividade"""
         
@@ -915,13 +1712,11 @@ class LucIADatabaseAnalyzer:
         # Ações com mais falhas
         actions_with_failures = df_actions[df_actions['failures'] > 0].sort_values('failures', ascending=False)
         
-        # Taxa de falha por ação
-        failure_rates = {}
-        for _, row in df_actions.iterrows():
-            if row['count'] > 0:
-                failure_rate = (row['failures'] / row['count']) * 100
-                if failure_rate > 0:
-                    failure_rates[row['action']] = round(failure_rate, 2)
+        # Taxa de falha por ação (agregada sobre todos os usuários)
+        action_totals = df_actions.groupby('action')[['count', 'failures']].sum()
+        action_totals = action_totals[action_totals['count'] > 0]
+        action_failure_rates = (action_totals['failures'] / action_totals['count'] * 100).round(2)
+        failure_rates = action_failure_rates[action_failure_rates > 0].to_dict()
         
         return {
             "top_actions": top_actions,
@@ -949,18 +1744,16 @@ class LucIADatabaseAnalyzer:
         users_multiple_ips = users_multiple_ips[users_multiple_ips > 1].to_dict()
         
         # IPs suspeitos (com alta taxa de falha)
-        suspicious_ips = []
-        for _, row in df_ips.iterrows():
-            if row['usage_count'] > 0:
-                failure_rate = (row['failed_attempts'] / row['usage_count']) * 100
-                if failure_rate > 50:  # Mais de 50% de falhas
-                    suspicious_ips.append({
-                        "ip": row['ip_address'],
-                        "user": row['username'],
-                        "failure_rate": round(failure_rate, 2),
-                        "total_attempts": row['usage_count'],
-                        "failed_attempts": row['failed_attempts']
-                    })
+        ip_rows = df_ips[df_ips['usage_count'] > 0]
+        ip_failure_rates = ip_rows['failed_attempts'] / ip_rows['usage_count'] * 100
+        suspicious = ip_rows[ip_failure_rates > 50]  # Mais de 50% de falhas
+        suspicious_ips = pd.DataFrame({
+            "ip": suspicious['ip_address'],
+            "user": suspicious['username'],
+            "failure_rate": ip_failure_rates[ip_failure_rates > 50].round(2),
+            "total_attempts": suspicious['usage_count'],
+            "failed_attempts": suspicious['failed_attempts']
+        }).to_dict('records')
         
         return {
             "top_ips": top_ips,
@@ -980,40 +1773,47 @@ class LucIADatabaseAnalyzer:
         anomalies = []
         
         if not df_activity.empty:
-            # Detecta usuários com atividade anômala
+            totals = df_activity['total_activities']
+            
+            # Detecta usuários com atividade anômala (z-score de todos de uma vez)
             if len(df_activity) > 1:
-                activity_mean = df_activity['total_activities'].mean()
-                activity_std = df_activity['total_activities'].std()
+                activity_mean = totals.mean()
+                activity_std = totals.std()
                 
-                for _, user in df_activity.iterrows():
-                    z_score = (user['total_activities'] - activity_mean) / activity_std if activity_std > 0 else 0
+                if activity_std > 0:
+                    z_scores = (totals - activity_mean) / activity_std
+                    outliers = z_scores.abs() > self.analysis_config["anomaly_threshold"]
                     
-                    if abs(z_score) > self.analysis_config["anomaly_threshold"]:
+                    for username, total, z_score in zip(df_activity.loc[outliers, 'username'],
+                                                        totals[outliers],
+                                                        z_scores[outliers]):
                         anomalies.append({
                             "type": "unusual_activity_volume",
-                            "user": user['username'],
+                            "user": username,
                             "description": f"Atividade {z_score:.2f} desvios padrão da média",
                             "severity": "high" if abs(z_score) > 3 else "medium",
                             "details": {
-                                "total_activities": user['total_activities'],
+                                "total_activities": int(total),
                                 "mean_activities": round(activity_mean, 2),
                                 "z_score": round(z_score, 2)
                             }
                         })
             
             # Detecta usuários com muitos IPs únicos
-            for _, user in df_activity.iterrows():
-                if user['unique_ips'] > 5:
-                    anomalies.append({
-                        "type": "multiple_ip_usage",
-                        "user": user['username'],
-                        "description": f"Usuário utilizou {user['unique_ips']} IPs diferentes",
-                        "severity": "medium",
-                        "details": {
-                            "unique_ips": user['unique_ips'],
-                            "total_activities": user['total_activities']
-                        }
-                    })
+            many_ips = df_activity[df_activity['unique_ips'] > 5]
+            for username, unique_ips, total in zip(many_ips['username'],
+                                                   many_ips['unique_ips'],
+                                                   many_ips['total_activities']):
+                anomalies.append({
+                    "type": "multiple_ip_usage",
+                    "user": username,
+                    "description": f"Usuário utilizou {unique_ips} IPs diferentes",
+                    "severity": "medium",
+                    "details": {
+                        "unique_ips": int(unique_ips),
+                        "total_activities": int(total)
+                    }
+                })
         
         return anomalies
     
@@ -1025,53 +1825,56 @@ class LucIADatabaseAnalyzer:
         
         risk_assessment = {}
         
-        if not df_activity.empty:
-            for _, user in df_activity.iterrows():
-                username = user['username']
-                risk_score = 0.0
-                risk_factors = []
-                
-                # Fator: Múltiplos IPs
-                if user['unique_ips'] > 3:
-                    risk_score += 0.3
-                    risk_factors.append(f"Múltiplos IPs ({user['unique_ips']})")
-                
-                # Fator: Tentativas falhadas
-                if user['failed_attempts'] > 5:
-                    risk_score += 0.4
-                    risk_factors.append(f"Múltiplas falhas ({user['failed_attempts']})")
-                
-                # Fator: Atividade muito alta ou muito baixa
-                if len(df_activity) > 1:
-                    activity_mean = df_activity['total_activities'].mean()
-                    if user['total_activities'] > activity_mean * 3:
-                        risk_score += 0.2
-                        risk_factors.append("Atividade muito alta")
-                    elif user['total_activities'] < activity_mean * 0.1:
-                        risk_score += 0.1
-                        risk_factors.append("Atividade muito baixa")
-                
-                # Determina nível de risco
-                if risk_score >= 0.7:
-                    risk_level = "high"
-                elif risk_score >= 0.4:
-                    risk_level = "medium"
-                else:
-                    risk_level = "low"
-                
-                risk_assessment[username] = {
-                    "risk_score": round(risk_score, 2),
-                    "risk_level": risk_level,
-                    "risk_factors": risk_factors,
-                    "total_activities": user['total_activities'],
-                    "failed_attempts": user['failed_attempts'],
-                    "unique_ips": user['unique_ips']
-                }
+        if df_activity.empty:
+            return risk_assessment
+        
+        totals = df_activity['total_activities']
+        unique_ips = df_activity['unique_ips']
+        failed_attempts = df_activity['failed_attempts']
+        
+        # Fatores de risco calculados para todos os usuários de uma vez
+        multiple_ips = (unique_ips > 3).to_numpy()
+        multiple_failures = (failed_attempts > 5).to_numpy()
+        
+        if len(df_activity) > 1:
+            activity_mean = totals.mean()
+            high_activity = (totals > activity_mean * 3).to_numpy()
+            low_activity = ~high_activity & (totals < activity_mean * 0.1).to_numpy()
+        else:
+            high_activity = np.zeros(len(df_activity), dtype=bool)
+            low_activity = high_activity
+        
+        risk_scores = (0.3 * multiple_ips + 0.4 * multiple_failures
+                       + 0.2 * high_activity + 0.1 * low_activity).round(2)
+        
+        # Determina nível de risco
+        risk_levels = np.select([risk_scores >= 0.7, risk_scores >= 0.4], ["high", "medium"], "low")
+        
+        for i, (username, total, failed, ips) in enumerate(zip(df_activity['username'], totals.tolist(),
+                                                              failed_attempts.tolist(), unique_ips.tolist())):
+            risk_factors = []
+            if multiple_ips[i]:
+                risk_factors.append(f"Múltiplos IPs ({ips})")
+            if multiple_failures[i]:
+                risk_factors.append(f"Múltiplas falhas ({failed})")
+            if high_activity[i]:
+                risk_factors.append("Atividade muito alta")
+            elif low_activity[i]:
+                risk_factors.append("Atividade muito baixa")
+            
+            risk_assessment[username] = {
+                "risk_score": float(risk_scores[i]),
+                "risk_level": str(risk_levels[i]),
+                "risk_factors": risk_factors,
+                "total_activities": total,
+                "failed_attempts": failed,
+                "unique_ips": ips
+            }
         
         return risk_assessment
 
 # Instância global do serviço
-lucia_db_analyzer = LucIADatabaseAnalyzer()
+lucia_db_analyzer = registry.service("lucia_db_analyzer")
 
 # Funções de conveniência
 async def analyze_user_behavior(user_id: str = None, days: int = 30):
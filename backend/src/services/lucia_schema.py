@@ -0,0 +1,128 @@
+"""
+CertGuard AI - Migrações de esquema do banco de análise da LucIA
+Índices e alterações versionadas aplicadas sobre as tabelas criadas por LucIADatabaseAnalyzer
+"""
+
+import sqlite3
+import logging
+from datetime import datetime
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (versão, descrição, comandos) - nunca alterar uma migração já publicada;
+# mudanças de esquema entram sempre como uma nova versão
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "Índices cobrindo janelas de tempo e joins por usuário", [
+        # Janelas (al.timestamp >= ?) com todas as colunas agregadas pelo analisador:
+        # atividade, padrões temporais, ações, IPs e performance sem ler a tabela
+        """
+        CREATE INDEX IF NOT EXISTS idx_access_logs_time_covering
+        ON access_logs(timestamp, user_id, action, ip_address, success, session_id, response_time)
+        """,
+        # Filtro por usuário e LEFT JOIN users -> access_logs com janela
+        """
+        CREATE INDEX IF NOT EXISTS idx_access_logs_user_time_covering
+        ON access_logs(user_id, timestamp, action, ip_address, success, session_id, response_time)
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_audit_events_timestamp ON audit_events(timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_events_user_time ON audit_events(user_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_events_severity_time ON audit_events(severity, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_certificates_user ON certificates(user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_users_organization ON users(organization_id)"
+    ]),
+    (2, "Índice de texto completo (FTS5) para eventos de auditoria", [
+        # rowid = audit_events.id; username desnormalizado de users
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS audit_events_fts USING fts5(
+            description, details, username,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        INSERT INTO audit_events_fts (rowid, description, details, username)
+        SELECT ae.id, ae.description, ae.details, u.username
+        FROM audit_events ae
+        LEFT JOIN users u ON u.id = ae.user_id
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS audit_events_fts_insert AFTER INSERT ON audit_events
+        BEGIN
+            INSERT INTO audit_events_fts (rowid, description, details, username)
+            VALUES (new.id, new.description, new.details,
+                    (SELECT username FROM users WHERE id = new.user_id));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS audit_events_fts_update
+        AFTER UPDATE OF description, details, user_id ON audit_events
+        BEGIN
+            UPDATE audit_events_fts
+            SET description = new.description,
+                details = new.details,
+                username = (SELECT username FROM users WHERE id = new.user_id)
+            WHERE rowid = old.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS audit_events_fts_delete AFTER DELETE ON audit_events
+        BEGIN
+            DELETE FROM audit_events_fts WHERE rowid = old.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS users_username_fts_update AFTER UPDATE OF username ON users
+        BEGIN
+            UPDATE audit_events_fts SET username = new.username
+            WHERE rowid IN (SELECT id FROM audit_events WHERE user_id = new.id);
+        END
+        """
+    ])
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Versão atual do esquema (0 se nenhuma migração aplicada)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT
+        )
+    """)
+    row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn: sqlite3.Connection) -> List[int]:
+    """Aplica migrações pendentes, cada uma em sua própria transação"""
+    current = get_schema_version(conn)
+    applied = []
+
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+
+        try:
+            conn.execute("BEGIN")
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(
+                "INSERT INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.now().isoformat())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            logger.error(f"Falha na migração {version}: {description}")
+            raise
+
+        applied.append(version)
+        logger.info(f"Migração {version} aplicada: {description}")
+
+    if applied:
+        # Estatísticas para o planejador escolher os novos índices
+        conn.execute("ANALYZE")
+        conn.commit()
+
+    return applied
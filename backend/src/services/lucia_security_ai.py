@@ -4,9 +4,7 @@ Sistema de IA para análise comportamental, detecção de anomalias e monitorame
 """
 
 import os
-import json
 import asyncio
-import aiohttp
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 import logging
@@ -15,11 +13,11 @@ import ipaddress
 from dataclasses import dataclass
 from collections import defaultdict, Counter
 import re
-import geoip2.database
-import geoip2.errors
 
 from .nvidia_ai import nvidia_ai_service
 from .blockchain_audit import blockchain_audit_service, record_audit
+from .ai_context_compaction import ai_context_compactor
+from .registry import registry
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
@@ -253,12 +251,18 @@ class LucIASecurityAI:
         # Coleta dados relevantes
         context_data = await self._gather_security_context(query, user_id)
         
-        # Constrói prompt para IA
-        prompt = self._build_security_query_prompt(query, context_data)
+        # Contexto resumido no orçamento de tokens do modelo, depois o prompt
+        compacted, prompt_stats = ai_context_compactor.compact(
+            context_data, model=nvidia_ai_service.active_config["model"]
+        )
+        prompt = self._build_security_query_prompt(query, compacted)
+        prompt_stats["prompt_tokens"] = ai_context_compactor.estimate_tokens(prompt)
         
         try:
             # Usa NVIDIA AI para análise
-            response = await nvidia_ai_service._make_api_request(prompt, context="security_analysis")
+            response = await nvidia_ai_service._make_api_request(
+                prompt, context="security_analysis", similarity_text=query
+            )
             
             # Processa resposta
             analysis = self._process_security_response(response, query, context_data)
@@ -271,7 +275,8 @@ class LucIASecurityAI:
                 resource_id=f"query_{datetime.now().timestamp()}",
                 details={
                     "query": query,
-                    "context_size": len(str(context_data)),
+                    "context_tokens": prompt_stats["context_tokens"],
+                    "prompt_tokens": prompt_stats["prompt_tokens"],
                     "response_confidence": analysis.get("confidence", 0.0)
                 }
             )
@@ -281,6 +286,7 @@ class LucIASecurityAI:
                 "query": query,
                 "analysis": analysis,
                 "context_data": context_data,
+                "prompt_stats": prompt_stats,
                 "timestamp": datetime.now().isoformat()
             }
             
@@ -916,7 +922,7 @@ class LucIASecurityAI:
         return context
     
     def _build_security_query_prompt(self, query: str, context_data: Dict[str, Any]) -> str:
-        """Constrói prompt para consulta de segurança"""
+        """Constrói prompt para consulta de segurança (context_data já compactado)"""
         
         return f"""
         Você é LucIA, a assistente de segurança inteligente do CertGuard AI.
@@ -924,14 +930,9 @@ class LucIASecurityAI:
         
         CONSULTA: {query}
         
-        CONTEXTO DE SEGURANÇA:
-        - Eventos recentes: {len(context_data.get('recent_events', []))} eventos
-        - Estatísticas: {context_data.get('security_stats', {})}
-        - Inteligência de ameaças: {context_data.get('threat_intelligence', {})}
-        - Perfis de usuário: {len(context_data.get('user_profiles', {}))} usuários monitorados
-        
-        EVENTOS RECENTES RELEVANTES:
-        {json.dumps(context_data.get('recent_events', [])[:10], indent=2, ensure_ascii=False)}
+        CONTEXTO DE SEGURANÇA (JSON resumido: "total" e "agregados" cobrem todos os registros,
+        "principais" traz os de maior risco/mais recentes, "comum" vale para todos):
+        {ai_context_compactor.render(context_data)}
         
         Forneça uma resposta que inclua:
         1. Análise da situação atual
@@ -1003,7 +1004,7 @@ class LucIASecurityAI:
         return recommendations
 
 # Instância global do serviço
-lucia_security_ai = LucIASecurityAI()
+lucia_security_ai = registry.service("lucia_security_ai")
 
 # Funções de conveniência
 async def analyze_login(user_id: str, ip_address: str, user_agent: str, 
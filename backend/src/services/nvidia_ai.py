@@ -5,16 +5,28 @@ Sistema avançado de IA para análise jurídica e processamento de documentos
 
 import os
 import json
+import time
 import asyncio
-import aiohttp
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Iterator, Tuple
 from datetime import datetime
 import logging
 
+from .registry import registry
+from .ai_http_client import ai_http_client
+from .ai_response_cache import ai_response_cache
+from .ai_similarity_cache import ai_similarity_cache
+from .ai_context_compaction import ai_context_compactor
+from .ai_router import AIEndpointRouter
+from .ai_admission import ai_admission
+from .legal_chunking import LegalDocumentPipeline
+
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Endpoint OpenAI-compatível; aponte para scripts/mock_nvidia_server.py em benchmarks locais
+NVIDIA_API_BASE_URL = os.getenv("NVIDIA_API_BASE_URL", "https://integrate.api.nvidia.com/v1")
+
 class NVIDIAAIService:
     """Serviço de integração com APIs da NVIDIA para IA avançada"""
     
@@ -22,7 +34,7 @@ class NVIDIAAIService:
         # Configuração principal da API NVIDIA
         self.nvidia_api_1 = {
             "api_key": os.getenv("NVIDIA_API_KEY_1", "nvapi-82_"),
-            "base_url": "https://integrate.api.nvidia.com/v1",
+            "base_url": NVIDIA_API_BASE_URL,
             "model": "meta/llama3-70b-instruct",
             "temperature": 0.5,
             "top_p": 1,
@@ -33,7 +45,7 @@ class NVIDIAAIService:
         # Configuração secundária da API NVIDIA
         self.nvidia_api_2 = {
             "api_key": os.getenv("NVIDIA_API_KEY_2", "nvapi-YdC"),
-            "base_url": "https://integrate.api.nvidia.com/v1", 
+            "base_url": NVIDIA_API_BASE_URL,
             "model": "meta/llama-3.3-70b-instruct",
             "temperature": 0.2,
             "top_p": 0.7,
@@ -41,18 +53,19 @@ class NVIDIAAIService:
             "stream": True
         }
         
-        # Configuração ativa (pode alternar entre as duas)
+        # Configuração preferida (pode alternar entre as duas)
         self.active_config = self.nvidia_api_1
         
-        # Headers para requisições
-        self.headers = {
-            "Authorization": f"Bearer {self.active_config['api_key']}",
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
+        # Roteamento por latência/erros com circuit breaker; hedging opcional
+        hedge_after = os.getenv("NVIDIA_AI_HEDGE_AFTER_SECONDS")
+        self.router = AIEndpointRouter(
+            {"nvidia_api_1": self.nvidia_api_1, "nvidia_api_2": self.nvidia_api_2},
+            preferred="nvidia_api_1",
+            config={"hedge_after_seconds": float(hedge_after) if hedge_after else None}
+        )
         
-        # Cache de respostas para otimização
-        self.response_cache = {}
+        # Documentos longos: map-reduce por cláusulas/seções em vez de truncar o prompt
+        self.chunking = LegalDocumentPipeline(self)
         
         # Estatísticas de uso
         self.usage_stats = {
@@ -72,29 +85,43 @@ class NVIDIAAIService:
         else:
             raise ValueError("Configuração inválida. Use 1 ou 2.")
         
-        # Atualiza headers
-        self.headers["Authorization"] = f"Bearer {self.active_config['api_key']}"
+        # Preferência do roteador; o failover continua valendo se ela falhar
+        self.router.prefer(f"nvidia_api_{config_number}")
         logger.info(f"API configuração alterada para: {self.active_config['model']}")
 
+    def _headers(self, config: Dict[str, Any]) -> Dict[str, str]:
+        """Headers da requisição para uma configuração (sem estado compartilhado)"""
+        return {
+            "Authorization": f"Bearer {config['api_key']}",
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        }
+
     async def analyze_legal_document(self, document_text: str, document_type: str = "generic") -> Dict[str, Any]:
         """Analisa documento jurídico usando IA da NVIDIA"""
         
-        prompt = self._build_legal_analysis_prompt(document_text, document_type)
-        
         try:
-            response = await self._make_api_request(prompt, context="legal_analysis")
+            chunking = None
+            if self.chunking.needs_chunking(document_text):
+                response, chunking = await self.chunking.analyze(document_text, "legal", document_type)
+            else:
+                prompt = self._build_legal_analysis_prompt(document_text, document_type)
+                response = await self._make_api_request(prompt, context="legal_analysis")
             
             # Processa resposta para análise jurídica
             analysis = self._process_legal_analysis(response, document_type)
             
-            return {
+            result = {
                 "success": True,
                 "analysis": analysis,
                 "document_type": document_type,
                 "confidence": analysis.get("confidence", 0.85),
                 "timestamp": datetime.now().isoformat(),
-                "model_used": self.active_config["model"]
+                "model_used": response.get("model", self.active_config["model"])
             }
+            if chunking:
+                result["chunking"] = chunking
+            return result
             
         except Exception as e:
             logger.error(f"Erro na análise de documento: {str(e)}")
@@ -121,7 +148,7 @@ class NVIDIAAIService:
                 "case_type": case_details.get("type", "generic"),
                 "confidence": petition.get("confidence", 0.90),
                 "timestamp": datetime.now().isoformat(),
-                "model_used": self.active_config["model"]
+                "model_used": response.get("model", self.active_config["model"])
             }
             
         except Exception as e:
@@ -138,7 +165,7 @@ class NVIDIAAIService:
         prompt = self._build_jurisprudence_prompt(query, court)
         
         try:
-            response = await self._make_api_request(prompt, context="jurisprudence_analysis")
+            response = await self._make_api_request(prompt, context="jurisprudence_analysis", similarity_text=query)
             
             # Processa resposta para análise jurisprudencial
             analysis = self._process_jurisprudence_response(response, query, court)
@@ -150,7 +177,7 @@ class NVIDIAAIService:
                 "court": court,
                 "confidence": analysis.get("confidence", 0.88),
                 "timestamp": datetime.now().isoformat(),
-                "model_used": self.active_config["model"]
+                "model_used": response.get("model", self.active_config["model"])
             }
             
         except Exception as e:
@@ -178,7 +205,7 @@ class NVIDIAAIService:
                 "case_type": case_data.get("type", "generic"),
                 "confidence": prediction.get("confidence", 0.75),
                 "timestamp": datetime.now().isoformat(),
-                "model_used": self.active_config["model"]
+                "model_used": response.get("model", self.active_config["model"])
             }
             
         except Exception as e:
@@ -192,22 +219,28 @@ class NVIDIAAIService:
     async def extract_contract_clauses(self, contract_text: str) -> Dict[str, Any]:
         """Extrai e analisa cláusulas contratuais usando IA da NVIDIA"""
         
-        prompt = self._build_contract_analysis_prompt(contract_text)
-        
         try:
-            response = await self._make_api_request(prompt, context="contract_analysis")
+            chunking = None
+            if self.chunking.needs_chunking(contract_text):
+                response, chunking = await self.chunking.analyze(contract_text, "contract")
+            else:
+                prompt = self._build_contract_analysis_prompt(contract_text)
+                response = await self._make_api_request(prompt, context="contract_analysis")
             
             # Processa resposta para análise contratual
             analysis = self._process_contract_analysis(response, contract_text)
             
-            return {
+            result = {
                 "success": True,
                 "analysis": analysis,
                 "contract_length": len(contract_text),
                 "confidence": analysis.get("confidence", 0.92),
                 "timestamp": datetime.now().isoformat(),
-                "model_used": self.active_config["model"]
+                "model_used": response.get("model", self.active_config["model"])
             }
+            if chunking:
+                result["chunking"] = chunking
+            return result
             
         except Exception as e:
             logger.error(f"Erro na análise contratual: {str(e)}")
@@ -217,22 +250,51 @@ class NVIDIAAIService:
                 "timestamp": datetime.now().isoformat()
             }
 
-    async def _make_api_request(self, prompt: str, context: str = "general") -> Dict[str, Any]:
-        """Faz requisição para a API da NVIDIA"""
+    async def _make_api_request(self, prompt: str, context: str = "general",
+                                similarity_text: str = None) -> Dict[str, Any]:
+        """Faz requisição para a API da NVIDIA
+        
+        `similarity_text` é o trecho variável do prompt (pergunta ou documento);
+        com o cache por similaridade ativo, um texto quase idêntico no mesmo
+        restante de prompt reaproveita a resposta já armazenada.
+        """
         
         # Incrementa estatísticas
         self.usage_stats["total_requests"] += 1
         self.usage_stats["last_request_time"] = datetime.now().isoformat()
         
-        # Verifica cache
-        cache_key = f"{context}:{hash(prompt)}"
-        if cache_key in self.response_cache:
-            logger.info("Resposta encontrada no cache")
-            return self.response_cache[cache_key]
+        payload = self._build_payload(prompt)
         
-        # Prepara payload
-        payload = {
-            "model": self.active_config["model"],
+        # Verifica cache (chave estável entre workers, ver ai_response_cache)
+        cache_key = ai_response_cache.make_key(payload)
+        cached = ai_response_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Resposta encontrada no cache")
+            return cached
+        
+        scope = None
+        if similarity_text and similarity_text in prompt and ai_similarity_cache.enabled_for(context):
+            # Escopo: todo o resto do payload (instruções, dados de contexto, modelo) precisa ser idêntico
+            scope = ai_response_cache.make_key(self._build_payload(prompt.replace(similarity_text, "\x00")))
+            match = ai_similarity_cache.lookup(context, scope, similarity_text)
+            if match is not None:
+                similar = ai_response_cache.get(match[0])
+                if similar is not None:
+                    logger.info(f"Resposta similar encontrada no cache (similaridade {match[1]})")
+                    return similar
+                ai_similarity_cache.discard(match[0])
+        
+        # Chamadas idênticas concorrentes compartilham uma única requisição upstream
+        similarity = (scope, similarity_text) if scope is not None else None
+        return await ai_response_cache.single_flight(
+            cache_key, lambda: self._fetch_completion(prompt, cache_key, context, similarity)
+        )
+
+    def _build_payload(self, prompt: str, stream: bool = False, config: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Payload de chat completion (configuração preferida se nenhuma for informada)"""
+        config = config or self.active_config
+        return {
+            "model": config["model"],
             "messages": [
                 {
                     "role": "system",
@@ -243,36 +305,181 @@ class NVIDIAAIService:
                     "content": prompt
                 }
             ],
-            "temperature": self.active_config["temperature"],
-            "top_p": self.active_config["top_p"],
-            "max_tokens": self.active_config["max_tokens"],
-            "stream": False  # Para simplificar o processamento inicial
+            "temperature": config["temperature"],
+            "top_p": config["top_p"],
+            "max_tokens": config["max_tokens"],
+            "stream": stream
         }
+
+    def stream_completion(self, prompt: str, context: str = "general") -> Iterator[Dict[str, Any]]:
+        """Completion em streaming (SSE do upstream)
+        
+        Gera {"type": "token", "content": ...} a cada trecho de texto e, ao final,
+        {"type": "done", ...} com a resposta completa e o tempo até o primeiro token.
+        A resposta completa vai para o cache, compartilhado com _make_api_request.
+        """
+        
+        self.usage_stats["total_requests"] += 1
+        self.usage_stats["last_request_time"] = datetime.now().isoformat()
+        
+        payload = self._build_payload(prompt)
+        cache_key = ai_response_cache.make_key(payload)
+        started = time.perf_counter()
+        
+        cached = ai_response_cache.get(cache_key)
+        if cached is not None:
+            content = cached["choices"][0]["message"]["content"]
+            yield {"type": "token", "content": content}
+            yield self._stream_done(cached, started, started, cached=True)
+            return
+        
+        # Admissão (token buckets + prioridade) antes de ocupar o upstream
+        ticket = ai_admission.admit_blocking(ai_admission.estimate_tokens(payload), context)
+        
+        parts, usage, first_token = [], None, None
+        order = self.router.acquire()
+        for attempt, endpoint in enumerate(order):
+            config = self.router.endpoints[endpoint]
+            attempt_started = time.perf_counter()
+            try:
+                for event in ai_http_client.iter_sse(
+                    f"{config['base_url']}/chat/completions",
+                    self._build_payload(prompt, stream=config.get("stream", True), config=config),
+                    headers=self._headers(config),
+                    timeout=120
+                ):
+                    usage = event.get("usage") or usage
+                    for choice in event.get("choices") or []:
+                        text = (choice.get("delta") or {}).get("content")
+                        if text:
+                            if first_token is None:
+                                first_token = time.perf_counter()
+                            parts.append(text)
+                            yield {"type": "token", "content": text}
+            except GeneratorExit:
+                # Cliente desconectou: não conta como falha do endpoint
+                self.router.record(endpoint, time.perf_counter() - attempt_started, None)
+                raise
+            except Exception as e:
+                self.router.record(endpoint, time.perf_counter() - attempt_started, False)
+                # Failover só enquanto nenhum trecho foi enviado ao cliente
+                if parts or attempt == len(order) - 1:
+                    self.usage_stats["failed_requests"] += 1
+                    logger.error(f"Erro na requisição API (streaming): {str(e)}")
+                    raise
+                self.router.stats["failovers"] += 1
+                logger.warning(f"Failover do streaming para {order[attempt + 1]}: {str(e)}")
+                continue
+            
+            self.router.record(endpoint, time.perf_counter() - attempt_started, True)
+            break
+        
+        result = {
+            "model": config["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(parts)}, "finish_reason": "stop"}]
+        }
+        if usage:
+            result["usage"] = usage
+        
+        self.usage_stats["successful_requests"] += 1
+        if usage:
+            self.usage_stats["total_tokens_used"] += usage.get("total_tokens", 0)
+            ai_admission.settle(ticket, usage.get("total_tokens", 0))
+        # Chave do endpoint que respondeu (após failover, não é a da configuração preferida)
+        ai_response_cache.put(
+            ai_response_cache.make_key(self._build_payload(prompt, config=config)),
+            result, context=context, model=config["model"]
+        )
+        
+        yield self._stream_done(result, started, first_token)
+
+    def _stream_done(self, result: Dict[str, Any], started: float, first_token: Optional[float],
+                     cached: bool = False) -> Dict[str, Any]:
+        """Evento final do streaming com a resposta completa e as métricas"""
+        now = time.perf_counter()
+        return {
+            "type": "done",
+            "response": result,
+            "model_used": result.get("model", self.active_config["model"]),
+            "cached": cached,
+            "time_to_first_token_ms": round((first_token - started) * 1000, 1) if first_token else None,
+            "total_ms": round((now - started) * 1000, 1)
+        }
+
+    def stream_legal_analysis(self, document_text: str, document_type: str = "generic") -> Iterator[Dict[str, Any]]:
+        """Análise de documento jurídico em streaming; o evento final traz a análise estruturada
+        
+        Documentos longos passam antes pelo map dos trechos (evento "chunking");
+        só o reduce final é transmitido token a token.
+        """
+        
+        chunking = None
+        if self.chunking.needs_chunking(document_text):
+            async def map_phase():
+                partials, metadata = await self.chunking.map_chunks(document_text, "legal", document_type)
+                return await self.chunking.reduce_to_prompt(partials, "legal", document_type, metadata), metadata
+            
+            prompt, chunking = asyncio.run(map_phase())
+            yield {"type": "chunking", **chunking}
+            context = "legal_reduce"
+        else:
+            prompt = self._build_legal_analysis_prompt(document_text, document_type)
+            context = "legal_analysis"
+        
+        for event in self.stream_completion(prompt, context=context):
+            if event["type"] == "done":
+                event["analysis"] = self._process_legal_analysis(event.pop("response"), document_type)
+                event["document_type"] = document_type
+                if chunking:
+                    chunking["reduce_calls"] += 1
+                    self.chunking.stats["reduce_calls"] += 1
+                    event["chunking"] = chunking
+            yield event
+
+    async def _fetch_completion(self, prompt: str, cache_key: str, context: str,
+                                similarity: Tuple[str, str] = None) -> Dict[str, Any]:
+        """Requisição upstream de uma completion (endpoint escolhido pelo roteador) e armazenamento no cache
+        
+        A resposta é armazenada sob a chave do payload do endpoint que respondeu:
+        após failover ou hedge para outro modelo, ela não é servida como resposta
+        da configuração preferida (`cache_key`).
+        """
+        
+        async def request(endpoint: str, config: Dict[str, Any]) -> Dict[str, Any]:
+            # Sessão compartilhada (pool de conexões keep-alive), ver ai_http_client
+            status, result = await ai_http_client.post_json(
+                f"{config['base_url']}/chat/completions",
+                self._build_payload(prompt, config=config),
+                headers=self._headers(config),
+                timeout=30
+            )
+            
+            if status != 200:
+                raise Exception(f"API Error {status}: {result}")
+            result.setdefault("model", config["model"])
+            return result
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.active_config['base_url']}/chat/completions",
-                    headers=self.headers,
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    
-                    if response.status == 200:
-                        result = await response.json()
-                        
-                        # Atualiza estatísticas
-                        self.usage_stats["successful_requests"] += 1
-                        if "usage" in result:
-                            self.usage_stats["total_tokens_used"] += result["usage"].get("total_tokens", 0)
-                        
-                        # Armazena no cache
-                        self.response_cache[cache_key] = result
-                        
-                        return result
-                    else:
-                        error_text = await response.text()
-                        raise Exception(f"API Error {response.status}: {error_text}")
+            # Admissão (token buckets + prioridade); cache e coalescência já foram resolvidos
+            ticket = await ai_admission.admit(ai_admission.estimate_tokens(self._build_payload(prompt)), context)
+            
+            result, endpoint = await self.router.execute(request)
+            
+            # Atualiza estatísticas
+            self.usage_stats["successful_requests"] += 1
+            if "usage" in result:
+                self.usage_stats["total_tokens_used"] += result["usage"].get("total_tokens", 0)
+                ai_admission.settle(ticket, result["usage"].get("total_tokens", 0))
+            
+            # Armazena no cache
+            served_key = ai_response_cache.make_key(
+                self._build_payload(prompt, config=self.router.endpoints[endpoint])
+            )
+            ai_response_cache.put(served_key, result, context=context, model=result["model"])
+            if similarity is not None and served_key == cache_key:
+                ai_similarity_cache.add(similarity[0], similarity[1], cache_key)
+            
+            return result
                         
         except Exception as e:
             self.usage_stats["failed_requests"] += 1
@@ -286,7 +493,7 @@ class NVIDIAAIService:
         Analise o seguinte documento jurídico do tipo "{document_type}" e forneça uma análise detalhada:
 
         DOCUMENTO:
-        {document_text[:2000]}...
+        {document_text[:self.chunking.config["max_chunk_chars"]]}
 
         Por favor, forneça uma análise estruturada incluindo:
 
@@ -386,7 +593,7 @@ class NVIDIAAIService:
         Analise o seguinte contrato e identifique cláusulas importantes:
 
         CONTRATO:
-        {contract_text[:3000]}...
+        {contract_text[:self.chunking.config["max_chunk_chars"]]}
 
         Forneça uma análise incluindo:
 
@@ -534,13 +741,20 @@ class NVIDIAAIService:
             **self.usage_stats,
             "success_rate": round(success_rate, 2),
             "active_model": self.active_config["model"],
-            "cache_size": len(self.response_cache)
+            "response_cache": ai_response_cache.get_stats(),
+            "similarity_cache": ai_similarity_cache.get_stats(),
+            "context_compaction": ai_context_compactor.get_stats(),
+            "http_pool": ai_http_client.get_stats(),
+            "routing": self.router.get_stats(),
+            "admission": ai_admission.get_stats(),
+            "chunking": self.chunking.get_stats()
         }
 
-    def clear_cache(self):
-        """Limpa o cache de respostas"""
-        self.response_cache.clear()
-        logger.info("Cache de respostas limpo")
+    def clear_cache(self, context: str = None, model: str = None, older_than: float = None) -> int:
+        """Limpa o cache de respostas (todo, ou filtrado por contexto, modelo e idade em segundos)"""
+        removed = ai_response_cache.invalidate(context=context, model=model, older_than=older_than)
+        logger.info(f"Cache de respostas limpo: {removed} entradas removidas")
+        return removed
 
     async def health_check(self) -> Dict[str, Any]:
         """Verifica saúde da API NVIDIA"""
@@ -564,7 +778,7 @@ class NVIDIAAIService:
             }
 
 # Instância global do serviço
-nvidia_ai_service = NVIDIAAIService()
+nvidia_ai_service = registry.service("nvidia_ai_service")
 
 # Funções de conveniência para uso direto
 async def analyze_document(document_text: str, document_type: str = "generic"):
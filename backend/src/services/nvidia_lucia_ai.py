@@ -3,16 +3,25 @@ LucIA - Sistema de IA Jurídica Avançada com API NVIDIA
 Análise comportamental, auditoria inteligente e assistência jurídica
 """
 
-import requests
 import json
 import os
+import time
 from datetime import datetime, timedelta
 import sqlite3
 import hashlib
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator, Tuple
 import re
 from dataclasses import dataclass
 
+from .registry import registry
+from .ai_http_client import ai_http_client
+from .ai_context_compaction import ai_context_compactor
+
+# Mesmo override de nvidia_ai.py (servidor mock em benchmarks locais)
+NVIDIA_API_BASE_URL = os.getenv("NVIDIA_API_BASE_URL", "https://integrate.api.nvidia.com/v1")
+
+LUCIA_AUDIT_DB = os.getenv("LUCIA_AUDIT_DB", '/home/ubuntu/CERTGUARD-AI-100/backend/lucia_audit.db')
+
 @dataclass
 class SecurityEvent:
     user_id: str
@@ -24,12 +33,14 @@ class SecurityEvent:
     risk_score: float
 
 class NvidiaLuciaAI:
-    def __init__(self):
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or LUCIA_AUDIT_DB
+        
         # Configurações da API NVIDIA
         self.nvidia_configs = {
             'primary': {
                 'api_key': 'nvapi-82_',  # Chave truncada por segurança
-                'base_url': 'https://integrate.api.nvidia.com/v1',
+                'base_url': NVIDIA_API_BASE_URL,
                 'model': 'meta/llama3-70b-instruct',
                 'temperature': 0.5,
                 'top_p': 1,
@@ -38,7 +49,7 @@ class NvidiaLuciaAI:
             },
             'secondary': {
                 'api_key': 'nvapi-YdC',  # Chave truncada por segurança
-                'base_url': 'https://integrate.api.nvidia.com/v1',
+                'base_url': NVIDIA_API_BASE_URL,
                 'model': 'meta/llama-3.3-70b-instruct',
                 'temperature': 0.2,
                 'top_p': 0.7,
@@ -75,7 +86,7 @@ class NvidiaLuciaAI:
     
     def init_audit_database(self):
         """Inicializa banco de dados para auditoria e logs"""
-        db_path = '/home/ubuntu/CERTGUARD-AI-100/backend/lucia_audit.db'
+        db_path = self.db_path
         
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
@@ -125,16 +136,66 @@ class NvidiaLuciaAI:
         conn.commit()
         conn.close()
     
-    async def call_nvidia_api(self, prompt: str, config_key: str = 'primary') -> Dict[str, Any]:
-        """Chama a API NVIDIA com o prompt fornecido"""
+    async def call_nvidia_api(self, prompt: str, config_key: str = 'primary', timeout: float = 30,
+                              deadline: float = None) -> Dict[str, Any]:
+        """Chama a API NVIDIA com o prompt fornecido
+        
+        Usa o cliente HTTP compartilhado (pool de conexões no event loop próprio
+        do cliente): não bloqueia o loop de quem chama, e cancelar a corrotina
+        cancela a requisição upstream. `deadline` (instante de time.monotonic())
+        limita o tempo total junto com `timeout`.
+        """
         config = self.nvidia_configs[config_key]
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                return {
+                    'success': False,
+                    'error': 'Request failed: prazo esgotado antes da chamada'
+                }
+        
+        # Resposta completa em JSON; o streaming SSE fica em stream_security_query
+        payload = self._build_payload(prompt, config, stream=False)
+        
+        try:
+            status, body = await ai_http_client.post_json(
+                f"{config['base_url']}/chat/completions",
+                payload,
+                headers=self._build_headers(config),
+                timeout=timeout
+            )
+        except TimeoutError:
+            return {
+                'success': False,
+                'error': f'Request failed: sem resposta em {timeout:.1f}s'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Request failed: {str(e)}'
+            }
         
-        headers = {
+        if status == 200:
+            return {
+                'success': True,
+                'response': body,
+                'model_used': config['model']
+            }
+        return {
+            'success': False,
+            'error': f'API Error: {status}',
+            'details': body
+        }
+    
+    def _build_headers(self, config: Dict[str, Any]) -> Dict[str, str]:
+        return {
             'Authorization': f'Bearer {config["api_key"]}',
             'Content-Type': 'application/json'
         }
-        
-        payload = {
+    
+    def _build_payload(self, prompt: str, config: Dict[str, Any], stream: bool) -> Dict[str, Any]:
+        """Payload de chat completion da LucIA"""
+        return {
             'model': config['model'],
             'messages': [
                 {
@@ -149,35 +210,45 @@ class NvidiaLuciaAI:
             'temperature': config['temperature'],
             'top_p': config['top_p'],
             'max_tokens': config['max_tokens'],
-            'stream': config['stream']
+            'stream': stream
         }
+    
+    def stream_security_query(self, query: str, user_id: str = None,
+                              config_key: str = 'primary') -> Iterator[Dict[str, Any]]:
+        """Consulta de segurança em streaming: gera os trechos de texto e, ao final, as métricas"""
+        config = self.nvidia_configs[config_key]
+        enriched_prompt, prompt_stats = self._enrich_security_prompt(query, user_id)
         
-        try:
-            response = requests.post(
-                f"{config['base_url']}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return {
-                    'success': True,
-                    'response': response.json(),
-                    'model_used': config['model']
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': f'API Error: {response.status_code}',
-                    'details': response.text
-                }
-                
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f'Request failed: {str(e)}'
-            }
+        start_time = datetime.now()
+        parts, first_token = [], None
+        for event in ai_http_client.iter_sse(
+            f"{config['base_url']}/chat/completions",
+            self._build_payload(enriched_prompt, config, stream=config['stream']),
+            headers=self._build_headers(config),
+            timeout=120
+        ):
+            for choice in event.get('choices') or []:
+                text = (choice.get('delta') or {}).get('content')
+                if text:
+                    if first_token is None:
+                        first_token = (datetime.now() - start_time).total_seconds()
+                    parts.append(text)
+                    yield {'type': 'token', 'content': text}
+        processing_time = (datetime.now() - start_time).total_seconds()
+        
+        response_text = ''.join(parts)
+        self._save_lucia_query(user_id or 'system', query, response_text,
+                               'security', processing_time, config['model'])
+        
+        yield {
+            'type': 'done',
+            'success': True,
+            'response': response_text,
+            'processing_time': processing_time,
+            'time_to_first_token': first_token,
+            'model_used': config['model'],
+            'prompt_stats': prompt_stats
+        }
     
     def _get_system_prompt(self) -> str:
         """Prompt do sistema para a LucIA"""
@@ -288,7 +359,7 @@ Responda sempre em português brasileiro."""
     
     def _save_security_event(self, event: SecurityEvent):
         """Salva evento de segurança no banco"""
-        db_path = '/home/ubuntu/CERTGUARD-AI-100/backend/lucia_audit.db'
+        db_path = self.db_path
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
@@ -311,7 +382,7 @@ Responda sempre em português brasileiro."""
     
     def _get_recent_events(self, user_id: str, hours: int = 24) -> List[Dict]:
         """Obtém eventos recentes do usuário"""
-        db_path = '/home/ubuntu/CERTGUARD-AI-100/backend/lucia_audit.db'
+        db_path = self.db_path
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
@@ -341,7 +412,7 @@ Responda sempre em português brasileiro."""
     
     def _ip_used_before(self, user_id: str, ip_address: str) -> bool:
         """Verifica se IP já foi usado pelo usuário"""
-        db_path = '/home/ubuntu/CERTGUARD-AI-100/backend/lucia_audit.db'
+        db_path = self.db_path
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
@@ -359,7 +430,7 @@ Responda sempre em português brasileiro."""
         """Processa consulta de segurança usando IA"""
         
         # Enriquecer query com dados do sistema
-        enriched_prompt = self._enrich_security_prompt(query, user_id)
+        enriched_prompt, prompt_stats = self._enrich_security_prompt(query, user_id)
         
         # Chamar API NVIDIA
         start_time = datetime.now()
@@ -377,48 +448,47 @@ Responda sempre em português brasileiro."""
                 'success': True,
                 'response': response_text,
                 'processing_time': processing_time,
-                'model_used': result['model_used']
+                'model_used': result['model_used'],
+                'prompt_stats': prompt_stats
             }
         else:
             return result
     
-    def _enrich_security_prompt(self, query: str, user_id: str = None) -> str:
-        """Enriquece prompt com dados de contexto"""
+    def _enrich_security_prompt(self, query: str, user_id: str = None) -> Tuple[str, Dict[str, Any]]:
+        """Enriquece prompt com dados de contexto; retorna (prompt, tamanho do prompt)"""
         
-        context_data = []
+        context_data = {}
         
         if user_id:
-            # Obter eventos recentes do usuário
-            recent_events = self._get_recent_events(user_id, hours=168)  # 7 dias
+            # Eventos do usuário nos últimos 7 dias, resumidos (agregados + maior risco)
+            recent_events = self._get_recent_events(user_id, hours=168)
             if recent_events:
-                context_data.append(f"EVENTOS RECENTES DO USUÁRIO {user_id}:")
-                for event in recent_events[:10]:  # Últimos 10 eventos
-                    context_data.append(
-                        f"- {event['timestamp']}: {event['event_type']} "
-                        f"de {event['ip_address']} ({event['location']}) "
-                        f"[Risco: {event['risk_score']:.2f}]"
-                    )
+                context_data[f'eventos_recentes_{user_id}'] = recent_events
         
         # Obter estatísticas gerais do sistema
         system_stats = self._get_system_statistics()
-        context_data.append("ESTATÍSTICAS DO SISTEMA:")
-        context_data.append(f"- Total de usuários ativos: {system_stats['active_users']}")
-        context_data.append(f"- Eventos de segurança hoje: {system_stats['security_events_today']}")
-        context_data.append(f"- Eventos de alto risco: {system_stats['high_risk_events']}")
-        
-        context = "\n".join(context_data)
+        context_data['estatisticas_do_sistema'] = {
+            'usuarios_ativos': system_stats['active_users'],
+            'eventos_de_seguranca_hoje': system_stats['security_events_today'],
+            'eventos_de_alto_risco': system_stats['high_risk_events']
+        }
         
-        return f"""CONTEXTO DO SISTEMA:
-{context}
+        compacted, prompt_stats = ai_context_compactor.compact(
+            context_data, model=self.nvidia_configs['primary']['model']
+        )
+        prompt = f"""CONTEXTO DO SISTEMA (JSON resumido: "agregados" cobrem todos os eventos, "principais" são os de maior risco):
+{ai_context_compactor.render(compacted)}
 
 CONSULTA DO USUÁRIO:
 {query}
 
 Analise a consulta considerando o contexto fornecido e responda de forma detalhada e profissional."""
+        prompt_stats['prompt_tokens'] = ai_context_compactor.estimate_tokens(prompt)
+        return prompt, prompt_stats
     
     def _get_system_statistics(self) -> Dict[str, int]:
         """Obtém estatísticas do sistema para contexto"""
-        db_path = '/home/ubuntu/CERTGUARD-AI-100/backend/lucia_audit.db'
+        db_path = self.db_path
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
@@ -456,7 +526,7 @@ Analise a consulta considerando o contexto fornecido e responda de forma detalha
     def _save_lucia_query(self, user_id: str, query: str, response: str, 
                          query_type: str, processing_time: float, model_used: str):
         """Salva consulta à LucIA no banco"""
-        db_path = '/home/ubuntu/CERTGUARD-AI-100/backend/lucia_audit.db'
+        db_path = self.db_path
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
@@ -524,7 +594,7 @@ Analise a consulta considerando o contexto fornecido e responda de forma detalha
     
     def _save_behavior_analysis(self, user_id: str, analysis: str):
         """Salva análise comportamental no banco"""
-        db_path = '/home/ubuntu/CERTGUARD-AI-100/backend/lucia_audit.db'
+        db_path = self.db_path
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
@@ -539,7 +609,7 @@ Analise a consulta considerando o contexto fornecido e responda de forma detalha
     
     def get_security_dashboard_data(self) -> Dict[str, Any]:
         """Dados para dashboard de segurança"""
-        db_path = '/home/ubuntu/CERTGUARD-AI-100/backend/lucia_audit.db'
+        db_path = self.db_path
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
@@ -582,5 +652,5 @@ Analise a consulta considerando o contexto fornecido e responda de forma detalha
         }
 
 # Instância global da LucIA
-lucia_ai = NvidiaLuciaAI()
+lucia_ai = registry.service("lucia_ai")
 
@@ -0,0 +1,155 @@
+"""
+CertGuard AI - Registro de serviços com inicialização sob demanda
+Serviços (bancos SQLite, chaves RSA, bloco gênesis) e bibliotecas pesadas
+são carregados no primeiro uso, não na importação dos módulos de rotas
+"""
+
+import time
+import logging
+import importlib
+import threading
+from typing import Dict, Any, Callable, Union
+
+logger = logging.getLogger(__name__)
+
+# Serviços da aplicação: nome -> (fábrica "módulo:atributo" relativa a src.services, kwargs)
+SERVICE_FACTORIES: Dict[str, tuple] = {
+    "ai_http_client": (".ai_http_client:AIHttpClient", {}),
+    "ai_response_cache": (".ai_response_cache:AIResponseCache", {}),
+    "ai_similarity_cache": (".ai_similarity_cache:AISimilarityCache", {}),
+    "ai_context_compactor": (".ai_context_compaction:AIContextCompactor", {}),
+    "ai_admission": (".ai_admission:AIAdmissionController", {}),
+    "ai_batch_jobs": (".ai_batch_jobs:AIBatchJobManager", {}),
+    "nvidia_ai_service": (".nvidia_ai:NVIDIAAIService", {}),
+    "blockchain_audit_service": (".blockchain_audit:BlockchainAuditService", {"use_hyperledger": False}),  # MVP mode
+    "lucia_security_ai": (".lucia_security_ai:LucIASecurityAI", {}),
+    "lucia_db_analyzer": (".lucia_database_analyzer:LucIADatabaseAnalyzer", {}),
+    "lucia_ai": (".nvidia_lucia_ai:NvidiaLuciaAI", {}),
+    "audit_analyzer": (".audit_analyzer:AuditAnalyzer", {})
+}
+
+
+class ServiceRegistry:
+    """Instâncias únicas construídas no primeiro acesso (thread-safe)"""
+
+    def __init__(self, factories: Dict[str, tuple]):
+        self._factories: Dict[str, Union[Callable[[], Any], tuple]] = dict(factories)
+        self._instances: Dict[str, Any] = {}
+        self._init_seconds: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """Registra (ou substitui) a fábrica de um serviço"""
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        """Retorna o serviço, construindo-o no primeiro uso"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Serviço não registrado: {name}")
+
+                started = time.perf_counter()
+                self._instances[name] = self._build(self._factories[name])
+                self._init_seconds[name] = time.perf_counter() - started
+                logger.info(f"Serviço {name} inicializado em {self._init_seconds[name]:.3f}s")
+            return self._instances[name]
+
+    def _build(self, factory: Union[Callable[[], Any], tuple]) -> Any:
+        if callable(factory):
+            return factory()
+
+        path, kwargs = factory
+        module_name, attribute = path.split(":")
+        module = importlib.import_module(module_name, package=__package__)
+        return getattr(module, attribute)(**kwargs)
+
+    def service(self, name: str) -> "LazyService":
+        """Referência ao serviço para uso em nível de módulo (não o constrói)"""
+        return LazyService(self, name)
+
+    def shutdown(self):
+        """Encerra os serviços inicializados que expõem close() (sessões, pools, threads)"""
+        with self._lock:
+            instances = list(self._instances.items())
+        for name, instance in reversed(instances):
+            close = getattr(instance, "close", None)
+            if callable(close):
+                try:
+                    close()
+                    logger.info(f"Serviço {name} encerrado")
+                except Exception as e:
+                    logger.error(f"Erro ao encerrar serviço {name}: {str(e)}")
+
+    def is_initialized(self, name: str) -> bool:
+        return name in self._instances
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Estado e tempo de inicialização de cada serviço"""
+        with self._lock:
+            return {
+                name: {
+                    "initialized": name in self._instances,
+                    "init_seconds": round(self._init_seconds[name], 4) if name in self._init_seconds else None
+                }
+                for name in self._factories
+            }
+
+
+class LazyService:
+    """Proxy de um serviço do registro; atributos são repassados à instância"""
+
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry: ServiceRegistry, name: str):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(self._registry.get(self._name), attribute)
+
+    def __setattr__(self, attribute: str, value: Any):
+        setattr(self._registry.get(self._name), attribute, value)
+
+    def __repr__(self) -> str:
+        state = "inicializado" if self._registry.is_initialized(self._name) else "pendente"
+        return f"<LazyService {self._name} ({state})>"
+
+
+class LazyModule:
+    """Módulo importado no primeiro acesso a um atributo"""
+
+    def __init__(self, name: str, package: str = None):
+        self._name = name
+        self._package = package
+        self._module = None
+
+    def __getattr__(self, attribute: str) -> Any:
+        if attribute.startswith("__"):
+            raise AttributeError(attribute)
+
+        if self._module is None:
+            self._module = importlib.import_module(self._name, package=self._package)
+        try:
+            return getattr(self._module, attribute)
+        except AttributeError:
+            # Submódulo ainda não importado (ex.: geoip2.database)
+            return importlib.import_module(f"{self._module.__name__}.{attribute}")
+
+
+def lazy_import(name: str, package: str = None) -> LazyModule:
+    """Substituto de `import name` para bibliotecas pesadas usadas só em métodos"""
+    return LazyModule(name, package)
+
+
+registry = ServiceRegistry(SERVICE_FACTORIES)
+
+
+def get_registry_stats() -> Dict[str, Dict[str, Any]]:
+    return registry.stats()